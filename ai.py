@@ -0,0 +1,205 @@
+# Computer opponent: expectiminimax over bitboard positions
+# ---------------------------------------------------------
+# The search alternates decision nodes (the player to move picks a move for
+# the roll they got) with chance nodes (the next roll, weighted by how often
+# four two-sided dice sum to it). Landing on a rosette gives the same player
+# the next chance node. Values are from player 0's point of view: player 0
+# maximizes, player 1 minimizes.
+#
+# It's written to run on the NeoTrellis: the transposition table has a hard
+# cap on entries, the search deepens one level at a time and stops when its
+# time budget runs out, answering with the best move of the deepest level it
+# finished. On the board the budget is spent a slice at a time: think() is
+# called every frame and searches for SLICE_TIME seconds, so the LEDs and
+# keys keep going while the computer makes up its mind. A level that runs
+# out of time is started again next frame, and gets further each time since
+# the chance nodes it finished are kept in the transposition table.
+
+import time
+
+import bitboard
+
+# how likely each roll is: the number of ways four dice sum to it, out of 16
+ROLL_WEIGHTS = (1, 4, 6, 4, 1)
+ROLL_TOTAL = 16
+
+WIN_SCORE = 10000
+HOME_SCORE = 20       # a token borne off
+ROSETTE_SCORE = 4     # a token sitting on the shared rosette
+THINK_TIME = .5       # seconds of searching per move
+SLICE_TIME = .008     # seconds of searching per frame when thinking a frame at a time
+MAX_DEPTH = 8         # chance levels
+TABLE_SIZE = 500      # transposition table entries, small enough for the M4
+CHECK_EVERY = 8       # decision nodes between looks at the clock, a power of two
+
+class SearchTimeout(Exception):
+    pass
+
+# how good a position is for player 0. Each token scores how far along the
+# path it is, borne off tokens score more, and a token on the shared rosette
+# is worth a bit extra since it can't be taken
+def evaluate(state):
+    score = 0
+    for player in (0, 1):
+        mask = bitboard.getMask(state, player)
+        value = bitboard.getHome(state, player) * HOME_SCORE
+        if mask & bitboard.SHARED_MASK & bitboard.ROSETTE_MASK:
+            value += ROSETTE_SCORE
+        tileNumber = 0
+        while mask:
+            if mask & 1:
+                value += tileNumber + 1
+            mask >>= 1
+            tileNumber += 1
+        if player == 0:
+            score += value
+        else:
+            score -= value
+    return score
+
+# player 0's chance of winning from evaluate's score, for searches and
+# playouts that stop short of the end of the game
+def scoreToValue(score):
+    value = .5 + score / (4 * HOME_SCORE * bitboard.TOKENS_PER_PLAYER)
+    return min(1.0, max(0.0, value))
+
+# how promising a move looks before searching it, for move ordering:
+# captures, then rosettes, then bearing off, then the token furthest along
+def moveOrder(state, tileNumber, n, player):
+    i = bitboard.moveIndex(tileNumber, n, player)
+    flags = bitboard.MOVE_FLAGS[i]
+    score = tileNumber
+    if flags & bitboard.CAPTURE and state & bitboard.MOVE_ENEMY[i]:
+        score += 400
+    if flags & bitboard.ROSETTE:
+        score += 200
+    if flags & bitboard.BEAR_OFF:
+        score += 100
+    return score
+
+def orderedMoves(state, n, player, first=None):
+    moves = bitboard.legalMoves(state, n, player)
+    moves.sort(key=lambda t: -moveOrder(state, t, n, player))
+    if first is not None and first in moves:
+        moves.remove(first)
+        moves.insert(0, first)
+    return moves
+
+class Searcher:
+    def __init__(self, thinkTime=THINK_TIME, maxDepth=MAX_DEPTH, tableSize=TABLE_SIZE, clock=time.monotonic,
+                 checkEvery=CHECK_EVERY):
+        self.thinkTime = thinkTime
+        self.maxDepth = maxDepth
+        self.tableSize = tableSize
+        self.clock = clock
+        self.checkMask = checkEvery - 1
+        # (state, player to roll) key -> (depth searched, value)
+        self.table = {}
+        self.deadline = None
+        self.nodes = 0
+        self.depthReached = 0
+        # the position being thought about a slice at a time, the best move
+        # of the deepest level finished, the seconds searched so far and
+        # whether it's done
+        self.key = None
+        self.best = None
+        self.spent = 0
+        self.done = False
+
+    def store(self, key, depth, value):
+        # when full, start over rather than grow past the cap
+        if len(self.table) >= self.tableSize:
+            self.table.clear()
+        self.table[key] = (depth, value)
+
+    # expected value of the position before player rolls
+    def chance(self, state, player, depth):
+        if depth == 0:
+            return evaluate(state)
+        key = state | player << bitboard.STATE_BITS
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= depth:
+            return entry[1]
+        total = 0
+        for n in range(len(ROLL_WEIGHTS)):
+            # checked per roll, since at depth 1 a roll's moves are only
+            # evaluated, with no chance node below to look at the clock
+            self.nodes += 1
+            if self.nodes & self.checkMask == 0 and self.clock() > self.deadline:
+                raise SearchTimeout()
+            total += ROLL_WEIGHTS[n] * self.decide(state, player, n, depth)[0]
+        value = total / ROLL_TOTAL
+        self.store(key, depth, value)
+        return value
+
+    # (value, best tile number) of player moving with roll n. The tile is
+    # None if they can't move and the turn passes
+    def decide(self, state, player, n, depth, first=None):
+        moves = orderedMoves(state, n, player, first) if n else []
+        if not moves:
+            return self.chance(state, player ^ 1, depth - 1), None
+        best = None
+        bestMove = None
+        for tileNumber in moves:
+            child = bitboard.moveToken(state, tileNumber, n, player)
+            if bitboard.isWon(child, player):
+                value = WIN_SCORE if player == 0 else -WIN_SCORE
+            elif bitboard.landsOnRosette(tileNumber, n):
+                value = self.chance(child, player, depth - 1)
+            else:
+                value = self.chance(child, player ^ 1, depth - 1)
+            if best is None or (player == 0 and value > best) or (player == 1 and value < best):
+                best = value
+                bestMove = tileNumber
+        return best, bestMove
+
+    # starts thinking about player's move with roll n in state
+    def startThinking(self, state, n, player):
+        moves = orderedMoves(state, n, player)
+        self.key = state | player << bitboard.STATE_BITS | n << (bitboard.STATE_BITS + 1)
+        self.best = moves[0] if moves else None
+        self.spent = 0
+        self.done = len(moves) < 2
+        self.nodes = 0
+        self.depthReached = 0
+
+    # deepens the search for player's move with roll n for up to sliceTime
+    # seconds, picking up where the last call left off if it was for the
+    # same move. Call it every frame until isReady()
+    def think(self, state, n, player, sliceTime=SLICE_TIME):
+        if self.key != state | player << bitboard.STATE_BITS | n << (bitboard.STATE_BITS + 1):
+            self.startThinking(state, n, player)
+        if self.done:
+            return
+        start = self.clock()
+        self.deadline = start + min(sliceTime, self.thinkTime - self.spent)
+        while self.depthReached < self.maxDepth:
+            depth = self.depthReached + 1
+            try:
+                value, self.best = self.decide(state, player, n, depth, self.best)
+            except SearchTimeout:
+                break
+            self.depthReached = depth
+        self.spent += self.clock() - start
+        if self.depthReached == self.maxDepth or self.spent >= self.thinkTime:
+            self.done = True
+
+    # whether the move being thought about has had its whole budget, or
+    # has been searched as deep as the search goes
+    def isReady(self):
+        return self.done
+
+    # the best move found so far for player with roll n, or None if there's
+    # no legal move. A move think() hasn't been working on is searched for
+    # in one go
+    def bestMove(self, state, n, player):
+        if self.key != state | player << bitboard.STATE_BITS | n << (bitboard.STATE_BITS + 1):
+            return self.chooseMove(state, n, player)
+        return self.best
+
+    # the tile number player should move with roll n, deepening until the
+    # time budget runs out, in one go. None if there's no legal move
+    def chooseMove(self, state, n, player):
+        self.startThinking(state, n, player)
+        self.think(state, n, player, self.thinkTime)
+        return self.best
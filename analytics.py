@@ -0,0 +1,321 @@
+# Game analytics
+# --------------
+# Desktop only. Saves every ply of simulated games as columns of typed
+# NumPy arrays, for studying rolls, captures on the shared row, rosettes and
+# game lengths over millions of games without keeping them in memory or
+# parsing logs.
+#
+# A dataset is a directory holding tables, each written in chunks of at most
+# chunkRows rows. A chunk is a directory with one .npy file per column, so
+# np.load(..., mmap_mode="r") maps a column straight from disk.
+# manifest.json lists each table's columns, dtypes and chunks, and the
+# dictionaries its dictionary-encoded columns index into. It's rewritten
+# after every chunk of plies, along with a chunk of the games finished
+# since the last one, so the chunks written so far stay readable, and every
+# finished game is in them, even if a run is stopped part way. Two tables
+# are written:
+#
+#   plies   game, ply, player, state (the position before the move, packed
+#           as in bitboard), roll, move (the tile number moved from,
+#           bitboard.OFF_BOARD to enter a token, bitboard.NO_MOVE if the
+#           turn passed), flags (CAPTURED | EXTRA_TURN | SHARED | BEAR_OFF)
+#           and policy (who picked the move, dictionary encoded)
+#   games   game, plies, winner, policy0 and policy1, in the order the
+#           games finished
+#
+# Only the rows of the chunk being filled are held in memory while games
+# run. The reports below go over the chunks one at a time with vectorized
+# counts, so they don't load a whole table either.
+#
+#   python analytics.py export [directory] [policy0] [policy1] [games] [seed]
+#   python analytics.py report [directory]
+
+import json
+import os
+import sys
+
+import numpy as np
+
+import batchsim
+import bitboard
+
+MANIFEST = "manifest.json"
+VERSION = 1
+CHUNK_ROWS = 1 << 20
+BATCH_GAMES = 100000 # games simulated at once while exporting
+
+# flags per ply
+CAPTURED = 1    # the move took an enemy token
+EXTRA_TURN = 2  # the move landed on a rosette and the player rolls again
+SHARED = 4      # the move landed on the shared row (Tile.isShared)
+BEAR_OFF = 8    # the move took the token off the end of the path
+
+PLY_COLUMNS = (
+    ("game", np.uint32),
+    ("ply", np.uint16),
+    ("player", np.uint8),
+    ("state", np.uint64),
+    ("roll", np.uint8),
+    ("move", np.int8),
+    ("flags", np.uint8),
+    ("policy", np.uint8),
+)
+
+GAME_COLUMNS = (
+    ("game", np.uint32),
+    ("plies", np.uint16),
+    ("winner", np.int8),
+    ("policy0", np.uint8),
+    ("policy1", np.uint8),
+)
+
+# one table being written: a chunk's worth of rows buffered per column and
+# written out when it fills up. Columns named in dictionaries hold codes
+# into a list of values, shared by every column named there
+class TableWriter:
+    def __init__(self, directory, name, columns, chunkRows=CHUNK_ROWS, dictionaries=()):
+        self.directory = directory
+        self.name = name
+        self.columns = columns
+        self.chunkRows = chunkRows
+        self.buffers = {column: np.empty(chunkRows, dtype=dtype) for column, dtype in columns}
+        self.rows = 0
+        self.chunks = []
+        self.dictionaries = {column: [] for column in dictionaries}
+        self.codes = {}
+
+    # the code for value in the dictionary column uses
+    def encode(self, column, value):
+        key = (column, value)
+        code = self.codes.get(key)
+        if code is None:
+            values = self.dictionaries[column]
+            code = len(values)
+            values.append(value)
+            self.codes[key] = code
+        return code
+
+    # adds rows, given as an array (or a single value) per column
+    def append(self, **values):
+        count = max(np.size(value) for value in values.values())
+        start = 0
+        while start < count:
+            rows = min(count - start, self.chunkRows - self.rows)
+            for column, buffer in self.buffers.items():
+                value = values[column]
+                if np.ndim(value) == 0:
+                    buffer[self.rows:self.rows + rows] = value
+                else:
+                    buffer[self.rows:self.rows + rows] = value[start:start + rows]
+            self.rows += rows
+            start += rows
+            if self.rows == self.chunkRows:
+                self.flush()
+
+    # writes the buffered rows as a chunk
+    def flush(self):
+        if self.rows == 0:
+            return
+        chunk = "%s-%05d" % (self.name, len(self.chunks))
+        os.makedirs(os.path.join(self.directory, chunk), exist_ok=True)
+        for column, buffer in self.buffers.items():
+            np.save(os.path.join(self.directory, chunk, column + ".npy"), buffer[:self.rows])
+        self.chunks.append({"path": chunk, "rows": self.rows})
+        self.rows = 0
+
+    def manifest(self):
+        return {"columns": [[column, np.dtype(dtype).name] for column, dtype in self.columns],
+                "chunks": self.chunks, "dictionaries": self.dictionaries}
+
+# writes the plies and results of games to a dataset in directory
+class Exporter:
+    def __init__(self, directory, chunkRows=CHUNK_ROWS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.plies = TableWriter(directory, "plies", PLY_COLUMNS, chunkRows, ("policy",))
+        self.games = TableWriter(directory, "games", GAME_COLUMNS, chunkRows, ("policy0", "policy1"))
+        self.nextGame = 0
+        self.chunksWritten = 0
+
+    # the code policy's name is stored as
+    def policyCode(self, name):
+        code = self.plies.encode("policy", name)
+        self.games.encode("policy0", name)
+        self.games.encode("policy1", name)
+        return code
+
+    # plays games games between the batchsim policies named policy0 and
+    # policy1, BATCH_GAMES at a time, saving every ply
+    def simulate(self, policy0, policy1, games, seed=None):
+        rng = np.random.SeedSequence(seed)
+        names = (policy0, policy1)
+        policies = (batchsim.POLICIES[policy0], batchsim.POLICIES[policy1])
+        codes = np.array([self.policyCode(name) for name in names], dtype=np.uint8)
+        while games > 0:
+            batch = min(games, BATCH_GAMES)
+            sim = batchsim.BatchSim(batch, rng.spawn(1)[0])
+            first = self.nextGame
+            self.nextGame += batch
+            while sim.running():
+                self.step(sim, policies, codes, first)
+            games -= batch
+        self.writeManifest()
+
+    # plays a ply of every game running in sim and saves it, and the games
+    # it finished. The arrays of the position before the ply are kept, since
+    # step replaces them
+    def step(self, sim, policies, codes, first):
+        ids = sim.ids
+        turn = sim.turn
+        own = sim.own
+        enemy = sim.enemy
+        waiting = sim.waiting
+        enemyWaiting = sim.enemyWaiting
+        ply = sim.ply
+        rolls, legal, choice = sim.step(policies)
+
+        move = legal != 0
+        destination = choice - 1 + rolls
+        destinationBit = np.where(move, (1 << destination) & bitboard.PATH_MASK, 0)
+        flags = (np.where(enemy & destinationBit & batchsim.CAPTURE_MASK, CAPTURED, 0)
+                 | np.where(destinationBit & bitboard.ROSETTE_MASK, EXTRA_TURN, 0)
+                 | np.where(destinationBit & bitboard.SHARED_MASK, SHARED, 0)
+                 | np.where(move & (destination == bitboard.PATH_LENGTH), BEAR_OFF, 0))
+
+        # the position as bitboard packs it, player 0's side first
+        player1 = turn == 1
+        state = (np.where(player1, enemy, own).astype(np.uint64)
+                 | np.where(player1, own, enemy).astype(np.uint64) << np.uint64(bitboard.MASK_BITS)
+                 | np.where(player1, enemyWaiting, waiting).astype(np.uint64) << np.uint64(bitboard.WAITING_SHIFT)
+                 | np.where(player1, waiting, enemyWaiting).astype(np.uint64)
+                 << np.uint64(bitboard.WAITING_SHIFT + bitboard.WAITING_BITS))
+
+        self.plies.append(game=ids + first, ply=ply, player=turn, state=state, roll=rolls,
+                          move=np.where(move, choice - 1, bitboard.NO_MOVE), flags=flags, policy=codes[turn])
+        if len(self.plies.chunks) > self.chunksWritten:
+            self.games.flush()
+            self.writeManifest()
+        # this ply's rows may not all be in a chunk yet, so the games it
+        # finished go in the games chunk written with the next one
+        finished = ids[sim.winner[ids] >= 0]
+        if len(finished):
+            self.games.append(game=finished + first, plies=sim.plies[finished], winner=sim.winner[finished],
+                              policy0=codes[0], policy1=codes[1])
+
+    def writeManifest(self):
+        self.chunksWritten = len(self.plies.chunks)
+        manifest = {"version": VERSION, "tables": {"plies": self.plies.manifest(), "games": self.games.manifest()}}
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+    # writes what's left and the final manifest
+    def close(self):
+        self.plies.flush()
+        self.games.flush()
+        self.writeManifest()
+
+# a dataset written by an Exporter, read back memory-mapped
+class Dataset:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != VERSION:
+            raise ValueError("not a version %d dataset" % VERSION)
+        self.tables = manifest["tables"]
+
+    def rows(self, table):
+        return sum(chunk["rows"] for chunk in self.tables[table]["chunks"])
+
+    # the values a dictionary-encoded column's codes stand for
+    def dictionary(self, table, column):
+        return self.tables[table]["dictionaries"][column]
+
+    # each chunk of table in turn, as {column: memory-mapped array}
+    def chunks(self, table, columns=None):
+        if columns is None:
+            columns = [column for column, dtype in self.tables[table]["columns"]]
+        for chunk in self.tables[table]["chunks"]:
+            yield {column: np.load(os.path.join(self.directory, chunk["path"], column + ".npy"), mmap_mode="r")
+                   for column in columns}
+
+    # a whole column in memory, for tables small enough to hold
+    def column(self, table, column):
+        return np.concatenate([chunk[column] for chunk in self.chunks(table, [column])])
+
+# Reports
+# -------
+# Each goes over its table a chunk at a time
+
+# how many plies rolled each of 0 to 4
+def rollCounts(dataset):
+    counts = np.zeros(bitboard.ROLL_SLOTS, dtype=np.int64)
+    for chunk in dataset.chunks("plies", ["roll"]):
+        counts += np.bincount(chunk["roll"], minlength=bitboard.ROLL_SLOTS)
+    return counts
+
+# (moves landing on the shared row, how many of them captured), per policy
+# code
+def sharedCaptures(dataset):
+    policies = len(dataset.dictionary("plies", "policy"))
+    landed = np.zeros(policies, dtype=np.int64)
+    captured = np.zeros(policies, dtype=np.int64)
+    for chunk in dataset.chunks("plies", ["flags", "policy"]):
+        flags = chunk["flags"]
+        policy = chunk["policy"]
+        landed += np.bincount(policy[(flags & SHARED) != 0], minlength=policies)
+        captured += np.bincount(policy[(flags & CAPTURED) != 0], minlength=policies)
+    return landed, captured
+
+# (moves made, how many landed on a rosette), per policy code
+def rosetteMoves(dataset):
+    policies = len(dataset.dictionary("plies", "policy"))
+    moves = np.zeros(policies, dtype=np.int64)
+    rosettes = np.zeros(policies, dtype=np.int64)
+    for chunk in dataset.chunks("plies", ["move", "flags", "policy"]):
+        policy = chunk["policy"]
+        moves += np.bincount(policy[chunk["move"] != bitboard.NO_MOVE], minlength=policies)
+        rosettes += np.bincount(policy[(chunk["flags"] & EXTRA_TURN) != 0], minlength=policies)
+    return moves, rosettes
+
+# how many games took each number of plies
+def gameLengths(dataset):
+    counts = np.zeros(0, dtype=np.int64)
+    for chunk in dataset.chunks("games", ["plies"]):
+        chunkCounts = np.bincount(chunk["plies"])
+        if len(chunkCounts) > len(counts):
+            counts = np.pad(counts, (0, len(chunkCounts) - len(counts)))
+        counts[:len(chunkCounts)] += chunkCounts
+    return counts
+
+def report(dataset):
+    lines = []
+    rolls = rollCounts(dataset)
+    lines.append("%d plies of %d games" % (dataset.rows("plies"), dataset.rows("games")))
+    lines.append("rolls 0-4: " + ", ".join("%.4f" % share for share in rolls / rolls.sum()))
+    names = dataset.dictionary("plies", "policy")
+    landed, captured = sharedCaptures(dataset)
+    moves, rosettes = rosetteMoves(dataset)
+    for code, name in enumerate(names):
+        lines.append("%s: captures %.3f of moves onto the shared row, %.3f of moves land on a rosette"
+                     % (name, captured[code] / max(landed[code], 1), rosettes[code] / max(moves[code], 1)))
+    lengths = gameLengths(dataset)
+    plies = np.arange(len(lengths))
+    mean = (lengths * plies).sum() / lengths.sum()
+    median = np.searchsorted(np.cumsum(lengths), lengths.sum() / 2)
+    lines.append("game length: mean %.1f plies, median %d, longest %d" % (mean, median, plies[lengths > 0][-1]))
+    return "\n".join(lines)
+
+def main(mode="report", directory="ur-analytics", policy0="greedy", policy1="random", games=100000, seed=None):
+    if mode == "export":
+        exporter = Exporter(directory)
+        exporter.simulate(policy0, policy1, int(games), None if seed is None else int(seed))
+        exporter.close()
+    elif mode != "report":
+        raise ValueError("unknown mode %s" % mode)
+    print(report(Dataset(directory)))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,210 @@
+# Batch simulator: many games of Ur in lockstep on NumPy arrays
+# -------------------------------------------------------------
+# Desktop only. Holds N games as arrays in the same layout as bitboard
+# (per-player occupancy masks and waiting counts), rolls the four dice for
+# every game in one draw, finds every game's legal moves at once with the
+# same rules as Path.canMoveToken / bitboard.canMoveToken, and applies a
+# policy's choices in bulk. Finished games are dropped from the arrays so
+# later plies only pay for the games still running.
+#
+# Moves are identified by source slot: slot 0 is a waiting token (OFF_BOARD)
+# and slot n+1 is the token on tile n. Legal moves are a SLOTS-bit mask per
+# game with bit slot set if that token can move. A policy is a function
+# policy(sim, legal, rolls, rng) -> chosen slot per running game; during the
+# call sim.own and sim.enemy are the occupancy masks of the player to move
+# and their opponent. The slot picked for a game with no legal move is
+# ignored.
+
+import numpy as np
+
+import bitboard
+
+DTYPE = np.int32
+
+SLOTS = bitboard.PATH_LENGTH + 1
+SLOT_MASK = (1 << SLOTS) - 1
+CAPTURE_MASK = bitboard.SHARED_MASK & ~bitboard.ROSETTE_MASK
+SAFE_MASK = bitboard.SHARED_MASK & bitboard.ROSETTE_MASK
+
+# number of dice showing their marked side for each 4-bit draw
+DICE_SUMS = np.array([bin(bits).count("1") for bits in range(16)], dtype=DTYPE)
+
+# lookup tables over every SLOTS-bit legal move mask
+def buildSlotTables():
+    masks = np.arange(1 << SLOTS)
+    bits = (masks[:, None] >> np.arange(SLOTS)[None, :]) & 1
+    counts = bits.sum(axis=1)
+    highest = np.where(masks > 0, SLOTS - 1 - bits[:, ::-1].argmax(axis=1), 0)
+    lowest = np.where(masks > 0, bits.argmax(axis=1), 0)
+    # select[mask, k] is the slot of the k-th set bit of mask
+    select = np.zeros((1 << SLOTS, SLOTS), dtype=np.int8)
+    order = np.cumsum(bits, axis=1) - 1
+    rows, slots = np.nonzero(bits)
+    select[rows, order[rows, slots]] = slots
+    return counts.astype(DTYPE), highest.astype(DTYPE), lowest.astype(DTYPE), select
+
+SLOT_COUNT, HIGHEST_SLOT, LOWEST_SLOT, SELECT_SLOT = buildSlotTables()
+
+class BatchSim:
+    def __init__(self, games, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.games = games
+        self.winner = np.full(games, -1, dtype=np.int8)
+        self.plies = np.zeros(games, dtype=np.int32)
+
+        # running games only, each stored from the point of view of the
+        # player to move: own/enemy masks, waiting and home counts. They are
+        # swapped whenever the turn passes
+        self.ids = np.arange(games)
+        self.turn = np.zeros(games, dtype=DTYPE)
+        self.own = np.zeros(games, dtype=DTYPE)
+        self.enemy = np.zeros(games, dtype=DTYPE)
+        self.waiting = np.full(games, bitboard.TOKENS_PER_PLAYER, dtype=DTYPE)
+        self.enemyWaiting = np.full(games, bitboard.TOKENS_PER_PLAYER, dtype=DTYPE)
+        self.home = np.zeros(games, dtype=DTYPE)
+        self.enemyHome = np.zeros(games, dtype=DTYPE)
+        self.ply = 0
+
+    def done(self):
+        return self.winner >= 0
+
+    def running(self):
+        return len(self.ids)
+
+    # one vectorized draw of four dice per running game
+    def roll(self):
+        return DICE_SUMS[self.rng.integers(0, 16, size=len(self.ids), dtype=DTYPE)]
+
+    # SLOTS-bit legal move mask per running game for the player to move
+    def legalMoves(self, rolls):
+        own = self.own
+        # source tiles whose destination isn't past the end of the path, isn't
+        # our own token, and isn't an enemy token on the shared rosette
+        legal = own & ~(own >> rolls) & ~((self.enemy & SAFE_MASK) >> rolls)
+        legal &= (1 << (bitboard.PATH_LENGTH + 1 - rolls)) - 1
+        legal <<= 1
+        # entering lands on a private tile, so only our own token blocks it
+        legal |= (self.waiting > 0) & ((own >> np.maximum(rolls - 1, 0)) & 1 == 0)
+        legal[rolls == 0] = 0
+        return legal
+
+    # plays one ply of every running game. policies[p] picks player p's moves
+    def step(self, policies):
+        rolls = self.roll()
+        legal = self.legalMoves(rolls)
+        choice = policies[0](self, legal, rolls, self.rng)
+        if policies[1] is not policies[0]:
+            choice = np.where(self.turn == 0, choice, policies[1](self, legal, rolls, self.rng))
+
+        move = legal != 0
+        chosen = (legal >> choice) & 1 == 1
+        assert not (move & ~chosen).any(), "policy chose an illegal move"
+
+        # lift the token
+        own = self.own & ~np.where(move, (1 << choice) >> 1, 0)
+        waiting = self.waiting - (move & (choice == 0))
+
+        # place it, or bear it off
+        destination = choice - 1 + rolls
+        destinationBit = np.where(move, (1 << destination) & bitboard.PATH_MASK, 0)
+        own |= destinationBit
+        home = self.home + (move & (destination == bitboard.PATH_LENGTH))
+
+        # capture on the shared row
+        captured = self.enemy & destinationBit & CAPTURE_MASK
+        enemy = self.enemy & ~captured
+        enemyWaiting = self.enemyWaiting + (captured != 0)
+
+        # extra turn on a rosette, otherwise the other player goes
+        passes = (destinationBit & bitboard.ROSETTE_MASK) == 0
+        self.own = np.where(passes, enemy, own)
+        self.enemy = np.where(passes, own, enemy)
+        self.waiting = np.where(passes, enemyWaiting, waiting)
+        self.enemyWaiting = np.where(passes, waiting, enemyWaiting)
+        self.home = np.where(passes, self.enemyHome, home)
+        self.enemyHome = np.where(passes, home, self.enemyHome)
+        mover = self.turn
+        self.turn = mover ^ passes
+        self.ply += 1
+
+        won = home == bitboard.TOKENS_PER_PLAYER
+        if won.any():
+            finished = self.ids[won]
+            self.winner[finished] = mover[won]
+            self.plies[finished] = self.ply
+            keep = ~won
+            self.ids = self.ids[keep]
+            self.turn = self.turn[keep]
+            self.own = self.own[keep]
+            self.enemy = self.enemy[keep]
+            self.waiting = self.waiting[keep]
+            self.enemyWaiting = self.enemyWaiting[keep]
+            self.home = self.home[keep]
+            self.enemyHome = self.enemyHome[keep]
+        return rolls, legal, choice
+
+    # plays every game to the end, or until maxPlies. Returns the winners
+    def play(self, policies, maxPlies=2000):
+        while self.running() and self.ply < maxPlies:
+            self.step(policies)
+        return self.winner
+
+    # the packed bitboard positions and players to move of the running games
+    def states(self):
+        states = []
+        for i in range(len(self.ids)):
+            masks = [int(self.own[i]), int(self.enemy[i])]
+            waiting = [int(self.waiting[i]), int(self.enemyWaiting[i])]
+            if self.turn[i]:
+                masks.reverse()
+                waiting.reverse()
+            states.append(bitboard.pack(masks[0], masks[1], waiting[0], waiting[1]))
+        return states, [int(t) for t in self.turn]
+
+# Policies
+# --------
+
+# a uniformly random legal move
+def randomPolicy(sim, legal, rolls, rng):
+    k = (rng.random(len(legal)) * SLOT_COUNT[legal]).astype(DTYPE)
+    return SELECT_SLOT[legal, k].astype(DTYPE)
+
+# the token furthest along the path
+def leadPolicy(sim, legal, rolls, rng):
+    return HIGHEST_SLOT[legal]
+
+# the token furthest back, entering new tokens first
+def trailPolicy(sim, legal, rolls, rng):
+    return LOWEST_SLOT[legal]
+
+# captures first, then rosettes, then bearing off, then the token furthest
+# along
+def greedyPolicy(sim, legal, rolls, rng):
+    # slots whose move lands on each kind of tile. Entering never captures or
+    # bears off, and lands on a rosette only with a roll of 4
+    capture = ((sim.enemy & CAPTURE_MASK) >> rolls) << 1
+    rosette = ((bitboard.ROSETTE_MASK >> rolls) << 1) | (rolls == 4)
+    bearOff = (1 << (bitboard.PATH_LENGTH - rolls)) << 1
+    choice = HIGHEST_SLOT[legal]
+    for preferred in (bearOff, rosette, capture):
+        candidates = legal & preferred & SLOT_MASK
+        choice = np.where(candidates != 0, HIGHEST_SLOT[candidates], choice)
+    return choice
+
+POLICIES = {
+    "random": randomPolicy,
+    "lead": leadPolicy,
+    "trail": trailPolicy,
+    "greedy": greedyPolicy,
+}
+
+# python batchsim.py [policy0] [policy1] [games] [seed]
+def main(policy0="greedy", policy1="random", games=100000, seed=None):
+    sim = BatchSim(int(games), None if seed is None else int(seed))
+    winners = sim.play((POLICIES[policy0], POLICIES[policy1]))
+    print("%s vs %s over %d games: player 0 wins %.4f, mean length %.1f plies"
+          % (policy0, policy1, sim.games, (winners == 0).mean(), sim.plies.mean()))
+
+if __name__ == "__main__":
+    import sys
+    main(*sys.argv[1:])
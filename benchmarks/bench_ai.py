@@ -0,0 +1,81 @@
+# How deep the expectiminimax opponent gets within its time budget, and how
+# it does against a random mover. It thinks a frame's slice at a time, as on
+# the board, and the longest a slice held up its frame is reported against
+# ai.SLICE_TIME
+#
+#   python benchmarks/bench_ai.py [games] [thinkTime] [seed]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ai
+import bitboard
+
+def roll(rng):
+    return sum(rng.randint(0, 1) for i in range(4))
+
+# plays one game, the searcher as player 1. Returns (winner, decisions made,
+# total depth reached, total nodes, slowest decision in seconds, slices
+# thought in, slowest slice in seconds)
+def playGame(searcher, rng):
+    state = bitboard.START
+    turn = 0
+    decisions = depth = nodes = slices = 0
+    slowest = slowestSlice = 0
+    while True:
+        n = roll(rng)
+        moves = bitboard.legalMoves(state, n, turn)
+        if moves:
+            if turn == 1 and len(moves) > 1:
+                start = time.perf_counter()
+                searcher.think(state, n, turn)
+                slowestSlice = max(slowestSlice, time.perf_counter() - start)
+                slices += 1
+                while not searcher.isReady():
+                    sliceStart = time.perf_counter()
+                    searcher.think(state, n, turn)
+                    slowestSlice = max(slowestSlice, time.perf_counter() - sliceStart)
+                    slices += 1
+                tileNumber = searcher.bestMove(state, n, turn)
+                slowest = max(slowest, time.perf_counter() - start)
+                decisions += 1
+                depth += searcher.depthReached
+                nodes += searcher.nodes
+            else:
+                tileNumber = rng.choice(moves)
+            state = bitboard.moveToken(state, tileNumber, n, turn)
+            if bitboard.isWon(state, turn):
+                return turn, decisions, depth, nodes, slowest, slices, slowestSlice
+            if bitboard.landsOnRosette(tileNumber, n):
+                continue
+        turn ^= 1
+
+def main(games=10, thinkTime=ai.THINK_TIME, seed=1):
+    rng = random.Random(seed)
+    searcher = ai.Searcher(thinkTime=float(thinkTime))
+    wins = decisions = depth = nodes = slices = 0
+    slowest = slowestSlice = 0
+    start = time.perf_counter()
+    for i in range(int(games)):
+        winner, d, dep, nod, slow, sl, slowSlice = playGame(searcher, rng)
+        wins += winner == 1
+        decisions += d
+        depth += dep
+        nodes += nod
+        slowest = max(slowest, slow)
+        slices += sl
+        slowestSlice = max(slowestSlice, slowSlice)
+    elapsed = time.perf_counter() - start
+    print("searcher won %d of %d games against random moves" % (wins, int(games)))
+    print("%d decisions, mean depth %.2f, %.0f nodes/decision, slowest %.3f s (budget %.3f s)"
+          % (decisions, depth / decisions, nodes / decisions, slowest, float(thinkTime)))
+    print("%.1f slices a decision, slowest slice %.1f ms (slice %.1f ms)"
+          % (slices / decisions, slowestSlice * 1e3, ai.SLICE_TIME * 1e3))
+    print("%.1f s total, table holds at most %d entries" % (elapsed, searcher.tableSize))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,91 @@
+# Checks that steady-state frames don't allocate
+#
+# Runs the main loop on a FakeTrellis in two steady states, the roll button
+# pulsing and a selected token pulsing with its move previewed, and measures
+# the heap with tracemalloc. A frame should leave the heap exactly as it found
+# it (net bytes 0); the transient bytes are the most a single frame had
+# allocated at once, which on the device is what brings the next collection
+# closer. The net bytes are measured over two runs of frames in a row, and
+# both have to be 0. Exits with status 1 if any frame left memory behind.
+#
+#   python benchmarks/bench_alloc.py [frames]
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import hardware
+import ur
+
+# long enough for the frame counters to grow past the small ints CPython
+# keeps preallocated, which would otherwise show up as new memory
+WARMUP = 1000
+SMALL_INT_MAX = 256
+GAME_CODE = [tracemalloc.Filter(True, os.path.join(os.path.dirname(os.path.abspath(ur.__file__)), "*.py")),
+             tracemalloc.Filter(False, os.path.abspath(__file__))]
+
+def rollStage():
+    trellis = hardware.FakeTrellis()
+    return trellis, ur.makeGame(trellis)
+
+def moveStage():
+    trellis, game = rollStage()
+    board = game.board
+    board.stage = "move"
+    board.dice.values[:] = [1, 1, 0, 0]
+    board.dice.shown[:] = board.dice.values
+    board.findLegalMoves()
+    # select player 0's token on tile 3, previewing tile 5
+    board.pressButton((0, 0))
+    assert board.selected is not None and board.preview is not None
+    return trellis, game
+
+# runs game for WARMUP frames, and on until the count of skipped frames is
+# past the small ints too, if the stage skips any: it only goes up on the
+# frames where nothing changed, so it gets there long after the others
+def warmUp(game):
+    ur.run(game, WARMUP)
+    frame = game.renderer.frame
+    for i in range(20 * WARMUP):
+        if frame.framesSkipped > SMALL_INT_MAX:
+            break
+        ur.run(game, 1)
+
+# ((net bytes of each of two runs of frames in a row), most transient bytes
+# in a frame). Only memory allocated by the game's modules counts towards
+# the net figures, not the benchmark's or tracemalloc's own
+def measure(trellis, game, frames):
+    # frames step the fake clock as the device's would
+    trellis.frameTime = 1 / 30
+    warmUp(game)
+    tracemalloc.start()
+    transient = 0
+    for i in range(frames):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        ur.run(game, 1)
+        transient = max(transient, tracemalloc.get_traced_memory()[1] - before)
+    snapshots = [tracemalloc.take_snapshot().filter_traces(GAME_CODE)]
+    for run in range(2):
+        ur.run(game, frames)
+        snapshots.append(tracemalloc.take_snapshot().filter_traces(GAME_CODE))
+    tracemalloc.stop()
+    nets = [sum(stat.size_diff for stat in snapshots[i + 1].compare_to(snapshots[i], "lineno"))
+            for i in range(2)]
+    return nets, transient
+
+def main(frames=1000):
+    failed = False
+    for name, setup in (("roll", rollStage), ("move", moveStage)):
+        trellis, game = setup()
+        nets, transient = measure(trellis, game, frames)
+        print("%-5s 2 x %d frames: net bytes %d and %d, transient bytes per frame up to %d" % (
+            name, frames, nets[0], nets[1], transient))
+        failed = failed or nets != [0, 0]
+    print("FAIL" if failed else "ok")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(a) for a in sys.argv[1:]]))
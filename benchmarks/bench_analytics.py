@@ -0,0 +1,115 @@
+# How fast games are exported for analytics, and what it costs
+#
+# Simulates games with analytics.Exporter into a temporary dataset and
+# reports plies written a second, bytes per ply on disk and the most memory
+# the export held at once (traced with tracemalloc, which NumPy reports its
+# arrays to). Then times the reports over the memory-mapped chunks.
+#
+# Checks a sample of games by replaying them on bitboard: every saved move
+# must be legal for the saved position and roll, lead to the next saved
+# position, and carry the right flags. Exits with an error if one doesn't.
+#
+#   python benchmarks/bench_analytics.py [games] [chunkRows] [seed]
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import analytics
+import bitboard
+
+CHECKED_GAMES = 200
+
+# the flags a move should have been saved with
+def expectedFlags(state, tileNumber, n, player):
+    if tileNumber == bitboard.NO_MOVE:
+        return 0
+    destination = tileNumber + n
+    flags = 0
+    if destination == bitboard.PATH_LENGTH:
+        return analytics.BEAR_OFF
+    if bitboard.SHARED_MASK >> destination & 1:
+        flags |= analytics.SHARED
+        if bitboard.getMask(state, player ^ 1) >> destination & 1:
+            flags |= analytics.CAPTURED
+    if bitboard.ROSETTE_MASK >> destination & 1:
+        flags |= analytics.EXTRA_TURN
+    return flags
+
+# replays the first count games of dataset. Returns the number of plies
+# that didn't match
+def check(dataset, count):
+    plies = {}
+    for chunk in dataset.chunks("plies"):
+        keep = chunk["game"] < count
+        for column, values in chunk.items():
+            plies.setdefault(column, []).append(np.asarray(values[keep]))
+    plies = {column: np.concatenate(values) for column, values in plies.items()}
+    order = np.lexsort((plies["ply"], plies["game"]))
+    bad = 0
+    for game in range(count):
+        rows = order[plies["game"][order] == game]
+        state = bitboard.START
+        player = 0
+        for row in rows:
+            roll = int(plies["roll"][row])
+            move = int(plies["move"][row])
+            ok = int(plies["state"][row]) == state and int(plies["player"][row]) == player
+            legal = bitboard.legalMoves(state, roll, player) if roll else []
+            ok = ok and (move in legal if legal else move == bitboard.NO_MOVE)
+            ok = ok and int(plies["flags"][row]) == expectedFlags(state, move, roll, player)
+            if not ok:
+                bad += 1
+                break
+            if move == bitboard.NO_MOVE:
+                player ^= 1
+                continue
+            state = bitboard.moveToken(state, move, roll, player)
+            if not bitboard.landsOnRosette(move, roll):
+                player ^= 1
+        else:
+            if not bitboard.isWon(state, player ^ 1) and not bitboard.isWon(state, player):
+                bad += 1
+    return bad
+
+def main(games=100000, chunkRows=analytics.CHUNK_ROWS, seed=1):
+    games = int(games)
+    directory = tempfile.mkdtemp()
+    try:
+        tracemalloc.start()
+        start = time.perf_counter()
+        exporter = analytics.Exporter(directory, int(chunkRows))
+        exporter.simulate("greedy", "random", games, int(seed))
+        exporter.close()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        dataset = analytics.Dataset(directory)
+        plies = dataset.rows("plies")
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, dirs, names in os.walk(directory) for name in names)
+        print("%d games, %d plies in %.1f s: %.0f plies/s, %.1f bytes/ply on disk, %.1f MB held at most"
+              % (games, plies, elapsed, plies / elapsed, size / plies, peak / 1e6))
+
+        start = time.perf_counter()
+        text = analytics.report(dataset)
+        elapsed = time.perf_counter() - start
+        print(text)
+        print("report over the memory-mapped chunks in %.2f s, %.0f plies/s" % (elapsed, plies / elapsed))
+
+        checked = min(CHECKED_GAMES, games)
+        bad = check(dataset, checked)
+        print("replayed %d games on bitboard: %d didn't match" % (checked, bad))
+        return 1 if bad else 0
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:]))
@@ -0,0 +1,80 @@
+# Games/second of the NumPy batch simulator against playing games one at a
+# time in pure Python
+#
+# The one-at-a-time baseline plays on bitboard, the fastest of the scalar
+# engines (Path can't enter tokens from off the board, so it can't play a
+# game from the start). Before timing, the batch simulator's legal moves are
+# checked against bitboard.canMoveToken for every game and ply of a run.
+#
+#   python benchmarks/bench_batchsim.py [games] [scalarGames] [seed]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import batchsim
+import bitboard
+
+def playScalarGame(rng):
+    state = bitboard.START
+    turn = 0
+    while True:
+        n = sum(rng.randint(0, 1) for i in range(4))
+        moves = bitboard.legalMoves(state, n, turn)
+        if moves:
+            tileNumber = rng.choice(moves)
+            state = bitboard.moveToken(state, tileNumber, n, turn)
+            if bitboard.isWon(state, turn):
+                return turn
+            if bitboard.landsOnRosette(tileNumber, n):
+                continue
+        turn ^= 1
+
+# steps a batch and checks every running game's legal moves and resulting
+# position against bitboard
+def check(games=200, seed=7):
+    sim = batchsim.BatchSim(games, seed)
+    policies = (batchsim.randomPolicy, batchsim.greedyPolicy)
+    while sim.running():
+        ids = sim.ids.copy()
+        states, turns = sim.states()
+        rolls, legal, choice = sim.step(policies)
+        after = dict(zip(sim.ids.tolist(), sim.states()[0]))
+        for i in range(len(ids)):
+            state, turn, n = states[i], turns[i], int(rolls[i])
+            expected = 0
+            for slot in range(batchsim.SLOTS):
+                if bitboard.canMoveToken(state, slot - 1, n, turn):
+                    expected |= 1 << slot
+            assert legal[i] == expected, (state, n, turn)
+            if legal[i]:
+                moved = bitboard.moveToken(state, int(choice[i]) - 1, n, turn)
+                if bitboard.isWon(moved, turn):
+                    assert sim.winner[ids[i]] == turn
+                else:
+                    assert after[int(ids[i])] == moved
+
+def main(games=20000, scalarGames=500, seed=1):
+    check()
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for i in range(scalarGames):
+        playScalarGame(rng)
+    scalarRate = scalarGames / (time.perf_counter() - start)
+
+    sim = batchsim.BatchSim(games, seed)
+    start = time.perf_counter()
+    winners = sim.play((batchsim.randomPolicy, batchsim.randomPolicy))
+    batchRate = games / (time.perf_counter() - start)
+    assert (winners >= 0).all()
+
+    print("one at a time: %9.0f games/s" % scalarRate)
+    print("batch of %d: %9.0f games/s  (%.0fx)" % (games, batchRate, batchRate / scalarRate))
+    print("mean game length %.1f plies, player 0 wins %.3f" % (sim.plies.mean(), (winners == 0).mean()))
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
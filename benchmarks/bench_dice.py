@@ -0,0 +1,125 @@
+# Micro-benchmark: where rolls come from
+#
+# Times a roll the way Dice.roll used to make one (four randint calls)
+# against dice.Roller's and dice.BulkRoller's rolls, one at a time and drawn
+# in bulk, and the flop counts for the roll animation. Every source's rolls
+# are checked against the 1, 4, 6, 4, 1 in 16 distribution, and seeded
+# streams are checked to repeat. Exits with an error if a check fails.
+#
+#   python benchmarks/bench_dice.py [rolls]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import dice
+import rules
+
+WEIGHTS = (1, 4, 6, 4, 1)
+# chi-squared with 4 degrees of freedom, exceeded by chance 1 time in 1000
+CHI_SQUARED_LIMIT = 18.47
+
+def randintRoll():
+    return random.randint(0, 1) + random.randint(0, 1) + random.randint(0, 1) + random.randint(0, 1)
+
+def timeRolls(roll, rolls):
+    start = time.perf_counter()
+    for i in range(rolls):
+        roll()
+    return time.perf_counter() - start
+
+def chiSquared(counts):
+    total = sum(counts)
+    return sum((counts[n] - total * WEIGHTS[n] / 16) ** 2 / (total * WEIGHTS[n] / 16)
+               for n in range(len(WEIGHTS)))
+
+def checkDistribution(name, roll, rolls):
+    counts = [0] * len(WEIGHTS)
+    for i in range(rolls):
+        counts[roll()] += 1
+    statistic = chiSquared(counts)
+    if statistic > CHI_SQUARED_LIMIT:
+        print("%s: rolls don't follow the dice, chi-squared %.1f, counts %s" % (name, statistic, counts))
+        return False
+    return True
+
+def checkStreams():
+    ok = True
+    for make in (dice.stream, dice.BulkRoller):
+        first = list(make(7).rolls(1000))
+        if first != list(make(7).rolls(1000)):
+            print(make.__name__, "isn't repeatable")
+            ok = False
+        # reseeding part way through starts the stream over
+        values = [0] * 4
+        fresh = make(7)
+        roller = make(7)
+        roller.roll()
+        roller.seed(7)
+        if [fresh.rollDice(values) for i in range(1000)] != [roller.rollDice(values) for i in range(1000)]:
+            print(make.__name__, "doesn't start over when reseeded")
+            ok = False
+    # the board's dice replay the same rolls from the same seed
+    rolled = []
+    for attempt in range(2):
+        board = rules.Board()
+        board.dice.roller.seed(11)
+        rolls = []
+        for i in range(100):
+            board.dice.roll()
+            rolls.append(list(board.dice.values))
+        rolled.append(rolls)
+    if rolled[0] != rolled[1]:
+        print("Dice aren't repeatable")
+        ok = False
+    return ok
+
+def main(rolls=200000):
+    random.seed(1)
+    roller = dice.Roller()
+    bulk = dice.BulkRoller(1)
+    values = [0] * 4
+    sources = (
+        ("4 x randint", randintRoll),
+        ("Roller.roll", roller.roll),
+        ("Roller.rollDice", lambda: roller.rollDice(values)),
+        ("BulkRoller.roll", bulk.roll),
+    )
+    ok = checkStreams()
+    for name, roll in sources:
+        ok = checkDistribution(name, roll, rolls) and ok
+    base = None
+    print("one roll at a time, %d rolls" % rolls)
+    for name, roll in sources:
+        elapsed = timeRolls(roll, rolls)
+        if base is None:
+            base = elapsed
+        print("  %-16s %7.1f ns/roll  (%.2fx randint)" % (name, elapsed / rolls * 1e9, base / elapsed))
+    print("drawn in bulk, sums only")
+    for name, source in (("Roller.rolls", roller), ("BulkRoller.rolls", bulk)):
+        start = time.perf_counter()
+        source.rolls(rolls)
+        elapsed = time.perf_counter() - start
+        print("  %-16s %7.1f ns/roll  (%.2fx randint)" % (name, elapsed / rolls * 1e9, base / elapsed))
+
+    flops = [0] * 4
+    animations = rolls // 10
+    start = time.perf_counter()
+    for i in range(animations):
+        for j in range(4):
+            flops[j] = random.randint(rules.FLOP_LOW_BOUND, rules.FLOP_HIGH_BOUND)
+    base = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(animations):
+        roller.between(rules.FLOP_LOW_BOUND, rules.FLOP_HIGH_BOUND, flops)
+    elapsed = time.perf_counter() - start
+    print("flop counts for a roll: 4 x randint %.1f ns, Roller.between %.1f ns (%.2fx)"
+          % (base / animations * 1e9, elapsed / animations * 1e9, base / elapsed))
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
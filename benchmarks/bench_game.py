@@ -0,0 +1,74 @@
+# Plays the game headless on a FakeTrellis and reports how fast frames go
+#
+# A scripted player presses the roll button, then selects and confirms the
+# first token that can move (or the waiting pile), exactly as someone at the device would. The
+# fake clock means the frame scheduler's waits, FLOP_TIME and
+# ZERO_ROLL_DELAY cost nothing in wall time.
+#
+#   python benchmarks/bench_game.py [turns] [seed] [profile]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import bitboard
+import hardware
+import rules
+import ur
+
+# the presses the scripted player makes for the current stage, or None once
+# the game is won. No presses while the dice are rolling
+def nextPresses(board):
+    if board.stage == "won":
+        return None
+    if board.stage == "rolling":
+        return []
+    if board.stage == "roll":
+        return [rules.DICE_ROLL_BUTTON]
+    # the lowest tile number the roll can move from, entering a token first
+    for tileNumber in range(bitboard.OFF_BOARD, bitboard.PATH_LENGTH):
+        if board.isLegal(tileNumber):
+            key = board.keyOf(tileNumber)
+            return [key, key]
+    return []
+
+def main(turns=200, seed=1, profile=0):
+    random.seed(seed)
+    trellis = hardware.FakeTrellis()
+    game = ur.makeGame(trellis, profile=bool(profile))
+    board = game.board
+    # report once at the end rather than every few simulated seconds
+    game.nextProfilePrint = float("inf")
+    frames = 0
+    played = 0
+    start = time.perf_counter()
+    while played < turns:
+        presses = nextPresses(board)
+        if presses is None:
+            break
+        if not presses:
+            ur.run(game, frames=1)
+            frames += 1
+            continue
+        for button in presses:
+            trellis.press(button)
+        # one frame per scripted poll
+        while not trellis.scriptDone():
+            ur.run(game, frames=1)
+            frames += 1
+        played += 1
+    elapsed = time.perf_counter() - start
+    print("%d stages, %d frames in %.3f s wall, %.1f s simulated" % (played, frames, elapsed, trellis.monotonic()))
+    print("%.0f frames/s, %d pixel writes, %d shows" % (frames / elapsed, trellis.pixels.writes, trellis.pixels.shows))
+    print(game.renderer.frame.stats())
+    print(game.keys.stats())
+    print(game.scheduler.stats())
+    if game.profiler is not None:
+        print(game.profiler.report())
+    print(trellis.pixels)
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
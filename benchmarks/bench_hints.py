@@ -0,0 +1,76 @@
+# How long move hints take to show, and what they add to a frame
+#
+# Plays random games and hints every move the way the board does, a
+# THINK_TIME slice per frame on the real clock, reporting how long slices
+# take (what hints add to a frame), how many frames the first rough hints
+# and the finished ones take, and how often a position's hints came from the
+# cache.
+# Also reports how often the brightest token is the move ai.Searcher picks
+# with a longer think.
+#
+#   python benchmarks/bench_hints.py [games] [seed]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ai
+import bitboard
+import dice
+import hints
+
+def main(games=20, seed=1):
+    rng = random.Random(seed)
+    roller = dice.stream(seed)
+    hinter = hints.Hinter(time.perf_counter)
+    searcher = ai.Searcher(thinkTime=.05)
+    hinted = 0
+    slices = []
+    firstFrames = 0
+    agreed = 0
+    compared = 0
+    for game in range(games):
+        state = bitboard.START
+        turn = 0
+        while True:
+            n = roller.roll()
+            moves = bitboard.legalMoves(state, n, turn) if n else []
+            if moves:
+                hinter.start(state, n, turn, moves)
+                frames = 0
+                first = None
+                while hinter.thinking:
+                    start = time.perf_counter()
+                    hinter.think()
+                    slices.append(time.perf_counter() - start)
+                    frames += 1
+                    if first is None and hinter.searched:
+                        first = frames
+                hinted += 1
+                firstFrames += first or 0
+                if len(moves) > 1:
+                    best = max(moves, key=hinter.level)
+                    choice = searcher.chooseMove(state, n, turn)
+                    agreed += hinter.level(best) == hinter.level(choice)
+                    compared += 1
+                tileNumber = rng.choice(moves)
+                state = bitboard.moveToken(state, tileNumber, n, turn)
+                if bitboard.isWon(state, turn):
+                    break
+                if bitboard.landsOnRosette(tileNumber, n):
+                    continue
+            turn ^= 1
+    print("%d positions hinted in %d frames, %.1f frames each, first hints after %.1f"
+          % (hinted, len(slices), len(slices) / hinted, firstFrames / hinted))
+    slices.sort()
+    print("slices of a %.1f ms budget: median %.2f ms, 99th percentile %.2f ms, slowest %.2f ms"
+          % (hints.THINK_TIME * 1000, slices[len(slices) // 2] * 1000,
+             slices[len(slices) * 99 // 100] * 1000, slices[-1] * 1000))
+    print("brightest token is ai.Searcher's move %.0f%% of the time" % (100 * agreed / compared))
+    print(hinter.stats())
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,91 @@
+# How the Monte Carlo planner plays, and how long its per-frame slices take
+#
+# The planner plays player 1, thinking in slices of PLAYOUTS_PER_FRAME
+# playouts until it's ready, the way the board drives it, against a random
+# mover and then against ai.Searcher. Reports wins, the slowest slice (what
+# it adds to a frame), and how much of the tree carried over between turns.
+#
+#   python benchmarks/bench_mcts.py [games] [seed]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ai
+import bitboard
+import mcts
+
+class Totals:
+    def __init__(self):
+        self.decisions = 0
+        self.slices = 0
+        self.slowestSlice = 0
+        self.thinking = 0
+        self.reused = 0
+        self.mostNodes = 0
+
+def roll(rng):
+    return sum(rng.randint(0, 1) for i in range(4))
+
+# the planner's move, thought out a slice at a time
+def plannerMove(planner, state, n, totals):
+    start = time.perf_counter()
+    while True:
+        sliceStart = time.perf_counter()
+        planner.think(state, n, 1)
+        totals.slowestSlice = max(totals.slowestSlice, time.perf_counter() - sliceStart)
+        totals.slices += 1
+        if planner.isReady():
+            break
+    totals.thinking += time.perf_counter() - start
+    totals.decisions += 1
+    totals.reused += planner.reused
+    totals.mostNodes = max(totals.mostNodes, planner.used)
+    return planner.bestMove(state, n, 1)
+
+# plays one game, the planner as player 1 and opponent (a function of state,
+# n, player and moves) as player 0. Returns the winner
+def playGame(planner, opponent, rng, totals):
+    state = bitboard.START
+    turn = 0
+    while True:
+        n = roll(rng)
+        moves = bitboard.legalMoves(state, n, turn)
+        if moves:
+            if turn == 1:
+                tileNumber = plannerMove(planner, state, n, totals)
+            else:
+                tileNumber = opponent(state, n, turn, moves)
+            state = bitboard.moveToken(state, tileNumber, n, turn)
+            if bitboard.isWon(state, turn):
+                return turn
+            if bitboard.landsOnRosette(tileNumber, n):
+                continue
+        turn ^= 1
+
+def main(games=10, seed=1):
+    rng = random.Random(seed)
+    random.seed(seed)
+    searcher = ai.Searcher(thinkTime=.05)
+    opponents = (
+        ("random moves", lambda state, n, player, moves: rng.choice(moves)),
+        ("ai.Searcher", lambda state, n, player, moves: searcher.chooseMove(state, n, player)),
+    )
+    for name, opponent in opponents:
+        planner = mcts.Planner()
+        totals = Totals()
+        wins = 0
+        for i in range(games):
+            wins += playGame(planner, opponent, rng, totals) == 1
+        print("against %s: won %d of %d" % (name, wins, games))
+        print("  %d decisions, %.1f ms thinking each in %.1f slices, slowest slice %.2f ms"
+              % (totals.decisions, totals.thinking * 1000 / totals.decisions,
+                 totals.slices / totals.decisions, totals.slowestSlice * 1000))
+        print("  nodes: at most %d of %d in use, %.1f kept per turn on average"
+              % (totals.mostNodes, planner.size, totals.reused / totals.decisions))
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,220 @@
+# Micro-benchmark: table-driven move rules against the branching rules
+#
+# The baseline is the original Tile and Path, before the move tables, ported
+# as they were: canMoveToken walks Tile objects through its gauntlet of
+# tests (tile kind, own-piece check, rosette-protected enemy check, exact
+# bear-off). The branching version below walks the same gauntlet on
+# bitboard masks. bitboard's move tables are checked against what
+# buildMoveTables works out, and the branching version and the tables
+# against each other over random positions, before being timed; the
+# baseline and Path.canMoveToken are timed on the same positions, leaving
+# out entering moves, which Path has no tile for.
+#
+#   python benchmarks/bench_movetables.py [iterations]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import bitboard
+import rules
+
+def isShared(n):
+    return n >= 4 and n <= 11
+
+def isRosette(n):
+    return n in (3, 7, 13)
+
+def canMoveTokenBranching(state, tileNumber, n, player):
+    if n > 4 or n <= 0:
+        return False
+    if tileNumber + n > 14:
+        return False
+    if tileNumber == bitboard.OFF_BOARD:
+        if bitboard.getWaiting(state, player) == 0:
+            return False
+    elif not bitboard.getMask(state, player) >> tileNumber & 1:
+        return False
+    if tileNumber + n == 14:
+        return True
+    destinationTileNumber = tileNumber + n
+    if bitboard.getMask(state, player) >> destinationTileNumber & 1:
+        return False
+    if isShared(destinationTileNumber):
+        if bitboard.getMask(state, player ^ 1) >> destinationTileNumber & 1:
+            if isRosette(destinationTileNumber):
+                return False
+    return True
+
+# the original Tile and Path, as far as canMoveToken needs them
+class BaselineTile:
+    def __init__(self, number):
+        self.number = number
+        self.token = None
+
+    def getToken(self):
+        return self.token
+
+    def hasToken(self, player=None):
+        tokenValue = self.getToken()
+        if player == None:
+            return tokenValue != None
+        elif player == 0:
+            return tokenValue == 0 or tokenValue == 2
+        elif player == 1:
+            return tokenValue == 1 or tokenValue == 2
+        elif player == 2:
+            return tokenValue == 2
+
+    def getNumber(self):
+        return self.number
+
+    def isRosette(self):
+        rosetteNumbers = [3, 7, 13]
+        for n in rosetteNumbers:
+            if self.getNumber() == n:
+                return True
+        return False
+
+    def isShared(self):
+        return self.number >= 4 and self.number <=11
+
+class BaselinePath:
+    def __init__(self, state):
+        self.data = [BaselineTile(n) for n in range(14)]
+        for tile in self.data:
+            has0 = bitboard.hasToken(state, tile.number, 0)
+            has1 = bitboard.hasToken(state, tile.number, 1)
+            if has0 and has1:
+                tile.token = 2
+            elif has0:
+                tile.token = 0
+            elif has1:
+                tile.token = 1
+
+    def getTile(self, tileNumber):
+        return self.data[tileNumber]
+
+    def canMoveToken(self, tileNumber, n, player=None):
+        if not self.getTile(tileNumber).isShared():
+            assert player is not None
+        if n > 4 or n <= 0:
+            return False
+        if tileNumber + n > 14:
+            return False
+        if tileNumber + n == 14:
+            return True
+        tile = self.getTile(tileNumber)
+        if tile.isShared():
+            if not tile.hasToken():
+                return False
+            destinationTileNumber = tileNumber + n
+            destinationTile = self.getTile(destinationTileNumber)
+            tilePlayer = tile.getToken()
+            if destinationTile.hasToken(tilePlayer):
+                return False
+            if destinationTile.isShared():
+                if destinationTile.hasToken(not tilePlayer):
+                    if destinationTile.isRosette():
+                        return False
+        elif not tile.isShared():
+            if not tile.hasToken(player):
+                return False
+            destinationTileNumber = tileNumber + n
+            destinationTile = self.getTile(destinationTileNumber)
+            tilePlayer = player
+            if destinationTile.hasToken(tilePlayer):
+                return False
+            if destinationTile.isShared():
+                if destinationTile.hasToken(not tilePlayer):
+                    if destinationTile.isRosette():
+                        return False
+        return True
+
+# random legal-looking positions: shared tiles hold at most one token
+def randomState(rng):
+    mask0 = 0
+    mask1 = 0
+    for n in range(14):
+        r = rng.random()
+        if isShared(n):
+            if r < .25:
+                mask0 |= 1 << n
+            elif r < .5:
+                mask1 |= 1 << n
+        else:
+            if r < .3:
+                mask0 |= 1 << n
+            if rng.random() < .3:
+                mask1 |= 1 << n
+    waiting0 = max(0, bitboard.TOKENS_PER_PLAYER - bitboard.popCount(mask0) - rng.randint(0, 2))
+    waiting1 = max(0, bitboard.TOKENS_PER_PLAYER - bitboard.popCount(mask1) - rng.randint(0, 2))
+    return bitboard.pack(mask0, mask1, min(waiting0, 7), min(waiting1, 7))
+
+def makeQueries(count, seed=1):
+    rng = random.Random(seed)
+    states = [randomState(rng) for i in range(256)]
+    queries = []
+    for i in range(count):
+        queries.append((states[i % len(states)], rng.randint(-1, 13), rng.randint(0, 4), rng.randint(0, 1)))
+    return queries
+
+def check(queries):
+    assert bitboard.buildMoveTables() == (bitboard.MOVE_DEST, bitboard.MOVE_FLAGS, bitboard.MOVE_SOURCE,
+                                          bitboard.MOVE_FROM, bitboard.MOVE_TO, bitboard.MOVE_ENEMY), \
+        "bitboard's move tables don't match buildMoveTables()"
+    for state, tileNumber, n, player in queries:
+        assert bitboard.canMoveToken(state, tileNumber, n, player) == \
+            canMoveTokenBranching(state, tileNumber, n, player), (state, tileNumber, n, player)
+
+def timeIt(function, queries):
+    start = time.perf_counter()
+    for state, tileNumber, n, player in queries:
+        function(state, tileNumber, n, player)
+    return time.perf_counter() - start
+
+# the queries that don't enter a token, against objects made from each
+# state by makePath
+def makePathQueries(queries, makePath):
+    paths = {}
+    pathQueries = []
+    for state, tileNumber, n, player in queries:
+        if tileNumber == bitboard.OFF_BOARD:
+            continue
+        if state not in paths:
+            paths[state] = makePath(state)
+        pathQueries.append((paths[state], tileNumber, n, player))
+    return pathQueries
+
+def timePath(pathQueries):
+    start = time.perf_counter()
+    for path, tileNumber, n, player in pathQueries:
+        path.canMoveToken(tileNumber, n, player)
+    return time.perf_counter() - start
+
+def main(iterations=200000):
+    queries = makeQueries(iterations)
+    check(queries)
+    onPath = [query for query in queries if query[1] != bitboard.OFF_BOARD]
+    baselineQueries = makePathQueries(queries, BaselinePath)
+    pathQueries = makePathQueries(queries, lambda state: bitboard.toPath(state, rules.Path()))
+    baseline = timePath(baselineQueries) / len(onPath)
+    path = timePath(pathQueries) / len(onPath)
+    tablesOnPath = timeIt(bitboard.canMoveToken, onPath) / len(onPath)
+    branching = timeIt(canMoveTokenBranching, queries) / iterations
+    table = timeIt(bitboard.canMoveToken, queries) / iterations
+    move = timeIt(bitboard.moveToken, queries) / iterations
+    print("canMoveToken, %d queries, %d of them not entering" % (iterations, len(onPath)))
+    print("  original Path: %8.1f ns/call" % (baseline * 1e9))
+    print("  Path:          %8.1f ns/call  (%.2fx original)" % (path * 1e9, baseline / path))
+    print("  tables:        %8.1f ns/call  (%.2fx original)" % (tablesOnPath * 1e9, baseline / tablesOnPath))
+    print("canMoveToken, all %d queries" % iterations)
+    print("  branching:     %8.1f ns/call" % (branching * 1e9))
+    print("  tables:        %8.1f ns/call  (%.2fx branching)" % (table * 1e9, branching / table))
+    print("moveToken, tables: %8.1f ns/call" % (move * 1e9))
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
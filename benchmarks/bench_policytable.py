@@ -0,0 +1,127 @@
+# How big the policy table is, how fast moves come out of it, and how good
+#
+# Builds a policy table from a solved table (see policytable; solve one with
+# python solver.py 3 or 4) unless one is given, then reports its size, how
+# long a lookup takes and how often its move is a best move by the solved
+# values, over endgame positions from random games.
+#
+# Then plays games on a FakeTrellis against the "table" engine, as the
+# device would, pressing the keys for the move ai.moveOrder likes best, and
+# times the computer's moves that came from the table and the frame slices
+# of searching for the rest. Exits with an error if a table move wasn't a best move.
+#
+#   python benchmarks/bench_policytable.py solvedTable [policyTable] [games] [seed]
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ai
+import bitboard
+import hardware
+import layout
+import policytable
+import rules
+import ur
+
+SEARCH_THINK_TIME = .01 # keeps the searched opening moves quick
+
+# the presses for the move ai.moveOrder likes best, a player good enough to
+# get games to the endgame; bench_game's brings every token on first
+def nextPresses(board):
+    if board.stage == "roll":
+        return [rules.DICE_ROLL_BUTTON]
+    if board.stage != "move":
+        return []
+    moves = ai.orderedMoves(board.path.state(), board.dice.getSum(), board.turn)
+    if not moves:
+        return []
+    key = board.keyOf(moves[0])
+    return [key, key]
+
+# median and slowest of times, in microseconds
+def spread(times):
+    if not times:
+        return "none"
+    times = sorted(times)
+    return "median %.1f us, slowest %.1f us" % (times[len(times) // 2] * 1e6, times[-1] * 1e6)
+
+# a policytable.TablePlayer that notes how long each table lookup and each
+# frame's slice of searching took
+class TimedPlayer(policytable.TablePlayer):
+    def __init__(self, table, searcher):
+        policytable.TablePlayer.__init__(self, table, searcher)
+        self.lookups = []
+        self.slices = []
+
+    def lookUp(self, state, n, player):
+        if self.key == state | player << bitboard.STATE_BITS | n << (bitboard.STATE_BITS + 1):
+            return self.move
+        start = time.perf_counter()
+        tileNumber = policytable.TablePlayer.lookUp(self, state, n, player)
+        if tileNumber is not None:
+            self.lookups.append(time.perf_counter() - start)
+        return tileNumber
+
+    # frames after the search is done don't count as slices
+    def think(self, state, n, player):
+        searcher = self.searcher
+        key = searcher.key
+        spent = searcher.spent
+        start = time.perf_counter()
+        policytable.TablePlayer.think(self, state, n, player)
+        if self.move is None and (searcher.key != key or searcher.spent != spent):
+            self.slices.append(time.perf_counter() - start)
+
+# games between nextPresses and the table engine on a FakeTrellis. Returns
+# the seconds each table lookup and each slice of searching took
+def playGames(path, games, seed):
+    random.seed(seed)
+    policytable.TABLE_PATH = path
+    lookups = []
+    slices = []
+    for game in range(games):
+        trellis = hardware.FakeTrellis()
+        board = rules.Board(1, layout.STANDARD, trellis.monotonic, "table")
+        timed = TimedPlayer(board.searcher.table, ai.Searcher(thinkTime=SEARCH_THINK_TIME))
+        board.searcher = timed
+        game = ur.Game(trellis, board)
+        while board.stage != "won":
+            if not board.isComputerTurn():
+                for button in nextPresses(board):
+                    trellis.press(button)
+            ur.run(game, 1)
+            while not trellis.scriptDone():
+                ur.run(game, 1)
+        timed.table.close()
+        lookups += timed.lookups
+        slices += timed.slices
+    return lookups, slices
+
+def main(solvedPath, path=None, games=20, seed=1):
+    directory = None
+    if path is None:
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "ur-policy.bin")
+        start = time.perf_counter()
+        stats = policytable.build(solvedPath, path, log=None)
+        print("built %s in %.1f s: %d of %d positions have a move other than the first, "
+              "%d moves further down than fit"
+              % (path, time.perf_counter() - start, stats["nonzero"], stats["positions"], stats["clipped"]))
+    try:
+        asGood, checked = policytable.check(path, solvedPath, seed=int(seed))
+        lookups, slices = playGames(path, int(games), int(seed))
+        print("%s games on the simulator: %d moves from the table (%s), %d slices of searching (%s)"
+              % (games, len(lookups), spread(lookups), len(slices), spread(slices)))
+        return 0 if asGood == checked else 1
+    finally:
+        if directory is not None:
+            os.remove(path)
+            os.rmdir(directory)
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:]))
@@ -0,0 +1,140 @@
+# How many moves a second the game server keeps up with
+#
+# Starts server.py in its own process on a Unix socket (or uses the server at
+# address) and plays games on it, games at once spread over connections
+# connections, for seconds seconds: each game rolls and moves a random legal
+# token until it's won, then a new one is started in its place. With bot set
+# to 1 the server plays player 1 of every game with its search.
+#
+# Reports the moves and rolls a second the server handled and how long a
+# move took to come back, measured at the client from sending it to reading
+# the reply, including the bot's turn that follows it.
+#
+#   python benchmarks/bench_server.py [games] [seconds] [bot] [connections] [address]
+
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import server
+
+# one connection to the server, with any number of requests in flight
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.waiting = {}
+        self.nextId = 1
+        self.readTask = asyncio.ensure_future(self.read())
+
+    async def read(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            future = self.waiting.pop(reply.get("id"), None)
+            if future is not None:
+                future.set_result(reply)
+
+    async def request(self, message):
+        message["id"] = self.nextId
+        self.nextId += 1
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[message["id"]] = future
+        self.writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+        reply = await future
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    def close(self):
+        self.readTask.cancel()
+        self.writer.close()
+
+class Tally:
+    def __init__(self):
+        self.moveTimes = []
+        self.rolls = 0
+        self.plies = 0
+        self.games = 0
+
+async def connect(address):
+    tcp = server.parseAddress(address)
+    if tcp is None:
+        reader, writer = await asyncio.open_unix_connection(address)
+    else:
+        reader, writer = await asyncio.open_connection(tcp[0], tcp[1])
+    return Client(reader, writer)
+
+# plays games on client, one after another, until deadline
+async def playGames(client, bot, seed, deadline, tally):
+    rng = random.Random(seed)
+    new = {"op": "new"}
+    if bot:
+        new["bot"] = 1
+    reply = await client.request(dict(new))
+    while time.perf_counter() < deadline:
+        tally.plies += len(reply["plies"])
+        if reply["stage"] == "won":
+            tally.games += 1
+            reply = await client.request(dict(new))
+        elif reply["stage"] == "roll":
+            reply = await client.request({"op": "roll", "game": reply["game"]})
+            tally.rolls += 1
+        else:
+            start = time.perf_counter()
+            reply = await client.request({"op": "move", "game": reply["game"], "tile": rng.choice(reply["moves"])})
+            tally.moveTimes.append(time.perf_counter() - start)
+
+async def load(address, games, seconds, bot, connections):
+    clients = [await connect(address) for i in range(connections)]
+    tally = Tally()
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*[playGames(clients[i % connections], bot, i, deadline, tally) for i in range(games)])
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        client.close()
+    return tally, elapsed
+
+# starts a server in its own process on a Unix socket in directory
+def startServer(directory):
+    address = os.path.join(directory, "ur.sock")
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), address],
+                               stdout=subprocess.PIPE, universal_newlines=True)
+    process.stdout.readline() # "serving on", once it's listening
+    return process, address
+
+def main(games=1000, seconds=10, bot=0, connections=None, address=None):
+    games = int(games)
+    seconds = float(seconds)
+    bot = int(bot)
+    connections = int(connections) if connections else max(1, games // 50)
+    process = None
+    directory = tempfile.mkdtemp()
+    if address is None:
+        process, address = startServer(directory)
+    try:
+        tally, elapsed = asyncio.run(load(address, games, seconds, bot, connections))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    times = sorted(tally.moveTimes)
+    print("%d games at once on %d connections%s, %.1f s" % (games, connections, " against bots" if bot else "", elapsed))
+    print("%.0f moves/s, %.0f rolls/s, %.0f plies/s, %d games finished"
+          % (len(times) / elapsed, tally.rolls / elapsed, tally.plies / elapsed, tally.games))
+    print("move latency: median %.2f ms, 99th percentile %.2f ms, slowest %.2f ms"
+          % (times[len(times) // 2] * 1000, times[len(times) * 99 // 100] * 1000, times[-1] * 1000))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
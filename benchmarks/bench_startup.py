@@ -0,0 +1,73 @@
+# How long the game takes to start
+#
+# Times importing ur, rules and render each in a fresh interpreter, the way
+# the device starts code.py, taking the best of a few runs. Lists which of
+# the optional modules (the engines, hints, the recorder, the profiler,
+# NumPy) importing ur pulled in, which should be none of them: they're only
+# imported when a setting turns them on. Then times making the game on a
+# FakeTrellis and running its first frame, the first time round (when the
+# pulse tables are built) and at best.
+#
+# On the device, DEBUGGING = True prints how long after power on the first
+# frame was drawn.
+#
+#   python benchmarks/bench_startup.py [runs]
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+OPTIONAL = ("ai", "mcts", "policytable", "hints", "record", "profiler", "numpy")
+
+# run in a fresh interpreter: prints the seconds module took to import, then
+# the optional modules that came with it
+IMPORT_SCRIPT = """
+import sys, time
+sys.path.insert(0, %r)
+start = time.perf_counter()
+import %s
+print(time.perf_counter() - start)
+print(" ".join(name for name in %r if name in sys.modules))
+"""
+
+def timeImport(module, runs):
+    best = None
+    for run in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", IMPORT_SCRIPT % (ROOT, module, OPTIONAL)],
+            universal_newlines=True).split("\n")
+        seconds = float(output[0])
+        if best is None or seconds < best:
+            best = seconds
+    return best, output[1].split()
+
+def main(runs=5):
+    runs = int(runs)
+    for module in ("rules", "render", "ur"):
+        seconds, optional = timeImport(module, runs)
+        print("import %-6s %6.2f ms, optional modules imported: %s" % (module, seconds * 1000, ", ".join(optional) or "none"))
+
+    import hardware
+    import ur
+    first = None
+    best = None
+    for run in range(runs):
+        trellis = hardware.FakeTrellis()
+        start = time.perf_counter()
+        game = ur.makeGame(trellis, profile=False)
+        made = time.perf_counter()
+        ur.run(game, 1)
+        drawn = time.perf_counter()
+        if first is None:
+            first = (made - start, drawn - start)
+        if best is None or drawn - start < best[1]:
+            best = (made - start, drawn - start)
+    for name, times in (("first", first), ("best", best)):
+        print("%-5s makeGame %.2f ms, first frame drawn %.2f ms after starting" % (name, times[0] * 1000, times[1] * 1000))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
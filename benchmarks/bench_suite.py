@@ -0,0 +1,231 @@
+# The hot paths, timed and checked against a baseline
+#
+# Times the rules' and the drawing's hot paths on desktop Python with a
+# FakeTrellis: Path.canMoveToken, Path.moveToken, Path.getTileByCoordinate
+# and generateTokenPrintInstructions on random positions, a whole painted
+# frame with the roll button pulsing and with a token selected, and whole
+# games played by bench_game's scripted player. Each is the best of REPEATS
+# runs, in microseconds per operation.
+#
+# Alongside the time, each reports the heap bytes an operation allocates:
+# the most it had allocated at once, above where it started, averaged over
+# ALLOC_OPS of them and measured with tracemalloc. On the device that's what
+# brings the next garbage collection closer.
+#
+#   python benchmarks/bench_suite.py                      run and print
+#   python benchmarks/bench_suite.py record [baseline]    save as the baseline
+#   python benchmarks/bench_suite.py compare [baseline] [threshold]
+#
+# compare exits with status 1 if any benchmark got more than threshold
+# (default 0.2, 20%) slower or allocates more than threshold more than the
+# baseline, which is where a benchmark that allocated nothing mustn't start
+# to. Times only compare on the machine the baseline was recorded on.
+
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import bench_alloc
+import bench_game
+import bitboard
+import hardware
+import layout
+import rules
+import ur
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+THRESHOLD = .2
+REPEATS = 5
+RETRIES = 2
+ALLOC_OPS = 100     # operations traced to measure allocations
+POSITIONS = 200
+SEED = 1
+
+# random positions from random games, as (state, player to move)
+def randomPositions(count, rng):
+    positions = []
+    state = bitboard.START
+    player = 0
+    while len(positions) < count:
+        n = rng.choice((0, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2, 3, 3, 3, 3, 4))
+        moves = bitboard.legalMoves(state, n, player) if n else []
+        if moves:
+            positions.append((state, player))
+            tileNumber = rng.choice(moves)
+            state = bitboard.moveToken(state, tileNumber, n, player)
+            if bitboard.isWon(state, player):
+                state = bitboard.START
+        player ^= 1
+    return positions
+
+# Each benchmark below is a function taking a count and returning a function
+# to time and the arguments for count calls of it; everything set up for
+# them is done outside of what's timed
+
+def benchCanMoveToken(count):
+    rng = random.Random(SEED)
+    calls = []
+    for state, player in randomPositions(POSITIONS, rng):
+        path = bitboard.toPath(state, rules.Path())
+        for i in range(count // POSITIONS + 1):
+            calls.append((path, rng.randrange(bitboard.PATH_LENGTH), rng.randint(1, 4), player))
+    return rules.Path.canMoveToken, calls[:count]
+
+# every move is made on a fresh Path, since it changes it
+def benchMoveToken(count):
+    rng = random.Random(SEED)
+    calls = []
+    positions = randomPositions(POSITIONS, rng)
+    i = 0
+    while len(calls) < count:
+        state, player = positions[i % POSITIONS]
+        i += 1
+        n = rng.randint(1, 4)
+        legal = [t for t in bitboard.legalMoves(state, n, player) if t != bitboard.OFF_BOARD]
+        if legal:
+            calls.append((bitboard.toPath(state, rules.Path()), rng.choice(legal), n, player))
+    return rules.Path.moveToken, calls
+
+# the keys on the path; any other key prints that it isn't
+def benchGetTileByCoordinate(count):
+    path = rules.Path()
+    keys = [(x, y) for y in range(layout.HEIGHT) for x in range(layout.WIDTH)
+            if path.byKey[y * layout.WIDTH + x] is not None]
+    calls = [(path, key) for key in keys]
+    return rules.Path.getTileByCoordinate, (calls * (count // len(calls) + 1))[:count]
+
+def benchTokenPrintInstructions(count):
+    rng = random.Random(SEED)
+    calls = [(bitboard.toPath(state, rules.Path()),) for state, player in randomPositions(POSITIONS, rng)]
+    return rules.Path.generateTokenPrintInstructions, (calls * (count // POSITIONS + 1))[:count]
+
+# frames painted a frame's time apart, as the main loop paints them
+def benchFrames(stage, count):
+    trellis, game = stage()
+    renderer = game.renderer
+    bench_alloc.warmUp(game)
+    def paintFrame(frameTime):
+        trellis.tick(frameTime)
+        renderer.paintBoard()
+    return paintFrame, [(1 / 30,)] * count
+
+def benchRollFrame(count):
+    return benchFrames(bench_alloc.rollStage, count)
+
+def benchMoveFrame(count):
+    return benchFrames(bench_alloc.moveStage, count)
+
+# a whole game from the test board through the main loop, from seed
+def playGame(seed):
+    random.seed(seed)
+    trellis = hardware.FakeTrellis()
+    game = ur.makeGame(trellis, profile=False)
+    board = game.board
+    while True:
+        presses = bench_game.nextPresses(board)
+        if presses is None:
+            break
+        for button in presses:
+            trellis.press(button)
+        ur.run(game, 1)
+        while not trellis.scriptDone():
+            ur.run(game, 1)
+
+def benchGame(count):
+    return playGame, [(seed,) for seed in range(count)]
+
+# (name, benchmark, calls timed per run), enough calls for a run to take
+# tens of milliseconds, long enough to time steadily
+BENCHMARKS = (
+    ("Path.canMoveToken", benchCanMoveToken, 100000),
+    ("Path.moveToken", benchMoveToken, 20000),
+    ("Path.getTileByCoordinate", benchGetTileByCoordinate, 300000),
+    ("generateTokenPrintInstructions", benchTokenPrintInstructions, 10000),
+    ("frame, roll button pulsing", benchRollFrame, 5000),
+    ("frame, token selected", benchMoveFrame, 5000),
+    ("scripted game", benchGame, 3),
+)
+
+# the best time of REPEATS runs, in seconds per call
+def timeOf(benchmark, count):
+    best = None
+    for repeat in range(REPEATS):
+        function, calls = benchmark(count)
+        start = time.perf_counter()
+        for args in calls:
+            function(*args)
+        seconds = (time.perf_counter() - start) / count
+        if best is None or seconds < best:
+            best = seconds
+    return best
+
+# the mean of the most heap bytes a call had allocated at once, above where
+# it started
+def allocationsOf(benchmark, count):
+    function, calls = benchmark(count)
+    total = 0
+    tracemalloc.start()
+    for args in calls:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        function(*args)
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / count
+
+# {name: {"us": microseconds per operation, "bytes": heap bytes per operation}}
+def runAll():
+    results = {}
+    for name, benchmark, count in BENCHMARKS:
+        results[name] = {"us": timeOf(benchmark, count) * 1e6,
+                         "bytes": allocationsOf(benchmark, min(ALLOC_OPS, count))}
+        print("%-32s %10.2f us/op %10.1f bytes/op" % (name, results[name]["us"], results[name]["bytes"]))
+    return results
+
+# the benchmarks that regressed against baseline, as lines to print. A
+# benchmark that looks slower is timed again, up to RETRIES times, before
+# it counts: a real regression is slow every time, a busy machine isn't
+def regressions(results, baseline, threshold):
+    lines = []
+    for name, benchmark, count in BENCHMARKS:
+        result = results[name]
+        old = baseline.get(name)
+        if old is None:
+            continue
+        limit = old["us"] * (1 + threshold)
+        for retry in range(RETRIES):
+            if result["us"] <= limit:
+                break
+            result["us"] = min(result["us"], timeOf(benchmark, count) * 1e6)
+        if result["us"] > limit:
+            lines.append("%s: %.2f us/op, was %.2f" % (name, result["us"], old["us"]))
+        if result["bytes"] > old["bytes"] * (1 + threshold):
+            lines.append("%s: %.1f bytes/op, was %.1f" % (name, result["bytes"], old["bytes"]))
+    return lines
+
+def main(mode="run", path=BASELINE, threshold=THRESHOLD):
+    results = runAll()
+    if mode == "record":
+        with open(path, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print("baseline saved to %s" % path)
+    elif mode == "compare":
+        with open(path) as f:
+            baseline = json.load(f)
+        lines = regressions(results, baseline, float(threshold))
+        for line in lines:
+            print("REGRESSED " + line)
+        if lines:
+            return 1
+        print("ok, within %.0f%% of %s" % (float(threshold) * 100, path))
+    elif mode != "run":
+        raise ValueError("unknown mode %s" % mode)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:]))
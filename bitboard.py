@@ -0,0 +1,432 @@
+# Compact integer representation of a game of Ur
+# -----------------------------------------------
+# A position is a single int, so it can be copied, compared, hashed and stored
+# in dicts and sets as cheaply as any other number. The bits are laid out as:
+#
+#   bits 0-13  : player 0's occupancy mask, bit n set if p0 has a token on tile n
+#   bits 14-27 : player 1's occupancy mask
+#   bits 28-30 : how many of player 0's tokens are still waiting to enter
+#   bits 31-33 : how many of player 1's tokens are still waiting to enter
+#
+# Tokens that are neither on the path nor waiting have been borne off, so the
+# home counts don't need to be stored. Tile numbers are the same as Path's:
+# 0-3 and 12-13 are split (private) tiles, 4-11 are shared. A waiting token
+# is moved by passing OFF_BOARD as its tile number.
+
+TOKENS_PER_PLAYER = 7
+PATH_LENGTH = 14
+OFF_BOARD = -1
+
+MASK_BITS = PATH_LENGTH
+PATH_MASK = (1 << MASK_BITS) - 1
+WAITING_SHIFT = 2 * MASK_BITS
+WAITING_BITS = 3
+WAITING_MASK = (1 << WAITING_BITS) - 1
+STATE_BITS = WAITING_SHIFT + 2 * WAITING_BITS
+
+ROSETTES = (3, 7, 13)
+ROSETTE_MASK = (1 << 3) | (1 << 7) | (1 << 13)
+SHARED_MASK = ((1 << 12) - 1) & ~((1 << 4) - 1) # tiles 4 to 11
+
+# builds a position from its parts
+def pack(mask0, mask1, waiting0, waiting1):
+    return (mask0
+            | mask1 << MASK_BITS
+            | waiting0 << WAITING_SHIFT
+            | waiting1 << (WAITING_SHIFT + WAITING_BITS))
+
+# splits a position into (mask0, mask1, waiting0, waiting1)
+def unpack(state):
+    return (state & PATH_MASK,
+            (state >> MASK_BITS) & PATH_MASK,
+            (state >> WAITING_SHIFT) & WAITING_MASK,
+            (state >> (WAITING_SHIFT + WAITING_BITS)) & WAITING_MASK)
+
+START = pack(0, 0, TOKENS_PER_PLAYER, TOKENS_PER_PLAYER)
+
+def getMask(state, player):
+    return (state >> (player * MASK_BITS)) & PATH_MASK
+
+def getWaiting(state, player):
+    return (state >> (WAITING_SHIFT + player * WAITING_BITS)) & WAITING_MASK
+
+def popCount(mask):
+    count = 0
+    while mask:
+        mask &= mask - 1
+        count += 1
+    return count
+
+# number of tokens player has borne off
+def getHome(state, player):
+    return TOKENS_PER_PLAYER - getWaiting(state, player) - popCount(getMask(state, player))
+
+def isWon(state, player):
+    return getWaiting(state, player) == 0 and getMask(state, player) == 0
+
+def hasToken(state, tileNumber, player):
+    if tileNumber == OFF_BOARD:
+        return getWaiting(state, player) > 0
+    return bool(getMask(state, player) >> tileNumber & 1)
+
+# Move tables
+# -----------
+# Every static fact about a move depends only on (player, tile, roll), so it
+# is worked out ahead of time and canMoveToken/moveToken reduce to a few
+# table reads and mask tests on the packed position. Tables are flat tuples
+# indexed by moveIndex(); entries for rolls of 0 are left as NO_MOVE.
+
+NO_MOVE = -2
+
+# move flags
+BEAR_OFF = 1 # the move takes the token off the end of the path
+ROSETTE = 2  # the move lands on a rosette and earns another roll
+CAPTURE = 4  # the move lands on a shared tile an enemy token can be taken from
+SAFE = 8     # the move lands on a shared rosette an enemy token is safe on
+
+TILE_SLOTS = PATH_LENGTH + 1 # tile numbers OFF_BOARD to 13
+ROLL_SLOTS = 5               # rolls 0 to 4
+
+def moveIndex(tileNumber, n, player):
+    return (player * TILE_SLOTS + tileNumber + 1) * ROLL_SLOTS + n
+
+def waitingShift(player):
+    return WAITING_SHIFT + player * WAITING_BITS
+
+# works the move tables out from the rules, as (MOVE_DEST, MOVE_FLAGS,
+# MOVE_SOURCE, MOVE_FROM, MOVE_TO, MOVE_ENEMY). The tables below are its
+# output written out as constants, so importing bitboard doesn't build them
+# on the device; bench_movetables checks they still match
+def buildMoveTables():
+    moveDest, moveFlags, moveSource, moveFrom, moveTo, moveEnemy = [], [], [], [], [], []
+    for player in (0, 1):
+        enemy = player ^ 1
+        for tileNumber in range(OFF_BOARD, PATH_LENGTH):
+            for n in range(ROLL_SLOTS):
+                destinationTileNumber = tileNumber + n
+                if n == 0 or destinationTileNumber > PATH_LENGTH:
+                    moveDest.append(NO_MOVE)
+                    moveFlags.append(0)
+                    moveSource.append(0)
+                    moveFrom.append(0)
+                    moveTo.append(0)
+                    moveEnemy.append(0)
+                    continue
+                if tileNumber == OFF_BOARD:
+                    source = WAITING_MASK << waitingShift(player)
+                    lift = 1 << waitingShift(player)
+                else:
+                    source = 1 << (tileNumber + player * MASK_BITS)
+                    lift = source
+                flags = 0
+                place = 0
+                enemyBit = 0
+                if destinationTileNumber == PATH_LENGTH:
+                    flags |= BEAR_OFF
+                else:
+                    destinationBit = 1 << destinationTileNumber
+                    place = destinationBit << (player * MASK_BITS)
+                    if destinationBit & ROSETTE_MASK:
+                        flags |= ROSETTE
+                    if destinationBit & SHARED_MASK:
+                        enemyBit = destinationBit << (enemy * MASK_BITS)
+                        if flags & ROSETTE:
+                            flags |= SAFE
+                        else:
+                            flags |= CAPTURE
+                moveDest.append(destinationTileNumber)
+                moveFlags.append(flags)
+                moveSource.append(source)
+                moveFrom.append(lift)
+                moveTo.append(place)
+                moveEnemy.append(enemyBit)
+    return (tuple(moveDest), tuple(moveFlags), tuple(moveSource), tuple(moveFrom), tuple(moveTo),
+            tuple(moveEnemy))
+
+# destination tile number, PATH_LENGTH for bearing off
+MOVE_DEST = (
+    # player 0, a row per tile number from OFF_BOARD, a column per roll 0-4
+    -2, 0, 1, 2, 3,
+    -2, 1, 2, 3, 4,
+    -2, 2, 3, 4, 5,
+    -2, 3, 4, 5, 6,
+    -2, 4, 5, 6, 7,
+    -2, 5, 6, 7, 8,
+    -2, 6, 7, 8, 9,
+    -2, 7, 8, 9, 10,
+    -2, 8, 9, 10, 11,
+    -2, 9, 10, 11, 12,
+    -2, 10, 11, 12, 13,
+    -2, 11, 12, 13, 14,
+    -2, 12, 13, 14, -2,
+    -2, 13, 14, -2, -2,
+    -2, 14, -2, -2, -2,
+    # player 1
+    -2, 0, 1, 2, 3,
+    -2, 1, 2, 3, 4,
+    -2, 2, 3, 4, 5,
+    -2, 3, 4, 5, 6,
+    -2, 4, 5, 6, 7,
+    -2, 5, 6, 7, 8,
+    -2, 6, 7, 8, 9,
+    -2, 7, 8, 9, 10,
+    -2, 8, 9, 10, 11,
+    -2, 9, 10, 11, 12,
+    -2, 10, 11, 12, 13,
+    -2, 11, 12, 13, 14,
+    -2, 12, 13, 14, -2,
+    -2, 13, 14, -2, -2,
+    -2, 14, -2, -2, -2,
+)
+
+# BEAR_OFF | ROSETTE | CAPTURE | SAFE
+MOVE_FLAGS = (
+    # player 0, a row per tile number from OFF_BOARD, a column per roll 0-4
+    0, 0, 0, 0, 2,
+    0, 0, 0, 2, 4,
+    0, 0, 2, 4, 4,
+    0, 2, 4, 4, 4,
+    0, 4, 4, 4, 10,
+    0, 4, 4, 10, 4,
+    0, 4, 10, 4, 4,
+    0, 10, 4, 4, 4,
+    0, 4, 4, 4, 4,
+    0, 4, 4, 4, 0,
+    0, 4, 4, 0, 2,
+    0, 4, 0, 2, 1,
+    0, 0, 2, 1, 0,
+    0, 2, 1, 0, 0,
+    0, 1, 0, 0, 0,
+    # player 1
+    0, 0, 0, 0, 2,
+    0, 0, 0, 2, 4,
+    0, 0, 2, 4, 4,
+    0, 2, 4, 4, 4,
+    0, 4, 4, 4, 10,
+    0, 4, 4, 10, 4,
+    0, 4, 10, 4, 4,
+    0, 10, 4, 4, 4,
+    0, 4, 4, 4, 4,
+    0, 4, 4, 4, 0,
+    0, 4, 4, 0, 2,
+    0, 4, 0, 2, 1,
+    0, 0, 2, 1, 0,
+    0, 2, 1, 0, 0,
+    0, 1, 0, 0, 0,
+)
+
+# bits of the position that must be set for a token to move
+MOVE_SOURCE = (
+    # player 0, a row per tile number from OFF_BOARD, a column per roll 0-4
+    0, 0x70000000, 0x70000000, 0x70000000, 0x70000000,
+    0, 0x1, 0x1, 0x1, 0x1,
+    0, 0x2, 0x2, 0x2, 0x2,
+    0, 0x4, 0x4, 0x4, 0x4,
+    0, 0x8, 0x8, 0x8, 0x8,
+    0, 0x10, 0x10, 0x10, 0x10,
+    0, 0x20, 0x20, 0x20, 0x20,
+    0, 0x40, 0x40, 0x40, 0x40,
+    0, 0x80, 0x80, 0x80, 0x80,
+    0, 0x100, 0x100, 0x100, 0x100,
+    0, 0x200, 0x200, 0x200, 0x200,
+    0, 0x400, 0x400, 0x400, 0x400,
+    0, 0x800, 0x800, 0x800, 0,
+    0, 0x1000, 0x1000, 0, 0,
+    0, 0x2000, 0, 0, 0,
+    # player 1
+    0, 0x380000000, 0x380000000, 0x380000000, 0x380000000,
+    0, 0x4000, 0x4000, 0x4000, 0x4000,
+    0, 0x8000, 0x8000, 0x8000, 0x8000,
+    0, 0x10000, 0x10000, 0x10000, 0x10000,
+    0, 0x20000, 0x20000, 0x20000, 0x20000,
+    0, 0x40000, 0x40000, 0x40000, 0x40000,
+    0, 0x80000, 0x80000, 0x80000, 0x80000,
+    0, 0x100000, 0x100000, 0x100000, 0x100000,
+    0, 0x200000, 0x200000, 0x200000, 0x200000,
+    0, 0x400000, 0x400000, 0x400000, 0x400000,
+    0, 0x800000, 0x800000, 0x800000, 0x800000,
+    0, 0x1000000, 0x1000000, 0x1000000, 0x1000000,
+    0, 0x2000000, 0x2000000, 0x2000000, 0,
+    0, 0x4000000, 0x4000000, 0, 0,
+    0, 0x8000000, 0, 0, 0,
+)
+
+# amount taken off the position to lift the token
+MOVE_FROM = (
+    # player 0, a row per tile number from OFF_BOARD, a column per roll 0-4
+    0, 0x10000000, 0x10000000, 0x10000000, 0x10000000,
+    0, 0x1, 0x1, 0x1, 0x1,
+    0, 0x2, 0x2, 0x2, 0x2,
+    0, 0x4, 0x4, 0x4, 0x4,
+    0, 0x8, 0x8, 0x8, 0x8,
+    0, 0x10, 0x10, 0x10, 0x10,
+    0, 0x20, 0x20, 0x20, 0x20,
+    0, 0x40, 0x40, 0x40, 0x40,
+    0, 0x80, 0x80, 0x80, 0x80,
+    0, 0x100, 0x100, 0x100, 0x100,
+    0, 0x200, 0x200, 0x200, 0x200,
+    0, 0x400, 0x400, 0x400, 0x400,
+    0, 0x800, 0x800, 0x800, 0,
+    0, 0x1000, 0x1000, 0, 0,
+    0, 0x2000, 0, 0, 0,
+    # player 1
+    0, 0x80000000, 0x80000000, 0x80000000, 0x80000000,
+    0, 0x4000, 0x4000, 0x4000, 0x4000,
+    0, 0x8000, 0x8000, 0x8000, 0x8000,
+    0, 0x10000, 0x10000, 0x10000, 0x10000,
+    0, 0x20000, 0x20000, 0x20000, 0x20000,
+    0, 0x40000, 0x40000, 0x40000, 0x40000,
+    0, 0x80000, 0x80000, 0x80000, 0x80000,
+    0, 0x100000, 0x100000, 0x100000, 0x100000,
+    0, 0x200000, 0x200000, 0x200000, 0x200000,
+    0, 0x400000, 0x400000, 0x400000, 0x400000,
+    0, 0x800000, 0x800000, 0x800000, 0x800000,
+    0, 0x1000000, 0x1000000, 0x1000000, 0x1000000,
+    0, 0x2000000, 0x2000000, 0x2000000, 0,
+    0, 0x4000000, 0x4000000, 0, 0,
+    0, 0x8000000, 0, 0, 0,
+)
+
+# amount added to the position to place it, also its own bit
+MOVE_TO = (
+    # player 0, a row per tile number from OFF_BOARD, a column per roll 0-4
+    0, 0x1, 0x2, 0x4, 0x8,
+    0, 0x2, 0x4, 0x8, 0x10,
+    0, 0x4, 0x8, 0x10, 0x20,
+    0, 0x8, 0x10, 0x20, 0x40,
+    0, 0x10, 0x20, 0x40, 0x80,
+    0, 0x20, 0x40, 0x80, 0x100,
+    0, 0x40, 0x80, 0x100, 0x200,
+    0, 0x80, 0x100, 0x200, 0x400,
+    0, 0x100, 0x200, 0x400, 0x800,
+    0, 0x200, 0x400, 0x800, 0x1000,
+    0, 0x400, 0x800, 0x1000, 0x2000,
+    0, 0x800, 0x1000, 0x2000, 0,
+    0, 0x1000, 0x2000, 0, 0,
+    0, 0x2000, 0, 0, 0,
+    0, 0, 0, 0, 0,
+    # player 1
+    0, 0x4000, 0x8000, 0x10000, 0x20000,
+    0, 0x8000, 0x10000, 0x20000, 0x40000,
+    0, 0x10000, 0x20000, 0x40000, 0x80000,
+    0, 0x20000, 0x40000, 0x80000, 0x100000,
+    0, 0x40000, 0x80000, 0x100000, 0x200000,
+    0, 0x80000, 0x100000, 0x200000, 0x400000,
+    0, 0x100000, 0x200000, 0x400000, 0x800000,
+    0, 0x200000, 0x400000, 0x800000, 0x1000000,
+    0, 0x400000, 0x800000, 0x1000000, 0x2000000,
+    0, 0x800000, 0x1000000, 0x2000000, 0x4000000,
+    0, 0x1000000, 0x2000000, 0x4000000, 0x8000000,
+    0, 0x2000000, 0x4000000, 0x8000000, 0,
+    0, 0x4000000, 0x8000000, 0, 0,
+    0, 0x8000000, 0, 0, 0,
+    0, 0, 0, 0, 0,
+)
+
+# the enemy's bit on the destination if it is shared
+MOVE_ENEMY = (
+    # player 0, a row per tile number from OFF_BOARD, a column per roll 0-4
+    0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0x40000,
+    0, 0, 0, 0x40000, 0x80000,
+    0, 0, 0x40000, 0x80000, 0x100000,
+    0, 0x40000, 0x80000, 0x100000, 0x200000,
+    0, 0x80000, 0x100000, 0x200000, 0x400000,
+    0, 0x100000, 0x200000, 0x400000, 0x800000,
+    0, 0x200000, 0x400000, 0x800000, 0x1000000,
+    0, 0x400000, 0x800000, 0x1000000, 0x2000000,
+    0, 0x800000, 0x1000000, 0x2000000, 0,
+    0, 0x1000000, 0x2000000, 0, 0,
+    0, 0x2000000, 0, 0, 0,
+    0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0,
+    # player 1
+    0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0x10,
+    0, 0, 0, 0x10, 0x20,
+    0, 0, 0x10, 0x20, 0x40,
+    0, 0x10, 0x20, 0x40, 0x80,
+    0, 0x20, 0x40, 0x80, 0x100,
+    0, 0x40, 0x80, 0x100, 0x200,
+    0, 0x80, 0x100, 0x200, 0x400,
+    0, 0x100, 0x200, 0x400, 0x800,
+    0, 0x200, 0x400, 0x800, 0,
+    0, 0x400, 0x800, 0, 0,
+    0, 0x800, 0, 0, 0,
+    0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0,
+)
+
+# what the enemy's waiting count goes up by when one of their tokens is taken
+CAPTURE_REFUND = (1 << waitingShift(1), 1 << waitingShift(0))
+
+# can player move their token on tileNumber n spots forward? Same rules as
+# Path.canMoveToken, plus entering from OFF_BOARD and capturing on the
+# shared row
+def canMoveToken(state, tileNumber, n, player):
+    # can only move between one and four tiles
+    if n > 4 or n <= 0:
+        return False
+    i = moveIndex(tileNumber, n, player)
+    # can't move beyond end of path, or move a token that doesn't exist
+    if MOVE_DEST[i] == NO_MOVE or not state & MOVE_SOURCE[i]:
+        return False
+    # can't move onto own piece
+    if state & MOVE_TO[i]:
+        return False
+    # can't move onto a safe enemy piece
+    if MOVE_FLAGS[i] & SAFE and state & MOVE_ENEMY[i]:
+        return False
+    return True
+
+# returns the position after moving player's token on tileNumber n spots
+# forward. An enemy token on the destination is sent back to wait. Like
+# Path.moveToken, an illegal move leaves the position unchanged.
+def moveToken(state, tileNumber, n, player):
+    if not canMoveToken(state, tileNumber, n, player):
+        return state
+    i = moveIndex(tileNumber, n, player)
+    newState = state - MOVE_FROM[i] + MOVE_TO[i]
+    # capture
+    if MOVE_FLAGS[i] & CAPTURE and state & MOVE_ENEMY[i]:
+        newState += CAPTURE_REFUND[player] - MOVE_ENEMY[i]
+    return newState
+
+# whether a move of tileNumber by n lands on a rosette, earning another roll
+def landsOnRosette(tileNumber, n):
+    if n > 4 or n <= 0:
+        return False
+    return bool(MOVE_FLAGS[moveIndex(tileNumber, n, 0)] & ROSETTE)
+
+# list of tile numbers (OFF_BOARD included) player can legally move with a
+# roll of n
+def legalMoves(state, n, player):
+    moves = []
+    for tileNumber in range(OFF_BOARD, PATH_LENGTH):
+        if canMoveToken(state, tileNumber, n, player):
+            moves.append(tileNumber)
+    return moves
+
+# builds a position from a Path, with the waiting counts from its token index
+def fromPath(path):
+    mask0 = 0
+    mask1 = 0
+    for tile in path.data:
+        if tile.hasToken(0):
+            mask0 |= 1 << tile.getNumber()
+        if tile.hasToken(1):
+            mask1 |= 1 << tile.getNumber()
+    return pack(mask0, mask1, path.waiting[0], path.waiting[1])
+
+# writes the tokens of a position onto a Path, and rebuilds its token index
+def toPath(state, path):
+    for tile in path.data:
+        tile.setToken(None)
+        if hasToken(state, tile.getNumber(), 0):
+            tile.addToken(0)
+        if hasToken(state, tile.getNumber(), 1):
+            tile.addToken(1)
+    path.reindex((getWaiting(state, 0), getWaiting(state, 1)))
+    return path
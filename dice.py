@@ -0,0 +1,134 @@
+# Dice rolls
+# ----------
+# Where every roll in the game comes from. A roll is four two-sided dice, so
+# four random bits are a whole roll: bit i is die i, and the roll is how many
+# are set. Counting set bits samples the sum straight from its binomial
+# distribution (1, 4, 6, 4, 1 in 16), with no dice needed when only the sum
+# matters.
+#
+# A Roller takes a roll from a single getrandbits(4) call, rather than the
+# four randint calls it used to take, and draws many rolls at once for
+# callers that want them up front, eight per 32-bit getrandbits call (as many
+# bits as CircuitPython's getrandbits gives). Rolls aren't drawn ahead one at
+# a time: in Python a buffer lookup costs more than the one call it saves.
+#
+# A Roller is a reproducible stream: given its own seeded random.Random on
+# the desktop, or reseeded with seed(), the same seed always gives the same
+# rolls. BulkRoller draws rolls BULK_ROLLS at a time with NumPy, for desktop
+# simulations.
+
+import random
+
+import bitboard
+
+DICE = 4
+BULK_ROLLS = 65536 # rolls drawn ahead by a BulkRoller
+
+# the roll from four random bits
+ROLL_OF_BITS = [bitboard.popCount(bits) for bits in range(16)]
+
+class Roller:
+    def __init__(self, rng=random):
+        self.rng = rng
+
+    # starts the stream over from seed
+    def seed(self, seed):
+        self.rng.seed(seed)
+
+    # the next roll's four dice as bits
+    def bits(self):
+        return self.rng.getrandbits(4)
+
+    # the next roll, when the dice themselves don't matter
+    def roll(self):
+        return ROLL_OF_BITS[self.rng.getrandbits(4)]
+
+    # sets values to the next roll's dice, 0 or 1 each. Returns the roll
+    def rollDice(self, values):
+        bits = self.bits()
+        values[0] = bits & 1
+        values[1] = bits >> 1 & 1
+        values[2] = bits >> 2 & 1
+        values[3] = bits >> 3
+        return ROLL_OF_BITS[bits]
+
+    # the next count rolls, drawn eight at a time
+    def rolls(self, count):
+        out = bytearray(count)
+        getrandbits = self.rng.getrandbits
+        bits = 0
+        for i in range(count):
+            if i & 7 == 0:
+                bits = getrandbits(32)
+            out[i] = ROLL_OF_BITS[bits & 15]
+            bits >>= 4
+        return out
+
+    # sets out to len(out) numbers from low to high inclusive, from one
+    # getrandbits call where they fit in 32 bits
+    def between(self, low, high, out):
+        span = high - low + 1
+        width = 1
+        while 1 << width < span:
+            width += 1
+        perDraw = 32 // width
+        bits = 0
+        left = 0
+        i = 0
+        while i < len(out):
+            if left == 0:
+                bits = self.rng.getrandbits(perDraw * width)
+                left = perDraw
+            value = bits & ((1 << width) - 1)
+            bits >>= width
+            left -= 1
+            if value < span:
+                out[i] = low + value
+                i += 1
+
+# a Roller with its own stream, so drawing from it doesn't move the random
+# module's. CircuitPython's random has no Random class; there the module is
+# reseeded instead
+def stream(seed):
+    if hasattr(random, "Random"):
+        return Roller(random.Random(seed))
+    roller = Roller(random)
+    roller.seed(seed)
+    return roller
+
+# Desktop only: rolls drawn ahead BULK_ROLLS at a time with NumPy, and whole
+# arrays of sums sampled from the binomial distribution in one call
+class BulkRoller(Roller):
+    def __init__(self, seed=None, size=BULK_ROLLS):
+        import numpy as np
+        self.np = np
+        self.size = size
+        self.generator = np.random.default_rng(seed)
+        self.buffer = b""
+        self.next = 0
+
+    def seed(self, seed):
+        self.generator = self.np.random.default_rng(seed)
+        self.next = len(self.buffer)
+
+    def refill(self):
+        self.buffer = self.generator.integers(0, 16, self.size, dtype=self.np.uint8).tobytes()
+        self.next = 0
+
+    def bits(self):
+        if self.next == len(self.buffer):
+            self.refill()
+        bits = self.buffer[self.next]
+        self.next += 1
+        return bits
+
+    def roll(self):
+        return ROLL_OF_BITS[self.bits()]
+
+    def rolls(self, count):
+        return self.generator.binomial(DICE, .5, count).astype(self.np.uint8)
+
+    def between(self, low, high, out):
+        values = self.generator.integers(low, high + 1, len(out))
+        for i in range(len(out)):
+            out[i] = int(values[i])
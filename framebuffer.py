@@ -0,0 +1,59 @@
+# Framebuffer between the game and the NeoPixels
+# ----------------------------------------------
+# The paint methods draw every pixel they own into a Framebuffer, which is
+# indexed like trellis.pixels. push() then compares the frame with what was
+# last sent to the LEDs, writes only the pixels that changed, and shows them
+# all at once with a single show() call. Writing a NeoPixel is slow on the
+# device, and most frames change only a few pulsing pixels, if any.
+
+WIDTH = 8
+HEIGHT = 4
+
+class Framebuffer:
+    def __init__(self, pixels):
+        self.pixels = pixels
+        # we call show() ourselves once per frame
+        pixels.auto_write = False
+        self.frame = [(0, 0, 0)] * (WIDTH * HEIGHT)
+        # what the LEDs are showing. None so the first push writes everything
+        self.shown = [None] * (WIDTH * HEIGHT)
+        # counters, so the savings can be measured
+        self.pixelsWritten = 0 # pixels sent to the LEDs
+        self.framesPushed = 0  # frames that changed something and were shown
+        self.framesSkipped = 0 # frames identical to the last one
+
+    def __setitem__(self, coordinate, color):
+        self.frame[coordinate[1] * WIDTH + coordinate[0]] = color
+
+    def __getitem__(self, coordinate):
+        return self.frame[coordinate[1] * WIDTH + coordinate[0]]
+
+    # sends the pixels that changed since the last push to the LEDs
+    def push(self):
+        frame = self.frame
+        shown = self.shown
+        pixels = self.pixels
+        changed = 0
+        for i in range(WIDTH * HEIGHT):
+            color = frame[i]
+            if color != shown[i]:
+                pixels[(i % WIDTH, i // WIDTH)] = color
+                shown[i] = color
+                changed += 1
+        if changed:
+            pixels.show()
+            self.pixelsWritten += changed
+            self.framesPushed += 1
+        else:
+            self.framesSkipped += 1
+        return changed
+
+    # makes the next push write every pixel, e.g. after something else drew
+    # on the LEDs directly
+    def invalidate(self):
+        for i in range(WIDTH * HEIGHT):
+            self.shown[i] = None
+
+    def stats(self):
+        return "pixels written: %d, frames pushed: %d, frames skipped: %d" % (
+            self.pixelsWritten, self.framesPushed, self.framesSkipped)
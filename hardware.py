@@ -0,0 +1,140 @@
+# Display and input backends
+# --------------------------
+# The game only talks to the hardware through a small interface that looks
+# like the parts of adafruit_trellism4.TrellisM4Express it uses:
+#
+#   pixels[(x, y)] = color   set an LED, (x, y) with x in 0-7 and y in 0-3
+#   pressed_keys             list of (x, y) keys held down right now
+#   monotonic()              current time in seconds
+#   sleep(seconds)           wait
+#   timer()                  seconds, for measuring how long code takes
+#
+# TrellisBackend drives the real NeoTrellis M4. FakeTrellis keeps the pixels
+# in memory, plays back scripted key presses and runs on a simulated clock,
+# so games can be played, profiled and benchmarked on desktop Python without
+# waiting out any animation.
+
+import time
+
+WIDTH = 8
+HEIGHT = 4
+NO_KEYS = ()
+
+class TrellisBackend:
+    def __init__(self):
+        # only importable on the device
+        import adafruit_trellism4
+        self.trellis = adafruit_trellism4.TrellisM4Express()
+        self.pixels = self.trellis.pixels
+        self.timerStart = time.monotonic_ns()
+
+    @property
+    def pressed_keys(self):
+        return self.trellis.pressed_keys
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    # CircuitPython's monotonic() is a float that loses resolution as uptime
+    # grows, too coarse for timing code after an hour or so, so this counts
+    # integer nanoseconds from when the backend was made
+    def timer(self):
+        return (time.monotonic_ns() - self.timerStart) / 1e9
+
+# in-memory stand-in for the NeoPixel grid
+class FakePixels:
+    def __init__(self):
+        self.buffer = [(0, 0, 0)] * (WIDTH * HEIGHT)
+        self.auto_write = True
+        self.brightness = 1.0
+        self.writes = 0
+        self.shows = 0
+
+    def __setitem__(self, coordinate, color):
+        x, y = coordinate
+        self.buffer[y * WIDTH + x] = tuple(color)
+        self.writes += 1
+        if self.auto_write:
+            self.shows += 1
+
+    def __getitem__(self, coordinate):
+        x, y = coordinate
+        return self.buffer[y * WIDTH + x]
+
+    def fill(self, color):
+        for i in range(WIDTH * HEIGHT):
+            self.buffer[i] = tuple(color)
+        self.writes += WIDTH * HEIGHT
+        if self.auto_write:
+            self.shows += 1
+
+    def show(self):
+        self.shows += 1
+
+    # the grid as text, one character per pixel: "." for off, otherwise the
+    # channel that's brightest
+    def __str__(self):
+        rows = []
+        for y in range(HEIGHT):
+            row = ""
+            for x in range(WIDTH):
+                r, g, b = self[(x, y)]
+                if r == g == b == 0:
+                    row += "."
+                elif r >= g and r >= b:
+                    row += "r"
+                elif g >= b:
+                    row += "g"
+                else:
+                    row += "b"
+            rows.append(row)
+        return "\n".join(rows)
+
+# in-memory stand-in for the whole TrellisM4. Key presses are scripted: each
+# read of pressed_keys consumes one entry of the script, and once the script
+# runs out no keys are held. The clock only moves when sleep() or tick() is
+# called, and reading pressed_keys ticks it by frameTime.
+class FakeTrellis:
+    def __init__(self, script=None, frameTime=0.0):
+        self.pixels = FakePixels()
+        self.script = list(script) if script else []
+        self.frameTime = frameTime
+        self.now = 0.0
+        self.polls = 0
+
+    # holds keys down for one poll and then releases them
+    def press(self, *keys):
+        self.script.append(list(keys))
+        self.script.append([])
+
+    def hold(self, keys, polls):
+        for i in range(polls):
+            self.script.append(list(keys))
+
+    def scriptDone(self):
+        return not self.script
+
+    @property
+    def pressed_keys(self):
+        self.polls += 1
+        self.tick(self.frameTime)
+        if self.script:
+            return self.script.pop(0)
+        # shared, so polling an idle fake doesn't allocate
+        return NO_KEYS
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.tick(seconds)
+
+    # code still takes real time to run on the simulated clock
+    def timer(self):
+        return time.perf_counter()
+
+    def tick(self, seconds):
+        self.now += seconds
@@ -0,0 +1,156 @@
+# Move hints
+# ----------
+# For players learning the game: after a roll, every legal move is scored by
+# how likely it leaves the player to win, and the board draws each movable
+# token brighter the better its move. See HINTS in ur.
+#
+# Moves are scored with ai.Searcher's expectiminimax, to HINT_DEPTH chance
+# levels, with the score turned into a win probability by ai.scoreToValue.
+# Searching to that depth takes longer than a frame on the M4, so a Hinter
+# does it a little at a time: think() is called every frame and searches
+# for at most THINK_TIME seconds. A search that runs out of time is
+# simply started again next frame, and gets further each time since the
+# chance nodes it finished are kept in the searcher's transposition table.
+# Every move is searched one level deep before any is searched deeper, so
+# rough hints show up within a frame or two and sharpen as it goes.
+#
+# Finished hints are kept by position, so a position seen again (a game
+# picked up from its record, or a common opening) is hinted straight away.
+
+import ai
+import bitboard
+
+HINT_DEPTH = 2      # chance levels each move is searched to
+THINK_TIME = .004   # seconds of searching per frame
+TABLE_SIZE = 500    # transposition table entries
+CACHE_SIZE = 64     # positions whose finished hints are kept
+CHECK_EVERY = 4     # decision nodes between looks at the clock
+
+# hints are drawn at LEVELS - 1 brightnesses, the best move brightest and
+# every LEVEL_STEP less chance of winning one level dimmer: half a percent,
+# since the searcher's scores put most moves within a few percent of each
+# other. Level 0 is a move that hasn't been scored yet
+LEVELS = 6
+LEVEL_STEP = .005
+
+SLOTS = bitboard.TILE_SLOTS # bit tileNumber + 1, as in Board.legal
+
+class Hinter:
+    def __init__(self, clock, depth=HINT_DEPTH, thinkTime=THINK_TIME):
+        self.clock = clock
+        self.depth = depth
+        self.thinkTime = thinkTime
+        self.searcher = ai.Searcher(tableSize=TABLE_SIZE, clock=clock, checkEvery=CHECK_EVERY)
+        # finished levels by position key
+        self.cache = {}
+        # the level to draw each slot's token at
+        self.levels = bytearray(SLOTS)
+        # the position being hinted, and how far the search has got: every
+        # move up to moves[next] has been searched to depth, the rest to
+        # depth - 1
+        self.key = None
+        self.state = 0
+        self.n = 0
+        self.player = 0
+        self.moves = []
+        self.values = [0.0] * SLOTS
+        self.next = 0
+        self.searched = 0 # the depth every move has been searched to
+        self.thinking = False
+        self.hits = 0
+        self.timeouts = 0
+
+    # starts hinting player's moves with roll n in state. moves is
+    # bitboard.legalMoves for them
+    def start(self, state, n, player, moves):
+        levels = self.levels
+        for i in range(SLOTS):
+            levels[i] = 0
+        self.key = state | player << bitboard.STATE_BITS | n << (bitboard.STATE_BITS + 1)
+        cached = self.cache.get(self.key)
+        if cached is not None:
+            self.hits += 1
+            levels[:] = cached
+            self.thinking = False
+            return
+        self.state = state
+        self.n = n
+        self.player = player
+        self.moves = moves
+        self.next = 0
+        self.searched = 0
+        self.thinking = len(moves) > 0
+
+    # stops hinting, once the move's been made
+    def stop(self):
+        self.thinking = False
+        levels = self.levels
+        for i in range(SLOTS):
+            levels[i] = 0
+
+    # player's chance of winning after moving tileNumber, searched depth
+    # chance levels deep
+    def moveValue(self, tileNumber, depth):
+        state = self.state
+        n = self.n
+        player = self.player
+        child = bitboard.moveToken(state, tileNumber, n, player)
+        if bitboard.isWon(child, player):
+            return 1.0
+        nextPlayer = player if bitboard.landsOnRosette(tileNumber, n) else player ^ 1
+        value = ai.scoreToValue(self.searcher.chance(child, nextPlayer, depth))
+        if player == 1:
+            value = 1 - value
+        return value
+
+    # searches for up to thinkTime seconds. Call it every frame
+    def think(self):
+        if not self.thinking:
+            return
+        searcher = self.searcher
+        searcher.deadline = self.clock() + self.thinkTime
+        depth = self.searched + 1
+        while True:
+            tileNumber = self.moves[self.next]
+            try:
+                self.values[tileNumber + 1] = self.moveValue(tileNumber, depth)
+            except ai.SearchTimeout:
+                self.timeouts += 1
+                return
+            self.next += 1
+            if self.next < len(self.moves):
+                continue
+            # every move is searched to depth: show them, and go deeper
+            self.setLevels()
+            self.next = 0
+            self.searched = depth
+            if depth == self.depth:
+                self.finish()
+                return
+            depth += 1
+            if self.clock() > searcher.deadline:
+                return
+
+    def setLevels(self):
+        best = 0.0
+        for tileNumber in self.moves:
+            best = max(best, self.values[tileNumber + 1])
+        for tileNumber in self.moves:
+            dimmer = int((best - self.values[tileNumber + 1]) / LEVEL_STEP)
+            self.levels[tileNumber + 1] = max(1, LEVELS - 1 - dimmer)
+
+    # keeps the finished levels for the position. When full, the cache
+    # starts over rather than grow past its cap
+    def finish(self):
+        self.thinking = False
+        if len(self.cache) >= CACHE_SIZE:
+            self.cache.clear()
+        self.cache[self.key] = bytes(self.levels)
+
+    # the level to draw the token on tileNumber at, 0 if it has no hint yet
+    def level(self, tileNumber):
+        return self.levels[tileNumber + 1]
+
+    def stats(self):
+        return "hint depth %d of %d, cached positions: %d, cache hits: %d, searches out of time: %d" % (
+            self.searched, self.depth, len(self.cache), self.hits, self.timeouts)
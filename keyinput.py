@@ -0,0 +1,128 @@
+# Key input as a queue of events
+# ------------------------------
+# The TrellisM4 only tells us which keys are held right now. KeyInput turns
+# those polls into timestamped press and release events, debounced per key,
+# and queues them so that every press is seen, not just the first one of a
+# frame. The state and the queue live in preallocated buffers, so polling and
+# consuming events doesn't allocate.
+#
+# Consuming events:
+#
+#   while keys.pending():
+#       i = keys.pop()
+#       if keys.kinds[i] == keyinput.PRESS:
+#           handle(keyinput.COORDINATES[keys.keys[i]])
+#
+# Times are whole milliseconds. Press-to-render latency is measured from the
+# poll that saw a press to the end of the frame that handled it.
+
+WIDTH = 8
+HEIGHT = 4
+KEY_COUNT = WIDTH * HEIGHT
+
+RELEASE = 0
+PRESS = 1
+
+DEBOUNCE_MS = 10 # changes within this long of the last one are bounce
+QUEUE_SIZE = 16
+
+# key number -> (x, y), built once so handing out coordinates doesn't allocate
+COORDINATES = [(key % WIDTH, key // WIDTH) for key in range(KEY_COUNT)]
+
+class KeyInput:
+    def __init__(self, debounce=DEBOUNCE_MS, size=QUEUE_SIZE):
+        self.debounce = debounce
+        self.down = bytearray(KEY_COUNT)    # debounced state of each key
+        self.seen = bytearray(KEY_COUNT)    # raw state from the latest poll
+        self.changed = [-debounce] * KEY_COUNT # when each key last changed
+
+        # ring buffer of events
+        self.size = size
+        self.keys = [0] * size
+        self.kinds = [0] * size
+        self.times = [0] * size
+        self.head = 0  # next event to pop
+        self.count = 0
+        self.dropped = 0
+
+        # press-to-render latency
+        self.handledPresses = 0
+        self.unrendered = 0 # presses handled since the last render
+        self.oldestUnrendered = 0
+        self.latencyCount = 0
+        self.latencyTotal = 0
+        self.latencyMax = 0
+        self.latencyLast = 0
+
+    # updates the key states from the keys held now, queuing an event for
+    # every debounced change
+    def poll(self, pressedKeys, now):
+        now = int(now * 1000)
+        seen = self.seen
+        for i in range(KEY_COUNT):
+            seen[i] = 0
+        for x, y in pressedKeys:
+            seen[y * WIDTH + x] = 1
+        down = self.down
+        changed = self.changed
+        for i in range(KEY_COUNT):
+            if seen[i] != down[i] and now - changed[i] >= self.debounce:
+                down[i] = seen[i]
+                changed[i] = now
+                self.push(i, seen[i], now)
+
+    def push(self, key, kind, time):
+        if self.count == self.size:
+            # full: drop the oldest event
+            self.head = (self.head + 1) % self.size
+            self.count -= 1
+            self.dropped += 1
+        i = (self.head + self.count) % self.size
+        self.keys[i] = key
+        self.kinds[i] = kind
+        self.times[i] = time
+        self.count += 1
+
+    def pending(self):
+        return self.count > 0
+
+    # removes the oldest event and returns its slot in keys/kinds/times. The
+    # slot stays valid until the next poll
+    def pop(self):
+        i = self.head
+        self.head = (self.head + 1) % self.size
+        self.count -= 1
+        if self.kinds[i] == PRESS:
+            if not self.unrendered:
+                self.oldestUnrendered = self.times[i]
+            self.unrendered += 1
+            self.handledPresses += 1
+        return i
+
+    # drops every queued event, e.g. while input is being ignored
+    def clear(self):
+        self.head = (self.head + self.count) % self.size
+        self.count = 0
+
+    # call once a frame has been shown, to record how long the presses it
+    # handled took to show up
+    def rendered(self, now):
+        if not self.unrendered:
+            return
+        latency = int(now * 1000) - self.oldestUnrendered
+        self.latencyLast = latency
+        self.latencyTotal += latency
+        self.latencyCount += 1
+        if latency > self.latencyMax:
+            self.latencyMax = latency
+        self.unrendered = 0
+
+    def isDown(self, coordinate):
+        return self.down[coordinate[1] * WIDTH + coordinate[0]] == 1
+
+    def stats(self):
+        mean = 0
+        if self.latencyCount:
+            mean = self.latencyTotal / self.latencyCount
+        return "presses: %d, dropped events: %d, press-to-render ms: last %d, mean %.1f, max %d" % (
+            self.handledPresses, self.dropped, self.latencyLast, mean, self.latencyMax)
@@ -0,0 +1,80 @@
+# Board geometry
+# --------------
+# Where each tile of the path sits on the 8x4 grid of keys. A Layout is
+# given each player's route, the (x, y) of their tiles 0 to 13 in order, and
+# compiles it once into lookup tables, so nothing in the game has to work the
+# geometry out again:
+#
+#   coordinates[tile][player]   (x, y) of player's token on tile
+#   grid[y * WIDTH + x]         (tile, player) pressed at (x, y), player None
+#                               on a shared tile; None off the path
+#   rosettes[tile]              whether tile is a rosette
+#   waitingKeys[player]         the key for player's tokens waiting to enter
+#   homeKeys[player]            the key for player's borne off tokens
+#
+# The two pile keys go in the notches by default: waiting next to tile 0 and
+# home in the other notch of the row tile 13 is on.
+#
+# The rules (which tiles are shared, which are rosettes) stay with the move
+# tables in bitboard. A layout only decides where those tiles are drawn, and
+# is checked against the rules when it's built: a route has to put both
+# players on the same key exactly on the shared tiles.
+
+import bitboard
+
+WIDTH = 8
+HEIGHT = 4
+KEY_COUNT = WIDTH * HEIGHT
+
+class Layout:
+    def __init__(self, name, route0, route1, waitingKeys=None, homeKeys=None):
+        self.name = name
+        self.coordinates = []
+        self.rosettes = []
+        self.grid = [None] * KEY_COUNT
+        if len(route0) != bitboard.PATH_LENGTH or len(route1) != bitboard.PATH_LENGTH:
+            raise ValueError("%s: a route has %d tiles" % (name, bitboard.PATH_LENGTH))
+        for tileNumber in range(bitboard.PATH_LENGTH):
+            shared = bool(bitboard.SHARED_MASK >> tileNumber & 1)
+            if shared != (route0[tileNumber] == route1[tileNumber]):
+                raise ValueError("%s: tile %d must be on %s keys" % (
+                    name, tileNumber, "the same" if shared else "different"))
+            self.coordinates.append((route0[tileNumber], route1[tileNumber]))
+            self.rosettes.append(tileNumber in bitboard.ROSETTES)
+            for player, (x, y) in enumerate(self.coordinates[tileNumber]):
+                if x < 0 or x >= WIDTH or y < 0 or y >= HEIGHT - 1:
+                    raise ValueError("%s: tile %d is off the board at %d, %d" % (name, tileNumber, x, y))
+                entry = tileNumber, None if shared else player
+                key = y * WIDTH + x
+                if self.grid[key] is not None and self.grid[key] != entry:
+                    raise ValueError("%s: two tiles at %d, %d" % (name, x, y))
+                self.grid[key] = entry
+        if waitingKeys is None:
+            waitingKeys = ((4, route0[0][1]), (4, route1[0][1]))
+        if homeKeys is None:
+            homeKeys = ((5, route0[-1][1]), (5, route1[-1][1]))
+        self.waitingKeys = waitingKeys
+        self.homeKeys = homeKeys
+        piles = waitingKeys + homeKeys
+        for x, y in piles:
+            if self.grid[y * WIDTH + x] is not None or piles.count((x, y)) > 1:
+                raise ValueError("%s: a pile key at %d, %d is already taken" % (name, x, y))
+
+    def __str__(self):
+        return "Layout " + self.name
+
+# a route down a private row: the four tiles before the shared row, right to
+# left, then the eight shared tiles, then the two tiles back on endRow
+def route(startRow, endRow):
+    return ([(3 - n, startRow) for n in range(4)]
+            + [(x, 1) for x in range(8)]
+            + [(7, endRow), (6, endRow)])
+
+# the usual board: each player leaves the path from their own row
+STANDARD = Layout("standard", route(0, 0), route(2, 2))
+
+# each player finishes on the end of the opponent's row. The rosettes are
+# still tiles 3, 7 and 13, so they land on the same keys
+CROSSOVER = Layout("crossover", route(0, 2), route(2, 0))
+
+LAYOUTS = {layout.name: layout for layout in (STANDARD, CROSSOVER)}
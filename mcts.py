@@ -0,0 +1,325 @@
+# Computer opponent: Monte Carlo tree search that thinks between frames
+# --------------------------------------------------------------------
+# The second engine next to ai.Searcher. Instead of searching a whole move at
+# once, a Planner is given a few playouts to run each frame with think(), so
+# the LEDs keep animating while it works, and bestMove() answers with the
+# most visited move whenever it's asked.
+#
+# The tree has three kinds of node:
+#
+#   DECISION  player has rolled roll and picks a move. Children are picked
+#             by UCT, from the point of view of the player moving
+#   CHANCE    player is about to roll. Each playout samples the roll and
+#             follows (or adds) the DECISION child for it
+#   TERMINAL  the game is over
+#
+# Values are player 0's chance of winning. Positions and moves are bitboard's,
+# the same rules as Path.canMoveToken and Path.moveToken.
+#
+# Nodes live in a pool of preallocated arrays with a hard cap, since the M4
+# has very little RAM. Once the pool is full the tree stops growing and
+# playouts carry on from its leaves. When the computer's turn comes round
+# again, the node for the new position is looked for below the old root, and
+# if it's there its subtree is kept and everything else is freed.
+
+import math
+import random
+from array import array
+
+import ai
+import bitboard
+import dice
+
+NODE_LIMIT = 1000          # nodes in the pool
+PLAYOUTS_PER_FRAME = 2     # playouts think() runs in one go by default
+PLAYOUTS_PER_MOVE = 200    # playouts before a move is considered thought out
+PLAYOUT_PLIES = 24         # rolls before a playout is scored by ai.evaluate
+EXPLORATION = 1.4          # UCT exploration constant
+REUSE_DEPTH = 8            # how far below the old root to look for the new one
+
+NONE = -1
+
+DECISION = 0
+CHANCE = 1
+TERMINAL = 2
+
+NO_MOVE = bitboard.NO_MOVE # the move that led to a pass or the root
+
+class Planner:
+    def __init__(self, size=NODE_LIMIT, rng=random):
+        self.size = size
+        self.rng = rng
+        self.roller = dice.Roller(rng)
+        self.state = [0] * size
+        self.kind = array("b", [0] * size)
+        self.player = array("b", [0] * size)
+        self.roll = array("b", [0] * size)   # DECISION nodes: the roll
+        self.move = array("b", [0] * size)   # tile number moved to get here
+        self.parent = array("h", [NONE] * size)
+        self.child = array("h", [NONE] * size)   # first child
+        self.sibling = array("h", [NONE] * size) # next child, or next free node
+        self.visits = array("l", [0] * size)
+        self.value = array("f", [0] * size)  # total of player 0's results
+        self.expanded = bytearray(size)
+        self.root = NONE
+        self.free = NONE
+        self.used = 0
+        self.playouts = 0 # since the root was set
+        self.reused = 0   # nodes kept when the root last moved
+        self.clear()
+
+    # frees every node
+    def clear(self):
+        for i in range(self.size):
+            self.sibling[i] = i + 1
+        self.sibling[self.size - 1] = NONE
+        self.free = 0
+        self.used = 0
+        self.root = NONE
+
+    # takes a node from the pool, or returns NONE if it's empty
+    def allocate(self, kind, state, player, roll, move, parent):
+        i = self.free
+        if i == NONE:
+            return NONE
+        self.free = self.sibling[i]
+        self.used += 1
+        self.state[i] = state
+        self.kind[i] = kind
+        self.player[i] = player
+        self.roll[i] = roll
+        self.move[i] = move
+        self.parent[i] = parent
+        self.child[i] = NONE
+        self.sibling[i] = NONE
+        self.visits[i] = 0
+        self.value[i] = 0
+        self.expanded[i] = 0
+        return i
+
+    # the tree's root is player deciding what to do with roll n in state
+    def isRoot(self, state, n, player):
+        root = self.root
+        return (root != NONE and self.state[root] == state
+                and self.player[root] == player and self.roll[root] == n)
+
+    # makes the decision (state, n, player) the root, keeping its subtree if
+    # it's already in the tree
+    def setRoot(self, state, n, player):
+        if self.isRoot(state, n, player):
+            return
+        self.playouts = 0
+        found = self.find(state, n, player)
+        if found == NONE:
+            self.clear()
+            self.reused = 0
+            self.root = self.allocate(DECISION, state, player, n, NO_MOVE, NONE)
+            return
+        self.keep(found)
+
+    # the DECISION node for (state, n, player) within REUSE_DEPTH of the root
+    def find(self, state, n, player):
+        if self.root == NONE:
+            return NONE
+        level = [self.root]
+        for depth in range(REUSE_DEPTH):
+            below = []
+            for node in level:
+                child = self.child[node]
+                while child != NONE:
+                    if (self.kind[child] == DECISION and self.state[child] == state
+                            and self.player[child] == player and self.roll[child] == n):
+                        return child
+                    below.append(child)
+                    child = self.sibling[child]
+            level = below
+        return NONE
+
+    # makes node the root and returns everything outside its subtree to the
+    # pool
+    def keep(self, node):
+        marked = bytearray(self.size)
+        stack = [node]
+        while stack:
+            i = stack.pop()
+            marked[i] = 1
+            child = self.child[i]
+            while child != NONE:
+                stack.append(child)
+                child = self.sibling[child]
+        self.free = NONE
+        self.used = 0
+        for i in range(self.size - 1, -1, -1):
+            if marked[i]:
+                self.used += 1
+            else:
+                self.sibling[i] = self.free
+                self.free = i
+        self.parent[node] = NONE
+        self.sibling[node] = NONE
+        self.root = node
+        self.reused = self.used
+
+    # the node for player about to roll in state, after a move by parent's
+    # player. TERMINAL if that move won
+    def addChance(self, state, player, move, parent):
+        if bitboard.isWon(state, self.player[parent]):
+            return self.allocate(TERMINAL, state, self.player[parent], 0, move, parent)
+        return self.allocate(CHANCE, state, player, 0, move, parent)
+
+    # gives a DECISION node a child for every legal move, or a single pass
+    # child if there isn't one. Returns False if the pool ran out, in which
+    # case the node is left as a leaf
+    def expand(self, node):
+        state = self.state[node]
+        player = self.player[node]
+        n = self.roll[node]
+        moves = bitboard.legalMoves(state, n, player) if n else []
+        if len(moves) + 1 > self.size - self.used:
+            return False
+        last = NONE
+        if not moves:
+            last = self.addChance(state, player ^ 1, NO_MOVE, node)
+        for tileNumber in moves:
+            child = bitboard.moveToken(state, tileNumber, n, player)
+            # landing on a rosette, the same player rolls again
+            nextPlayer = player if bitboard.landsOnRosette(tileNumber, n) else player ^ 1
+            i = self.addChance(child, nextPlayer, tileNumber, node)
+            self.sibling[i] = last
+            last = i
+        self.child[node] = last
+        self.expanded[node] = 1
+        return True
+
+    # the child of a DECISION node that's best for its player to try next
+    def select(self, node):
+        mover = self.player[node]
+        logVisits = math.log(self.visits[node] + 1)
+        best = NONE
+        bestScore = -1
+        child = self.child[node]
+        while child != NONE:
+            visits = self.visits[child]
+            if visits == 0:
+                return child
+            mean = self.value[child] / visits
+            if mover == 1:
+                mean = 1 - mean
+            score = mean + EXPLORATION * math.sqrt(logVisits / visits)
+            if score > bestScore:
+                best = child
+                bestScore = score
+            child = self.sibling[child]
+        return best
+
+    # the DECISION child of a CHANCE node for roll n, added if it's missing.
+    # NONE if it's missing and the pool is full
+    def rollChild(self, node, n):
+        child = self.child[node]
+        while child != NONE:
+            if self.roll[child] == n:
+                return child
+            child = self.sibling[child]
+        child = self.allocate(DECISION, self.state[node], self.player[node], n, NO_MOVE, node)
+        if child != NONE:
+            self.sibling[child] = self.child[node]
+            self.child[node] = child
+        return child
+
+    # plays random moves from player rolling in state to the end of the game,
+    # or PLAYOUT_PLIES rolls. Returns player 0's result. If n isn't None it's
+    # the first roll
+    def rollout(self, state, player, n=None):
+        rng = self.rng
+        roll = self.roller.roll
+        for ply in range(PLAYOUT_PLIES):
+            if n is None:
+                n = roll()
+            moves = bitboard.legalMoves(state, n, player) if n else None
+            if moves:
+                tileNumber = moves[rng.randint(0, len(moves) - 1)]
+                state = bitboard.moveToken(state, tileNumber, n, player)
+                if bitboard.isWon(state, player):
+                    return 1.0 if player == 0 else 0.0
+                if not bitboard.landsOnRosette(tileNumber, n):
+                    player ^= 1
+            else:
+                player ^= 1
+            n = None
+        return ai.scoreToValue(ai.evaluate(state))
+
+    # one playout: down the tree to a leaf, growing it by a node or a set of
+    # moves, a random game from there, and the result back up to the root
+    def playout(self):
+        node = self.root
+        while True:
+            kind = self.kind[node]
+            if kind == TERMINAL:
+                result = 1.0 if self.player[node] == 0 else 0.0
+                break
+            if kind == DECISION:
+                if not self.expanded[node]:
+                    if not self.expand(node):
+                        result = self.rollout(self.state[node], self.player[node], self.roll[node])
+                        break
+                    node = self.select(node)
+                    if self.kind[node] == TERMINAL:
+                        result = 1.0 if self.player[node] == 0 else 0.0
+                    else:
+                        result = self.rollout(self.state[node], self.player[node])
+                    break
+                node = self.select(node)
+                continue
+            n = self.roller.roll()
+            child = self.rollChild(node, n)
+            if child == NONE:
+                result = self.rollout(self.state[node], self.player[node], n)
+                break
+            node = child
+        while node != NONE:
+            self.visits[node] += 1
+            self.value[node] += result
+            node = self.parent[node]
+        self.playouts += 1
+
+    # runs up to playouts playouts for player deciding what to do with roll n
+    # in state. Call it every frame; it picks up where it left off
+    def think(self, state, n, player, playouts=PLAYOUTS_PER_FRAME):
+        self.setRoot(state, n, player)
+        for i in range(playouts):
+            self.playout()
+
+    # whether the root has been through PLAYOUTS_PER_MOVE playouts, counting
+    # ones kept from earlier turns, or has only one move to choose from
+    def isReady(self, budget=PLAYOUTS_PER_MOVE):
+        root = self.root
+        if root == NONE:
+            return False
+        if self.visits[root] >= budget:
+            return True
+        return self.expanded[root] and self.sibling[self.child[root]] == NONE
+
+    # the tile number of the most visited move from the root so far, None if
+    # there's no legal move. Thinks for one playout first if it hasn't yet
+    def bestMove(self, state, n, player):
+        self.setRoot(state, n, player)
+        if not self.expanded[self.root]:
+            self.playout()
+        best = NONE
+        child = self.child[self.root]
+        while child != NONE:
+            if best == NONE or self.visits[child] > self.visits[best]:
+                best = child
+            child = self.sibling[child]
+        if best == NONE or self.move[best] == NO_MOVE:
+            return None
+        return self.move[best]
+
+    # a blocking move choice, for playing headless like ai.Searcher
+    def chooseMove(self, state, n, player, playouts=PLAYOUTS_PER_MOVE):
+        self.think(state, n, player, playouts)
+        return self.bestMove(state, n, player)
+
+    def stats(self):
+        return "playouts: %d, nodes: %d of %d, reused: %d" % (
+            self.playouts, self.used, self.size, self.reused)
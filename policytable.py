@@ -0,0 +1,410 @@
+# Policy table: solved endgames on flash
+# --------------------------------------
+# The solver's table of every position's value is far too big for the
+# NeoTrellis, and working the best move out from it needs NumPy. This turns
+# it into just the best moves, small enough to go on the CIRCUITPY drive
+# next to code.py, and read a few bytes at a time without NumPy.
+#
+# A position's value only depends on the tokens still in play, not on how
+# many are home, so the table solved for k tokens (python solver.py k) plays
+# perfectly in every position of the real game where both players have at
+# most k tokens on the board or waiting: the endgame. Before that, the
+# computer searches as usual. k = 4 makes a table of about 2 MB.
+#
+# For each position, numbered as the solver numbers them, the table holds
+# one byte: for each of the rolls 1 to 4, the best move as a 2-bit code,
+# its place among the legal moves in the order ai.orderedMoves tries them.
+# For each roll, that order puts the best move first more often than in any
+# other place, so 0 is the commonest code; but a position's byte is only 0
+# when the best move is first for all four rolls, so most bytes aren't (about
+# 70% for k = 4, which build reports).
+# A best move further down than fourth is stored as the fourth; build
+# reports how often that happens. Of moves that are equally good, the first
+# in that order is stored.
+#
+# The bytes are stored in blocks of BLOCK_POSITIONS positions, each a bitmap
+# of which bytes aren't 0 followed by just those bytes. The file is
+#
+#   header         HEADER_FORMAT
+#   sideCount      SHARED_TILES + 1 little endian uint16s
+#   sharedOffset   SHARED_PATTERNS + 1 uint32s
+#   sideRank       (SHARED_TILES + 1) * SIDE_KEYS uint16s, NO_RANK where a
+#                  side doesn't fit
+#   blockOffset    blocks + 1 uint32s, from the start of the blocks
+#   blocks
+#
+# which is the solver's StateIndex followed by the moves, so looking a move
+# up takes a few small reads and keeps only a few hundred numbers in RAM.
+#
+#   python policytable.py build [solved table] [policy table]
+#   python policytable.py check [policy table] [solved table] [positions]
+
+import struct
+
+import ai
+import bitboard
+
+MAGIC = b"URPOLCY1"
+HEADER_FORMAT = "<8sIII" # MAGIC, tokens, positions, blocks
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+TABLE_PATH = "/ur-policy.bin"
+
+BLOCK_POSITIONS = 256
+BITMAP_BYTES = BLOCK_POSITIONS // 8
+SHARED_TILES = 8
+SHARED_PATTERNS = 3 ** SHARED_TILES
+SIDE_KEYS = 64 * 8 # 6 private tile bits and a waiting count
+NO_RANK = 0xFFFF
+CODES = 4
+
+# the shared row as a base 3 number, from a player's 8 bits of it
+def ternary(bits):
+    value = 0
+    digit = 1
+    while bits:
+        if bits & 1:
+            value += digit
+        bits >>= 1
+        digit *= 3
+    return value
+
+class PolicyTable:
+    def __init__(self, path=None):
+        path = path or TABLE_PATH
+        self.file = open(path, "rb")
+        magic, self.tokens, self.count, self.blocks = struct.unpack(HEADER_FORMAT, self.file.read(HEADER_SIZE))
+        if magic != MAGIC:
+            raise ValueError(path + " is not an Ur policy table")
+        self.sideCount = struct.unpack("<%dH" % (SHARED_TILES + 1), self.file.read(2 * (SHARED_TILES + 1)))
+        self.sharedOffsetAt = HEADER_SIZE + 2 * (SHARED_TILES + 1)
+        self.sideRankAt = self.sharedOffsetAt + 4 * (SHARED_PATTERNS + 1)
+        self.blockOffsetAt = self.sideRankAt + 2 * (SHARED_TILES + 1) * SIDE_KEYS
+        self.blocksAt = self.blockOffsetAt + 4 * (self.blocks + 1)
+        self.ternary = [ternary(bits) for bits in range(1 << SHARED_TILES)]
+        # reused for every read, so lookups don't allocate
+        self.word = bytearray(8)
+        self.bitmap = bytearray(BITMAP_BYTES)
+        self.lookups = 0
+        self.misses = 0
+
+    def close(self):
+        self.file.close()
+
+    # little endian unsigned int of size bytes at offset in the file
+    def readInt(self, offset, size):
+        self.file.seek(offset)
+        word = self.word
+        self.file.readinto(word)
+        value = 0
+        for i in range(size - 1, -1, -1):
+            value = value << 8 | word[i]
+        return value
+
+    # whether player to move in state is in the endgame the table covers
+    def covers(self, state, player):
+        for side in (player, player ^ 1):
+            if bitboard.popCount(bitboard.getMask(state, side)) + bitboard.getWaiting(state, side) > self.tokens:
+                return False
+        return True
+
+    # the solver's number for a position from the side of player, who's about
+    # to move, or None if the table doesn't cover it
+    def rank(self, state, player):
+        own = bitboard.getMask(state, player)
+        enemy = bitboard.getMask(state, player ^ 1)
+        ownRow = own >> 4 & 0xFF
+        enemyRow = enemy >> 4 & 0xFF
+        row = self.ternary[ownRow] + 2 * self.ternary[enemyRow]
+        ownPrivate = own & 0xF | own >> 12 << 4
+        enemyPrivate = enemy & 0xF | enemy >> 12 << 4
+        ownSide = self.readInt(self.sideRankAt + 2 * (bitboard.popCount(ownRow) * SIDE_KEYS
+                               + ownPrivate * 8 + bitboard.getWaiting(state, player)), 2)
+        enemyCount = bitboard.popCount(enemyRow)
+        enemySide = self.readInt(self.sideRankAt + 2 * (enemyCount * SIDE_KEYS
+                                 + enemyPrivate * 8 + bitboard.getWaiting(state, player ^ 1)), 2)
+        if ownSide == NO_RANK or enemySide == NO_RANK:
+            return None
+        return self.readInt(self.sharedOffsetAt + 4 * row, 4) + ownSide * self.sideCount[enemyCount] + enemySide
+
+    # the byte of codes for the position numbered rank
+    def entry(self, rank):
+        block = rank // BLOCK_POSITIONS
+        start = self.readInt(self.blockOffsetAt + 4 * block, 4)
+        file = self.file
+        file.seek(self.blocksAt + start)
+        bitmap = self.bitmap
+        file.readinto(bitmap)
+        i = rank % BLOCK_POSITIONS
+        if not bitmap[i >> 3] >> (i & 7) & 1:
+            return 0
+        # the byte's place among the block's bytes that aren't 0
+        before = 0
+        for j in range(i >> 3):
+            before += bitboard.popCount(bitmap[j])
+        before += bitboard.popCount(bitmap[i >> 3] & ((1 << (i & 7)) - 1))
+        return self.readInt(self.blocksAt + start + BITMAP_BYTES + before, 1)
+
+    # the tile number player should move with roll n, or None if the table
+    # doesn't cover the position or there's no legal move
+    def bestMove(self, state, n, player):
+        self.lookups += 1
+        if not self.covers(state, player):
+            self.misses += 1
+            return None
+        moves = ai.orderedMoves(state, n, player)
+        if len(moves) < 2:
+            return moves[0] if moves else None
+        code = self.entry(self.rank(state, player)) >> (2 * (n - 1)) & (CODES - 1)
+        return moves[min(code, len(moves) - 1)]
+
+    def stats(self):
+        return "policy table: %d tokens, %d lookups, %d not in the table" % (self.tokens, self.lookups, self.misses)
+
+# a computer player that plays the table's moves in the endgame and searches
+# before it, thinking a frame at a time like ai.Searcher so Board can use
+# either
+class TablePlayer:
+    def __init__(self, table, searcher):
+        self.table = table
+        self.searcher = searcher
+        # the position last looked up, and the table's move for it (None if
+        # it isn't in the table)
+        self.key = None
+        self.move = None
+
+    def lookUp(self, state, n, player):
+        key = state | player << bitboard.STATE_BITS | n << (bitboard.STATE_BITS + 1)
+        if key != self.key:
+            self.key = key
+            self.move = self.table.bestMove(state, n, player)
+        return self.move
+
+    def think(self, state, n, player):
+        if self.lookUp(state, n, player) is None:
+            self.searcher.think(state, n, player)
+
+    def isReady(self):
+        return self.move is not None or self.searcher.isReady()
+
+    def bestMove(self, state, n, player):
+        tileNumber = self.lookUp(state, n, player)
+        if tileNumber is None:
+            return self.searcher.bestMove(state, n, player)
+        return tileNumber
+
+    def chooseMove(self, state, n, player):
+        tileNumber = self.lookUp(state, n, player)
+        if tileNumber is None:
+            return self.searcher.chooseMove(state, n, player)
+        return tileNumber
+
+# Building
+# --------
+# Desktop only, with NumPy. The best move of every position is worked out
+# for a block of positions at a time from the solved values
+
+# the order ai.moveOrder puts moves in, as a score per slot (higher first),
+# and whether each slot's move is legal with roll r. Slot 0 is entering
+def slotScores(np, own, enemy, ownWaiting, r):
+    count = len(own)
+    scores = np.zeros((count, bitboard.TILE_SLOTS), dtype=np.int32)
+    legal = np.zeros((count, bitboard.TILE_SLOTS), dtype=bool)
+    for slot in range(bitboard.TILE_SLOTS):
+        tileNumber = slot - 1
+        destination = tileNumber + r
+        if destination > bitboard.PATH_LENGTH:
+            continue
+        if tileNumber == bitboard.OFF_BOARD:
+            canLift = ownWaiting > 0
+        else:
+            canLift = (own >> tileNumber) & 1 == 1
+        score = np.full(count, tileNumber, dtype=np.int32)
+        if destination == bitboard.PATH_LENGTH:
+            legal[:, slot] = canLift
+            score += 100
+        else:
+            bit = 1 << destination
+            fits = own & bit == 0
+            if bit & bitboard.SHARED_MASK & bitboard.ROSETTE_MASK:
+                fits &= enemy & bit == 0
+            legal[:, slot] = canLift & fits
+            if bit & bitboard.ROSETTE_MASK:
+                score += 200
+            if bit & bitboard.SHARED_MASK & ~bitboard.ROSETTE_MASK:
+                score += np.where(enemy & bit != 0, 400, 0).astype(np.int32)
+        scores[:, slot] = score
+    return scores, legal
+
+# the solved value (out of solver.VALUE_SCALE) of each slot's move with roll
+# r for the player about to move, as the solver's Q(s, r)
+def slotValues(np, solver, index, values, own, enemy, ownWaiting, enemyWaiting, legal, r):
+    tokens = index.tokens
+    scale = solver.VALUE_SCALE
+    result = np.full(legal.shape, -1, dtype=np.int32)
+    ownHome = tokens - ownWaiting - solver.popCount(own)
+    for slot in range(bitboard.TILE_SLOTS):
+        rows = legal[:, slot]
+        if not rows.any():
+            continue
+        tileNumber = slot - 1
+        destination = tileNumber + r
+        o = own[rows]
+        e = enemy[rows]
+        ow = ownWaiting[rows]
+        ew = enemyWaiting[rows]
+        if tileNumber == bitboard.OFF_BOARD:
+            ow = ow - 1
+        else:
+            o = o & ~(1 << tileNumber)
+        if destination == bitboard.PATH_LENGTH:
+            won = ownHome[rows] + 1 == tokens
+            value = scale - values[index.rank(e, o, ew, ow)].astype(np.int32)
+            result[rows, slot] = np.where(won, scale, value)
+            continue
+        bit = 1 << destination
+        o = o | bit
+        if bit & bitboard.SHARED_MASK & ~bitboard.ROSETTE_MASK:
+            ew = ew + (e & bit != 0)
+            e = e & ~bit
+        if bit & bitboard.ROSETTE_MASK:
+            result[rows, slot] = values[index.rank(o, e, ow, ew)]
+        else:
+            result[rows, slot] = scale - values[index.rank(e, o, ew, ow)].astype(np.int32)
+    return result
+
+# the byte of codes for each position in block, and how many codes (by
+# roll) had to be rounded down to fit
+def blockEntries(np, solver, index, values, block):
+    own, enemy, ownWaiting, enemyWaiting = index.unrank(block)
+    entries = np.zeros(len(block), dtype=np.uint8)
+    clipped = 0
+    for r in range(1, CODES + 1):
+        scores, legal = slotScores(np, own, enemy, ownWaiting, r)
+        moveValues = slotValues(np, solver, index, values, own, enemy, ownWaiting, enemyWaiting, legal, r)
+        # the best value, the highest scored move among those with it
+        key = np.where(legal, moveValues.astype(np.int64) * 1024 + scores + 512, -1)
+        best = key.argmax(axis=1)
+        bestScore = scores[np.arange(len(block)), best]
+        code = (legal & (scores > bestScore[:, None])).sum(axis=1)
+        clipped += int((code >= CODES).sum())
+        entries |= (np.minimum(code, CODES - 1) << (2 * (r - 1))).astype(np.uint8)
+    return entries, clipped
+
+def build(solvedPath, path, log=print):
+    import numpy as np
+    import solver
+    table = solver.SolvedTable(solvedPath)
+    index = table.index
+    count = index.count
+    blocks = (count + BLOCK_POSITIONS - 1) // BLOCK_POSITIONS
+    sideRank = index.sideRank[:, :SIDE_KEYS]
+    offsets = [0]
+    clipped = 0
+    nonzero = 0
+    with open(path + ".blocks", "wb") as f:
+        batch = BLOCK_POSITIONS * 256
+        for first in range(0, count, batch):
+            entries, batchClipped = blockEntries(np, solver, index, table.values,
+                                                 np.arange(first, min(first + batch, count)))
+            clipped += batchClipped
+            padded = np.zeros((len(entries) + BLOCK_POSITIONS - 1) // BLOCK_POSITIONS * BLOCK_POSITIONS,
+                              dtype=np.uint8)
+            padded[:len(entries)] = entries
+            for entriesOfBlock in padded.reshape(-1, BLOCK_POSITIONS):
+                used = entriesOfBlock != 0
+                data = np.packbits(used, bitorder="little").tobytes() + entriesOfBlock[used].tobytes()
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+                nonzero += int(used.sum())
+            if log is not None:
+                log("%d of %d positions" % (min(first + batch, count), count))
+    with open(path, "wb") as f:
+        f.write(struct.pack(HEADER_FORMAT, MAGIC, index.tokens, count, blocks))
+        f.write(np.asarray(index.sideCount, dtype="<u2").tobytes())
+        f.write(np.asarray(index.sharedOffset, dtype="<u4").tobytes())
+        f.write(np.where(sideRank < 0, NO_RANK, sideRank).astype("<u2").tobytes())
+        f.write(np.asarray(offsets, dtype="<u4").tobytes())
+        with open(path + ".blocks", "rb") as blocksFile:
+            f.write(blocksFile.read())
+    import os
+    os.remove(path + ".blocks")
+    return {"positions": count, "nonzero": nonzero, "clipped": clipped}
+
+# Checking
+# --------
+
+# up to count positions the table covers from random games between greedy
+# players, as (state, roll, player) with more than one legal move
+def samplePositions(tokens, count, rng):
+    samples = []
+    while len(samples) < count:
+        state = bitboard.START
+        player = 0
+        while True:
+            n = rng.choice((0, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2, 3, 3, 3, 3, 4))
+            moves = ai.orderedMoves(state, n, player) if n else []
+            if len(moves) > 1 and len(samples) < count:
+                inPlay = [bitboard.popCount(bitboard.getMask(state, p)) + bitboard.getWaiting(state, p)
+                          for p in (0, 1)]
+                if max(inPlay) <= tokens:
+                    samples.append((state, n, player))
+            if not moves:
+                player ^= 1
+                continue
+            tileNumber = moves[0] if rng.random() < .7 else rng.choice(moves)
+            state = bitboard.moveToken(state, tileNumber, n, player)
+            if bitboard.isWon(state, player):
+                break
+            if not bitboard.landsOnRosette(tileNumber, n):
+                player ^= 1
+    return samples
+
+def check(path, solvedPath, positions=2000, seed=1, log=print):
+    import os
+    import random
+    import time
+    import solver
+    table = PolicyTable(path)
+    solved = solver.SolvedTable(solvedPath)
+    samples = samplePositions(table.tokens, positions, random.Random(seed))
+    agreed = 0
+    asGood = 0
+    lost = 0.0
+    times = []
+    for state, n, player in samples:
+        start = time.perf_counter()
+        tileNumber = table.bestMove(state, n, player)
+        times.append(time.perf_counter() - start)
+        values = solved.moveValues(state, n, player)
+        best = max(values.values())
+        agreed += tileNumber == solved.bestMove(state, n, player)
+        asGood += values[tileNumber] == best
+        lost += best - values[tileNumber]
+    times.sort()
+    size = os.path.getsize(path)
+    log("%s: %d tokens, %d positions, %d bytes, %.2f bits a position"
+        % (path, table.tokens, table.count, size, size * 8 / table.count))
+    log("lookup: median %.1f us, 99th percentile %.1f us, slowest %.1f us"
+        % (times[len(times) // 2] * 1e6, times[len(times) * 99 // 100] * 1e6, times[-1] * 1e6))
+    log("over %d endgame positions: a best move %.2f%% of the time (the solver's own pick %.2f%%), "
+        "mean chance of winning given up %.5f" % (len(samples), 100 * asGood / len(samples),
+                                                   100 * agreed / len(samples), lost / len(samples)))
+    table.close()
+    return asGood, len(samples)
+
+def main(mode="check", path=None, other=None, positions=2000):
+    if mode == "build":
+        solvedPath = path or "ur-solved-4.bin"
+        path = other or "ur-policy.bin"
+        stats = build(solvedPath, path)
+        print("%d positions, %d with a move other than the first, %d moves further down than fit"
+              % (stats["positions"], stats["nonzero"], stats["clipped"]))
+        check(path, solvedPath)
+    elif mode == "check":
+        check(path or "ur-policy.bin", other or "ur-solved-4.bin", int(positions))
+    else:
+        raise ValueError("unknown mode %s" % mode)
+
+if __name__ == "__main__":
+    import sys
+    main(*sys.argv[1:])
@@ -0,0 +1,93 @@
+# Lightweight timing of hot paths
+# -------------------------------
+# A Profiler wraps methods on existing objects with timed versions, so the
+# code being measured doesn't change and nothing is paid when profiling is
+# off. Each wrapped method gets a Section that keeps its latest samples in a
+# ring, for rolling min/mean/max times, along with how much the free heap
+# shrank across each call (gc.mem_free() is only on CircuitPython, so off the
+# device the heap columns are left out).
+
+try:
+    from gc import mem_free
+except ImportError:
+    mem_free = None
+
+WINDOW = 32 # samples kept per section
+
+class Section:
+    def __init__(self, name, window=WINDOW):
+        self.name = name
+        self.times = [0.0] * window
+        self.allocated = [0] * window
+        self.window = window
+        self.next = 0
+        self.count = 0
+
+    def add(self, elapsed, allocated):
+        self.times[self.next] = elapsed
+        self.allocated[self.next] = allocated
+        self.next = (self.next + 1) % self.window
+        self.count += 1
+
+    # (min, mean, max) seconds over the samples in the window
+    def timeStats(self):
+        n = min(self.count, self.window)
+        if not n:
+            return 0, 0, 0
+        samples = self.times[:n]
+        return min(samples), sum(samples) / n, max(samples)
+
+    # (mean, max) bytes the heap shrank by per call, over the window
+    def allocationStats(self):
+        n = min(self.count, self.window)
+        if not n:
+            return 0, 0
+        samples = self.allocated[:n]
+        return sum(samples) / n, max(samples)
+
+    def report(self):
+        low, mean, high = self.timeStats()
+        out = "%-14s %7d calls  ms min %.3f mean %.3f max %.3f" % (
+            self.name, self.count, low * 1000, mean * 1000, high * 1000)
+        if mem_free is not None:
+            allocated, most = self.allocationStats()
+            out += "  heap bytes mean %.0f max %d" % (allocated, most)
+        return out
+
+class Profiler:
+    def __init__(self, timer, window=WINDOW):
+        self.timer = timer
+        self.window = window
+        self.sections = []
+
+    def section(self, name):
+        for section in self.sections:
+            if section.name == name:
+                return section
+        section = Section(name, self.window)
+        self.sections.append(section)
+        return section
+
+    # replaces obj.methodName with a version that records into the section
+    # called label (methodName if not given)
+    def wrap(self, obj, methodName, label=None):
+        method = getattr(obj, methodName)
+        section = self.section(label or methodName)
+        timer = self.timer
+
+        def timed(*args):
+            if mem_free is not None:
+                free = mem_free()
+            start = timer()
+            result = method(*args)
+            elapsed = timer() - start
+            allocated = 0
+            if mem_free is not None:
+                allocated = free - mem_free()
+            section.add(elapsed, allocated)
+            return result
+
+        setattr(obj, methodName, timed)
+
+    def report(self):
+        return "\n".join(section.report() for section in self.sections)
@@ -0,0 +1,242 @@
+# Game records
+# ------------
+# A game is saved as a header followed by one byte per ply, so a whole game
+# is a few hundred bytes and can be written to the NeoTrellis's flash as it's
+# played and picked up again after a reset or power loss.
+#
+# The header (HEADER_FORMAT, 20 bytes) holds MAGIC, VERSION, the layout, the
+# computer's player (NO_COMPUTER if two people are playing), who moves first,
+# the seed the dice were seeded with and the position the game started from,
+# packed as in bitboard.
+#
+# A ply is a roll and what the player did with it: the roll in the top bits,
+# then a 4-bit move slot, PASS if the turn passed without a move and
+# otherwise the tile number moved plus 2 (slot 1 is for entering a token
+# from off the board). The turn passes after every ply unless the move landed
+# on a rosette, as in the main loop.
+#
+# Plies are buffered in RAM and appended to the file BUFFER_PLIES at a time,
+# FLUSH_INTERVAL seconds after the last write (the main loop polls for it,
+# so a ply isn't held while no one moves) and as soon as the game is won,
+# since writing flash is slow. On the device
+# the drive has to be writable from code for this to work, see the README;
+# if it isn't, recording stops with a message and the game carries on.
+
+import random
+import struct
+
+import bitboard
+import layout
+import rules
+
+MAGIC = b"URGR"
+VERSION = 1
+HEADER_FORMAT = "<4sBBBBIQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+NO_COMPUTER = 255
+
+# layouts by the number stored in the header
+LAYOUT_NAMES = ("standard", "crossover")
+
+PASS = 0
+BUFFER_PLIES = 32   # plies held in RAM between writes
+FLUSH_INTERVAL = 30 # seconds before buffered plies are written anyway
+READ_SIZE = 256     # bytes read at a time when replaying
+
+def encodePly(roll, tileNumber):
+    if tileNumber is None:
+        return roll << 4 | PASS
+    return roll << 4 | (tileNumber + 2)
+
+# (roll, tile number moved or None for a pass)
+def decodePly(byte):
+    slot = byte & 15
+    if slot == PASS:
+        return byte >> 4, None
+    return byte >> 4, slot - 2
+
+class Header:
+    def __init__(self, layoutName="standard", computer=None, turn=0, seed=0, start=bitboard.START):
+        self.layoutName = layoutName
+        self.computer = computer
+        self.turn = turn
+        self.seed = seed
+        self.start = start
+
+    def pack(self):
+        computer = NO_COMPUTER if self.computer is None else self.computer
+        return struct.pack(HEADER_FORMAT, MAGIC, VERSION, LAYOUT_NAMES.index(self.layoutName),
+                           computer, self.turn, self.seed, self.start)
+
+def readHeader(stream):
+    data = stream.read(HEADER_SIZE)
+    if data is None or len(data) < HEADER_SIZE:
+        raise ValueError("not a game record: too short")
+    magic, version, layoutNumber, computer, turn, seed, start = struct.unpack(HEADER_FORMAT, data)
+    if magic != MAGIC:
+        raise ValueError("not a game record")
+    if version != VERSION:
+        raise ValueError("game record version %d, expected %d" % (version, VERSION))
+    if computer == NO_COMPUTER:
+        computer = None
+    return Header(LAYOUT_NAMES[layoutNumber], computer, turn, seed, start)
+
+# the header for a game about to start on board
+def headerFor(board, seed):
+    return Header(board.path.layout.name, board.computer, board.turn, seed,
+                  board.path.state())
+
+class Recorder:
+    # writes header to a new file at path, unless append is set, in which case
+    # plies are added to the end of an existing record
+    def __init__(self, path, header, append=False):
+        self.path = path
+        self.header = header
+        self.buffer = bytearray(BUFFER_PLIES)
+        self.count = 0      # plies in the buffer
+        self.plies = 0      # plies recorded since the recorder was made
+        self.flushes = 0
+        self.lastFlush = 0
+        self.failed = False
+        if not append:
+            self.write("wb", header.pack())
+
+    def write(self, mode, data):
+        if self.failed:
+            return False
+        try:
+            with open(self.path, mode) as f:
+                f.write(data)
+        except OSError as e:
+            print("Can't save the game to", self.path, e)
+            self.failed = True
+            return False
+        return True
+
+    # adds a ply, writing the buffer out if it's full or it's been
+    # FLUSH_INTERVAL seconds since the last write
+    def add(self, roll, tileNumber, now=0):
+        self.buffer[self.count] = encodePly(roll, tileNumber)
+        self.count += 1
+        self.plies += 1
+        if self.count == BUFFER_PLIES:
+            self.flush(now)
+        else:
+            self.poll(now)
+
+    # writes any buffered plies out if it's been FLUSH_INTERVAL seconds since
+    # the last write. Called every frame
+    def poll(self, now):
+        if self.count and now - self.lastFlush >= FLUSH_INTERVAL:
+            self.flush(now)
+
+    def flush(self, now=0):
+        if not self.count:
+            return
+        if self.write("ab", memoryview(self.buffer)[:self.count]):
+            self.flushes += 1
+        self.count = 0
+        self.lastFlush = now
+
+    def stats(self):
+        return "plies recorded: %d, flushes: %d, buffered: %d" % (self.plies, self.flushes, self.count)
+
+# Replaying
+# ---------
+
+# reads a record a chunk at a time, without holding the whole game
+class Reader:
+    def __init__(self, stream):
+        self.stream = stream
+        self.header = readHeader(stream)
+
+    # (roll, tile number or None) for each ply, in order
+    def plies(self):
+        while True:
+            data = self.stream.read(READ_SIZE)
+            if not data:
+                return
+            for byte in data:
+                yield decodePly(byte)
+
+# plays a ply on board, with the main loop's turn rules
+def applyPly(board, roll, tileNumber):
+    if tileNumber is not None:
+        board.path.moveToken(tileNumber, roll, board.turn)
+        if bitboard.landsOnRosette(tileNumber, roll):
+            return
+    board.turn ^= 1
+
+# a headless Board at the start of the game header describes
+def startBoard(header):
+    board = rules.Board(header.computer, layout.LAYOUTS[header.layoutName])
+    bitboard.toPath(header.start, board.path)
+    board.turn = header.turn
+    return board
+
+# the Board after each ply of the record in stream, worked out as it's read.
+# The same Board is yielded every time, one ply further on
+def replay(stream, board=None):
+    reader = Reader(stream)
+    if board is None:
+        board = startBoard(reader.header)
+    for roll, tileNumber in reader.plies():
+        applyPly(board, roll, tileNumber)
+        yield board
+
+# starts recording the game on board to path. If resume is set and path
+# holds an unfinished game on the same layout, the board is first brought up
+# to where that game left off and new plies are added to it. A finished game
+# isn't picked up: a new one starts over it. Returns the Recorder
+def start(board, path, resume=True):
+    if resume:
+        state = board.path.state()
+        turn = board.turn
+        try:
+            with open(path, "rb") as f:
+                reader = Reader(f)
+                header = reader.header
+                if header.layoutName == board.path.layout.name:
+                    bitboard.toPath(header.start, board.path)
+                    board.turn = header.turn
+                    plies = 0
+                    for roll, tileNumber in reader.plies():
+                        applyPly(board, roll, tileNumber)
+                        plies += 1
+                    if not board.path.isWon(0) and not board.path.isWon(1):
+                        # a new stream rather than the one the game was on,
+                        # which the roll animations and the computer players
+                        # drew from too, but still one the record's seed and
+                        # length give again
+                        board.dice.roller.seed(header.seed + plies)
+                        print("Resumed the game from", path, "after", plies, "plies")
+                        return Recorder(path, header, append=True)
+        except (OSError, ValueError):
+            pass
+        bitboard.toPath(state, board.path)
+        board.turn = turn
+    seed = random.getrandbits(30)
+    board.dice.roller.seed(seed)
+    return Recorder(path, headerFor(board, seed))
+
+# python record.py game.bin: prints every ply of a record and the final board
+def main(path):
+    with open(path, "rb") as f:
+        reader = Reader(f)
+        header = reader.header
+        print("layout %s, computer %s, seed %d" % (header.layoutName, header.computer, header.seed))
+        board = startBoard(header)
+        ply = 0
+        for roll, tileNumber in reader.plies():
+            player = board.turn
+            applyPly(board, roll, tileNumber)
+            ply += 1
+            if tileNumber is None:
+                print("%4d  player %d rolls %d and passes" % (ply, player, roll))
+            else:
+                print("%4d  player %d rolls %d and moves the token on tile %d" % (ply, player, roll, tileNumber))
+        print(board.path)
+
+if __name__ == "__main__":
+    import sys
+    main(*sys.argv[1:])
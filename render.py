@@ -0,0 +1,313 @@
+# Drawing the game
+# ----------------
+# A Renderer paints a rules.Board onto the NeoTrellis's LEDs each frame,
+# through a framebuffer.Framebuffer so only the LEDs that changed are sent.
+# It only reads the board, never changes it.
+#
+# Every color that pulses is worked out ahead into a pulse table, so a frame
+# is painted without doing any arithmetic or building any tuples. The tables
+# are built when the first Renderer is made rather than when this module is
+# imported, so importing it costs nothing and tools that never draw never
+# pay for them.
+
+import framebuffer
+import rules
+
+TOKEN_COLORS = [(0,10,255),(100,100,100)]
+TOKEN_PULSE_SPEED = 100
+TOKEN_PULSE_DEPTH = 10
+
+PREVIEW_PULSE_SPEED = 100
+PREVIEW_PULSE_DEPTH = 20
+
+# every token the roll can move pulses gently until one is picked
+MOVABLE_PULSE_DEPTH = 30
+
+# the waiting pile key is lit in a dim token color while tokens are waiting
+# to enter; the home key is lit while any are borne off
+PILE_DIM = 4
+PILE_OFF_COLOR = (0, 0, 0)
+
+PATH_COLOR = (30, 10, 10)
+ROSETTE_COLOR = (35, 5, 5)
+
+DICE_ROLL_BUTTON_COLOR = (0, 55, 10)
+DIE_WAITING_COLOR = (0, 40, 0)
+DIE_ON_COLOR = (0, 200, 0)
+DIE_OFF_COLOR = (0, 15, 0)
+
+# LEDs of the four dice, left to right
+DICE_COORDINATES = ((1,3), (2,3), (3,3), (4,3))
+
+# the last frame's time, shown as a bar on the spare LEDs of the dice row
+# when profiling, see DEBUGGING in ur
+PERFORMANCE_BAR = ((5,3), (6,3), (7,3))
+PERFORMANCE_BAR_COLOR = (0, 0, 40)
+PERFORMANCE_OVER_COLOR = (60, 0, 0) # the frame went over its budget
+PERFORMANCE_OFF_COLOR = (0, 0, 0)
+
+# Helper functions
+# ----------------
+def dim(color, factor):
+    r, g, b = color
+    dimmedColor = int(r/factor), int(g/factor), int(b/factor)
+    return dimmedColor
+
+# pulses the input color's brightness according to the device time, now
+# speed: the speed at which the pulse pulses. 100 is medium, 300 is very slow.
+# depth: how dim the pulse gets at its dimmest. higher values are less
+#        dim. 10 is medium, 2 is very deep, 30 is very shallow.
+def pulse(color, speed, depth, now):
+    return pulseAtPhase(color, speed, depth, int(now*100))
+
+# the pulsed color at a phase, in hundredths of a second
+def pulseAtPhase(color, speed, depth, phase):
+    timeValue = abs(phase % speed - speed//2)
+    dimAmount = timeValue/depth + 1
+    return dim(color, dimAmount)
+
+# the pulse of a color worked out ahead for every phase in its cycle, so the
+# paint methods only have to index a list with (phase % speed). Phases that
+# dim to the same color share one tuple
+def buildPulseTable(color, speed, depth):
+    table = []
+    seen = {}
+    for phase in range(speed):
+        pulsed = pulseAtPhase(color, speed, depth, phase)
+        table.append(seen.setdefault(pulsed, pulsed))
+    return table
+
+# pulse tables for every (color, speed, depth) the game pulses, built by
+# buildTables
+TOKEN_PULSES = None
+PREVIEW_PULSES = None
+MOVABLE_PULSES = None
+PILE_COLORS = None
+PILE_PULSES = None
+PATH_PULSE = None
+ROSETTE_PULSE = None
+DICE_ROLL_BUTTON_PULSE = None
+# HINT_PULSES[player][level] for hints.Hinter's levels, dimmer for worse
+# moves. Level 0, a move not scored yet, pulses like any movable token. Only
+# built if hints are on
+HINT_PULSES = None
+
+def buildTables():
+    global TOKEN_PULSES, PREVIEW_PULSES, MOVABLE_PULSES, PILE_COLORS, PILE_PULSES
+    global PATH_PULSE, ROSETTE_PULSE, DICE_ROLL_BUTTON_PULSE
+    if TOKEN_PULSES is not None:
+        return
+    TOKEN_PULSES = [buildPulseTable(color, TOKEN_PULSE_SPEED, TOKEN_PULSE_DEPTH) for color in TOKEN_COLORS]
+    PREVIEW_PULSES = [buildPulseTable(color, PREVIEW_PULSE_SPEED, PREVIEW_PULSE_DEPTH) for color in TOKEN_COLORS]
+    MOVABLE_PULSES = [buildPulseTable(color, TOKEN_PULSE_SPEED, MOVABLE_PULSE_DEPTH) for color in TOKEN_COLORS]
+    PILE_COLORS = [dim(color, PILE_DIM) for color in TOKEN_COLORS]
+    PILE_PULSES = [buildPulseTable(color, TOKEN_PULSE_SPEED, MOVABLE_PULSE_DEPTH) for color in PILE_COLORS]
+    PATH_PULSE = buildPulseTable(PATH_COLOR, TOKEN_PULSE_SPEED, TOKEN_PULSE_DEPTH)
+    ROSETTE_PULSE = buildPulseTable(ROSETTE_COLOR, TOKEN_PULSE_SPEED, TOKEN_PULSE_DEPTH)
+    DICE_ROLL_BUTTON_PULSE = buildPulseTable(DICE_ROLL_BUTTON_COLOR, TOKEN_PULSE_SPEED, TOKEN_PULSE_DEPTH)
+
+def buildHintTables(levels):
+    global HINT_PULSES
+    if HINT_PULSES is not None:
+        return
+    HINT_PULSES = [[MOVABLE_PULSES[p]] + [buildPulseTable(dim(TOKEN_COLORS[p], 1 + (levels - 1 - level) * 1.5),
+                                                          TOKEN_PULSE_SPEED, MOVABLE_PULSE_DEPTH)
+                                          for level in range(1, levels)]
+                   for p in rules.PLAYERS]
+
+# board is the rules.Board to draw and pixels the backend's LEDs. clock is
+# the backend's monotonic(), which sets the pulses' phase. performance is
+# the scheduler.FrameScheduler whose last frame the performance bar shows,
+# or None for no bar
+class Renderer:
+    __slots__ = ("board", "frame", "clock", "performance", "phase", "colors", "pulses")
+
+    def __init__(self, board, pixels, clock, performance=None):
+        buildTables()
+        if board.hinter is not None:
+            import hints
+            buildHintTables(hints.LEVELS)
+        self.board = board
+        self.frame = framebuffer.Framebuffer(pixels)
+        self.clock = clock
+        self.performance = performance
+        # the pulse phase of the frame being painted, in hundredths of a second
+        self.phase = 0
+        # each tile's empty color, and its pulse when previewed, by tile number
+        self.colors = []
+        self.pulses = []
+        for tile in board.path.data:
+            if tile.rosette:
+                self.colors.append(ROSETTE_COLOR)
+                self.pulses.append(ROSETTE_PULSE)
+            else:
+                self.colors.append(PATH_COLOR)
+                self.pulses.append(PATH_PULSE)
+
+    # paintTokens and paintPath run every frame, so they stick to the
+    # coordinates precomputed on the tiles and the colors in the pulse tables
+    # rather than building any tuples or lists of their own
+    def paintTokens(self):
+        board = self.board
+        frame = self.frame
+        tokenPhase = self.phase % TOKEN_PULSE_SPEED
+        previewPhase = self.phase % PREVIEW_PULSE_SPEED
+        selected = board.selected
+        previewTile = None
+        previewPlayer = None
+        if board.preview is not None:
+            previewTile, previewPlayer = board.preview
+        # the current player's movable tokens, while none is picked
+        movable = 0
+        if selected is None:
+            movable = board.legal
+        turn = board.turn
+        # with hints on, movable tokens pulse at their move's hint level
+        movablePulses = MOVABLE_PULSES[turn]
+        levels = None
+        if board.hinter is not None:
+            levels = board.hinter.levels
+        for tile in board.path.data:
+            token = tile.token
+            if token is None:
+                continue
+            for p in rules.PLAYERS:
+                if token != p and token != 2:
+                    continue
+                coord = tile.coordinates[p]
+                if tile is not previewTile:
+                    isPreview = False
+                elif tile.shared:
+                    isPreview = True
+                else:
+                    isPreview = p == previewPlayer
+
+                if coord == selected:
+                    frame[coord] = TOKEN_PULSES[p][tokenPhase]
+                elif isPreview:
+                    frame[coord] = PREVIEW_PULSES[p][previewPhase]
+                elif p == turn and movable >> (tile.number + 1) & 1:
+                    if levels is None:
+                        frame[coord] = movablePulses[tokenPhase]
+                    else:
+                        frame[coord] = HINT_PULSES[p][levels[tile.number + 1]][tokenPhase]
+                else:
+                    frame[coord] = TOKEN_COLORS[p]
+
+    # the waiting and home pile keys. The waiting pile pulses when entering a
+    # token is a legal move, like a movable token on the path, and at its
+    # hint level once entering has been scored
+    def paintPiles(self):
+        board = self.board
+        frame = self.frame
+        path = board.path
+        boardLayout = path.layout
+        phase = self.phase % TOKEN_PULSE_SPEED
+        for p in rules.PLAYERS:
+            key = boardLayout.waitingKeys[p]
+            if path.waiting[p] == 0:
+                frame[key] = PILE_OFF_COLOR
+            elif p != board.turn:
+                frame[key] = PILE_COLORS[p]
+            elif key == board.selected:
+                frame[key] = TOKEN_PULSES[p][phase]
+            elif board.selected is None and board.legal & 1:
+                level = 0
+                if board.hinter is not None:
+                    level = board.hinter.levels[0]
+                if level:
+                    frame[key] = HINT_PULSES[p][level][phase]
+                else:
+                    frame[key] = PILE_PULSES[p][phase]
+            else:
+                frame[key] = PILE_COLORS[p]
+            key = boardLayout.homeKeys[p]
+            if path.home[p] == 0:
+                frame[key] = PILE_OFF_COLOR
+            else:
+                frame[key] = TOKEN_COLORS[p]
+
+    def paintPath(self):
+        board = self.board
+        frame = self.frame
+        colors = self.colors
+        pulses = self.pulses
+        phase = self.phase % TOKEN_PULSE_SPEED
+        previewTile = None
+        previewPlayer = None
+        if board.preview is not None:
+            previewTile, previewPlayer = board.preview
+        for tile in board.path.data:
+            # in the case that it's in the middle row, one LED for both players
+            if tile.shared:
+                if tile.token is None:
+                    if tile is previewTile:
+                        frame[tile.coordinates[0]] = pulses[tile.number][phase]
+                    else:
+                        frame[tile.coordinates[0]] = colors[tile.number]
+                continue
+            # in the case that it's in a split tile, one LED for each player
+            token = tile.token
+            for p in rules.PLAYERS:
+                if token == p or token == 2:
+                    continue
+                if tile is previewTile and p == previewPlayer:
+                    frame[tile.coordinates[p]] = pulses[tile.number][phase]
+                else:
+                    frame[tile.coordinates[p]] = colors[tile.number]
+
+    def paintDice(self):
+        board = self.board
+        if board.stage == "won":
+            self.frame[rules.DICE_ROLL_BUTTON] = TOKEN_COLORS[board.winner]
+        elif board.stage == "roll":
+            self.frame[rules.DICE_ROLL_BUTTON] = DICE_ROLL_BUTTON_PULSE[self.phase % TOKEN_PULSE_SPEED]
+        else:
+            self.frame[rules.DICE_ROLL_BUTTON] = DICE_ROLL_BUTTON_COLOR
+
+        dice = board.dice
+        # if there's no roll, paint the waiting color
+        if dice.shown[0] is None:
+            for i in range(4):
+                self.frame[DICE_COORDINATES[i]] = DIE_WAITING_COLOR
+        # if there is a roll value, or one being animated, paint it
+        else:
+            self.paintDiceValues(dice.shown)
+
+    # shows the dice from a given source (array of 4 bool values), the dice's
+    # values or what the roll animation is showing
+    def paintDiceValues(self, source):
+        for i in range(4):
+            if source[i] == 1:
+                color = DIE_ON_COLOR
+            else:
+                color = DIE_OFF_COLOR
+            self.frame[DICE_COORDINATES[i]] = color
+
+    # paints a whole frame. The clock is read once here and every pulse in
+    # the frame comes from the pulse tables at that phase
+    def paintBoard(self):
+        self.phase = int(self.clock()*100)
+        self.paintPath()
+        self.paintTokens()
+        self.paintPiles()
+        self.paintDice()
+        if self.performance is not None:
+            self.paintPerformance()
+        self.frame.push()
+
+    # the last frame's working time as a bar of up to three LEDs, one for each
+    # third of the frame budget rounded to the nearest, so a nearly idle
+    # frame lights none, turning red if it went over
+    def paintPerformance(self):
+        times = self.performance.lastTimes
+        fraction = (times[0] + times[1] + times[2]) * self.performance.frameRate
+        lit = int(fraction * len(PERFORMANCE_BAR) + .5)
+        color = PERFORMANCE_BAR_COLOR
+        if fraction > 1:
+            color = PERFORMANCE_OVER_COLOR
+        for i in range(len(PERFORMANCE_BAR)):
+            if i < lit:
+                self.frame[PERFORMANCE_BAR[i]] = color
+            else:
+                self.frame[PERFORMANCE_BAR[i]] = PERFORMANCE_OFF_COLOR
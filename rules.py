@@ -0,0 +1,600 @@
+# The rules
+# ---------
+# The game itself: the tiles of the path and the tokens on them, the dice,
+# and the Board, which takes key presses and plays them by the rules. None of
+# it knows about LEDs (render draws it) or the device (ur runs it), so it can
+# be imported and played headless anywhere, and importing it does nothing
+# but define it.
+
+import bitboard
+import dice
+import layout
+
+# prints what pressing keys does
+DEBUGGING = False
+
+DICE_ROLL_BUTTON = (0,3)
+FLOP_LOW_BOUND = 5
+FLOP_HIGH_BOUND = 20
+# FLOP_TIME = .15
+FLOP_TIME = .05 # FOR TESTING
+
+ZERO_ROLL_DELAY = 1
+
+PLAYERS = (0, 1)
+
+# a node has a number and a token value which is None if no token, 0 if player
+# 0's token, 1 if player 1's token, and 2 if both players' tokens. What never
+# changes about a tile (whether it's a rosette or shared, where its LEDs are
+# in boardLayout) is looked up once here, so painting a frame doesn't have to
+class Tile:
+    __slots__ = ("number", "token", "rosette", "shared", "coordinates")
+
+    def __init__(self, number, boardLayout=layout.STANDARD):
+        self.number = number
+        self.token = None
+        self.rosette = boardLayout.rosettes[number]
+        self.shared = bool(bitboard.SHARED_MASK >> number & 1)
+        # the LED of each player's token on this tile, the same one for both
+        # players on a shared tile
+        self.coordinates = boardLayout.coordinates[number]
+
+    def __str__(self):
+        return "{tile #" + str(self.number) + " " + "token: " + str(self.token) + "}"
+
+    def getToken(self):
+        return self.token
+
+    # set this tile's token to either 1, 0, 2, or None
+    def setToken(self, p):
+        assert p is None or p == 0 or p == 1 or p == 2
+        self.token = p
+
+    # add the specified token p (1 or 0) to the tile
+    def addToken(self, p):
+        currentToken = self.getToken()
+        if currentToken == 2:
+            # both tokens are already there, can't add more
+            return
+        if currentToken == p:
+            # token we're trying to add already there, can't add
+            return
+        # if no token, just set the token to add. Simple.
+        if currentToken == None:
+            self.setToken(p)
+        # if the token is the opposite of what we're adding (only other option at this point?), set token to 2 (both)
+        elif currentToken == (not p):
+            self.setToken(2)
+
+    # remove token p (0 or 1) from the tile
+    def removeToken(self, p):
+        currentToken = self.getToken()
+        # if the tile has no tokens at all
+        if currentToken == None:
+        # if not self.hasToken():
+            # no tokens here; can't remove one
+            return
+        # if the tile doesn't have the token we're trying to remove
+        if not self.hasToken(p):
+            # it's not here; can't remove it
+            return
+        # now we know this token has the tile we're trying to remove
+        # if both tokens are present
+        if currentToken == 2:
+            # set the token to be the opposite as the one we're trying to remove
+            if p == 1:
+                self.setToken(0)
+            else: self.setToken(1)
+        # otherwise, the only token should be the one we're trying to remove
+        elif currentToken == p:
+            # so set there to be no tokens
+            self.setToken(None)
+
+    def hasToken(self, player=None):
+        tokenValue = self.getToken()
+        if player == None:
+            return tokenValue != None
+        elif player == 0:
+            return tokenValue == 0 or tokenValue == 2
+        elif player == 1:
+            return tokenValue == 1 or tokenValue == 2
+        elif player == 2:
+            return tokenValue == 2
+
+    # return the number of this tile
+    def getNumber(self):
+        return self.number
+
+    # returns bool: whether the tile is a rosette
+    def isRosette(self):
+        return self.rosette
+
+    def isShared(self):
+        return self.shared
+
+    def getXCoord(self, player=0):
+        return self.coordinates[player][0]
+
+    def getYCoord(self, player):
+        return self.coordinates[player][1]
+
+class Path:
+    def __init__(self, boardLayout=layout.STANDARD):
+        self.layout = boardLayout
+        self.data = [Tile(n, boardLayout) for n in range(14)]
+        # what getTileByCoordinate returns for each key, by key number
+        # (y * 8 + x): the layout's grid with tile numbers swapped for tiles
+        self.byKey = [None] * layout.KEY_COUNT
+        for key, entry in enumerate(boardLayout.grid):
+            if entry is not None:
+                self.byKey[key] = self.data[entry[0]], entry[1]
+
+        # the token index: where each player's tokens are, as bitboard
+        # occupancy masks, how many are waiting to enter and borne off, and
+        # all of it packed as a bitboard position for the move checks.
+        # moveToken keeps it up to date; after setting tiles' tokens directly,
+        # call reindex()
+        self.masks = [0, 0]
+        self.waiting = [bitboard.TOKENS_PER_PLAYER, bitboard.TOKENS_PER_PLAYER]
+        self.home = [0, 0]
+        self.packed = bitboard.START
+
+    # rebuilds the token index from the tiles. waiting is each player's
+    # count of tokens waiting to enter; by default every token that isn't on
+    # the path is waiting, none are home
+    def reindex(self, waiting=None):
+        for player in PLAYERS:
+            mask = 0
+            for tile in self.data:
+                if tile.hasToken(player):
+                    mask |= 1 << tile.number
+            onPath = bitboard.popCount(mask)
+            self.masks[player] = mask
+            if waiting is None:
+                self.waiting[player] = bitboard.TOKENS_PER_PLAYER - onPath
+            else:
+                self.waiting[player] = waiting[player]
+            self.home[player] = bitboard.TOKENS_PER_PLAYER - onPath - self.waiting[player]
+        self.packed = bitboard.pack(self.masks[0], self.masks[1], self.waiting[0], self.waiting[1])
+
+    # the position as a bitboard int, straight from the token index
+    def state(self):
+        return self.packed
+
+    # whether player has borne off all their tokens
+    def isWon(self, player):
+        return self.home[player] == bitboard.TOKENS_PER_PLAYER
+
+    def toArray(self):
+        out = []
+        for item in self.data:
+            out.append(item)
+        return out
+
+    def __str__(self):
+        out = []
+        for item in self.data:
+            out.append(str(item))
+        return str(out)
+
+    # gets the the tile on the board by its number
+    def getTile(self, tileNumber):
+        # assert self.data[tileNumber].number == tileNumber
+        return self.data[tileNumber]
+
+    # can we move the specified token n spots forward? tileNumber can be
+    # bitboard.OFF_BOARD, to enter one of player's waiting tokens.
+    # player must be specified if tileNumber is not shared
+    # with the token index kept up to date, this is bitboard's table-driven
+    # check on the packed position it keeps
+    def canMoveToken(self, tileNumber, n, player=None):
+        # make sure player is specified if needed
+        if tileNumber != bitboard.OFF_BOARD and self.data[tileNumber].shared:
+            player = self.data[tileNumber].token
+        else:
+            assert player is not None
+        # can't move a token that doesn't exist
+        if player is None:
+            return False
+        return bitboard.canMoveToken(self.packed, tileNumber, n, player)
+
+    # move the token of specified tile n spots forward, if possible, keeping
+    # the token index up to date
+    def moveToken(self, tileNumber, n, player=None):
+        # make sure player is specified if needed
+        if tileNumber != bitboard.OFF_BOARD and self.data[tileNumber].shared:
+            player = self.data[tileNumber].token
+        else:
+            assert player is not None
+
+        if not self.canMoveToken(tileNumber, n, player):
+            return
+        self.packed = bitboard.moveToken(self.packed, tileNumber, n, player)
+        enemy = player ^ 1
+        # lift the token, from the waiting pile or its tile
+        if tileNumber == bitboard.OFF_BOARD:
+            self.waiting[player] -= 1
+        else:
+            self.data[tileNumber].removeToken(player)
+            self.masks[player] &= ~(1 << tileNumber)
+        destinationTileNumber = tileNumber + n
+        # if the token is moving off the board
+        if destinationTileNumber == bitboard.PATH_LENGTH:
+            self.home[player] += 1
+            return
+        destinationTile = self.data[destinationTileNumber]
+        # capture: an enemy token on a shared tile is sent back to wait
+        if destinationTile.shared and destinationTile.hasToken(enemy):
+            destinationTile.removeToken(enemy)
+            self.masks[enemy] &= ~(1 << destinationTileNumber)
+            self.waiting[enemy] += 1
+        destinationTile.addToken(player)
+        self.masks[player] |= 1 << destinationTileNumber
+
+    # returns a tile. Also returns a player if a split tile was pressed
+    # returns none if the button wasn't on the path
+    def getTileByCoordinate(self, coordinate):
+        found = self.byKey[coordinate[1] * layout.WIDTH + coordinate[0]]
+        if found is None:
+            if coordinate[1] == 3:
+                # raise Exception("Coordinate isn't a tile on the board; not in first three rows")
+                print("Coordinate isn't a tile on the board; not in first three rows")
+            else:
+                # raise Exception("Coordinate isn't a tile on the board; in a notch")
+                print("Coordinate isn't a tile on the board; in a notch")
+        return found
+
+    # returns list of instructions to print tokens in format:
+    # ((x,y of token), player of token)
+    def generateTokenPrintInstructions(self):
+        toDisplay = []
+        for tile in self.data:
+            if tile.hasToken():
+                # a shared tile can only have one token on it, and both
+                # players' coordinates are the same there
+                for p in PLAYERS:
+                    if tile.hasToken(p):
+                        toDisplay.append( (tile.coordinates[p],p) )
+        return toDisplay
+
+# values is the roll; shown is what the dice LEDs show, which differs from
+# values while a roll is being animated. Rolls and flops come from roller, a
+# dice.Roller, which can be seeded to replay a game's rolls
+class Dice():
+    __slots__ = ("values", "shown", "flops", "roller")
+
+    def __init__(self, roller=None):
+        self.values = [None for i in range(4)]
+        self.shown = [None for i in range(4)]
+        self.flops = [0 for i in range(4)]
+        if roller is None:
+            roller = dice.Roller()
+        self.roller = roller
+
+    def __str__(self):
+        return "Dice: " + str(self.values)
+
+    def hasValues(self):
+        return self.values[0] != None
+
+    # animates a roll landing on the current values of the dice. Use roll()
+    # before animateRoll() so that they match up. This is a generator: each
+    # step flops the shown dice and yields how long to wait before the next,
+    # so the main loop keeps running while the dice tumble
+    def animateRoll(self):
+        # randomly generate how many times each die should flip before settling
+        flops = self.flops
+        self.roller.between(FLOP_LOW_BOUND, FLOP_HIGH_BOUND, flops)
+
+        # set up the temporary position array for the dice such that the
+        # generated flops will land each die on their current actual position
+        positions = self.shown
+        for i, value in enumerate(self.values):
+            change = flops[i] % 2
+            if change:
+                positions[i] = int(not self.values[i])
+            else:
+                positions[i] = self.values[i]
+
+        # as long as we're not out of flops, flop each die with flops left and
+        # show each time
+        while max(flops) > 0:
+            yield FLOP_TIME
+            for i, die in enumerate(self.values):
+                if flops[i] == 0:
+                    continue
+                flops[i] -= 1
+                positions[i] = int(not positions[i])
+
+        # assert positions == self.values
+
+    def roll(self):
+        self.roller.rollDice(self.values)
+        for i in range(4):
+            self.shown[i] = self.values[i]
+
+    def getSum(self):
+        return sum(self.values)
+
+    def clear(self):
+        for i in range(4):
+            self.values[i] = None
+            self.shown[i] = None
+
+
+# The game in play: whose turn it is, what stage the turn is at, and what
+# pressing a key does. computer is the player the computer plays, or None
+# for two humans; engine is how it picks moves, "search" (ai.Searcher),
+# "mcts" (mcts.Planner) or "table" (policytable.TablePlayer, searching where
+# the policy table doesn't reach or isn't on the drive). boardLayout is where the path runs on the keys, see
+# layout. clock is the backend's monotonic(), for animations, hints and
+# saving; without one the board plays headless, running animations straight
+# through. timer is the backend's timer(), which the computer's and the
+# hints' search slices are timed with, since clock may only move between
+# frames and is too coarse on the device; hints fall back on clock without
+# one. The engine and hints modules are only imported if they're used, which
+# keeps start up quick on the device
+class Board():
+    __slots__ = ("clock", "path", "dice", "turn", "stage", "selected", "preview",
+                 "legal", "winner", "hinter", "computer", "searcher", "planner",
+                 "recorder", "nextComputerPress", "animation", "animationDue")
+
+    def __init__(self, computer=None, boardLayout=layout.STANDARD, clock=None,
+                 engine="search", showHints=False, timer=None):
+        self.clock = clock
+        self.path = Path(boardLayout)
+        self.dice = Dice()
+        self.turn = 0
+        self.stage = "roll"
+        self.selected = None
+        self.preview = None
+        # the moves the current roll allows, worked out once when the dice
+        # are rolled: bit tileNumber + 1 is set if the token on tileNumber can
+        # move, bit 0 if a waiting token can enter. 0 outside the move stage
+        self.legal = 0
+        self.winner = None
+        self.hinter = None
+        if clock is not None and showHints:
+            import hints
+            self.hinter = hints.Hinter(timer or clock)
+        self.computer = computer
+        self.searcher = None
+        self.planner = None
+        if computer is not None:
+            if engine == "mcts":
+                import mcts
+                self.planner = mcts.Planner()
+            else:
+                import ai
+                self.searcher = ai.Searcher() if timer is None else ai.Searcher(clock=timer)
+            if engine == "table":
+                import policytable
+                try:
+                    table = policytable.PolicyTable()
+                except OSError:
+                    print("no policy table at " + policytable.TABLE_PATH + ", searching instead")
+                else:
+                    self.searcher = policytable.TablePlayer(table, self.searcher)
+        self.recorder = None
+        self.nextComputerPress = 0
+        # the running animation (a generator yielding seconds to wait between
+        # steps) and when its next step is due
+        self.animation = None
+        self.animationDue = 0
+
+    # checks whether a given button pressed is on the path (not in the dice row)
+    # or in the notches
+    def isButtonOnPath(self, button):
+        t = self.path.getTileByCoordinate(button)
+        return t != None
+
+    # sets the previewed tile
+    def setPreview(self, tile, player):
+        self.preview = tile, player
+
+    def isSelected(self, coord):
+        return self.selected == coord
+
+    # works out the moves the roll allows, once, right after the dice are
+    # rolled. Selecting, previewing and the computer's turn all check this
+    # rather than the rules
+    def findLegalMoves(self):
+        legal = 0
+        n = self.dice.getSum()
+        if n:
+            state = self.path.state()
+            moves = bitboard.legalMoves(state, n, self.turn)
+            for tileNumber in moves:
+                legal |= 1 << (tileNumber + 1)
+            # people get hints, the computer doesn't need them
+            if self.hinter is not None and not self.isComputerTurn():
+                self.hinter.start(state, n, self.turn, moves)
+        self.legal = legal
+
+    # once a move's been made or the turn passed
+    def clearLegalMoves(self):
+        self.legal = 0
+        if self.hinter is not None:
+            self.hinter.stop()
+
+    def isLegal(self, tileNumber):
+        return self.legal >> (tileNumber + 1) & 1
+
+    # the tile number the current player would move from by pressing
+    # button: bitboard.OFF_BOARD for their waiting pile, None if it's not a
+    # key with one of their tokens
+    def sourceTile(self, button):
+        boardLayout = self.path.layout
+        if button == boardLayout.waitingKeys[self.turn]:
+            return bitboard.OFF_BOARD
+        found = self.path.byKey[button[1] * layout.WIDTH + button[0]]
+        if found is None:
+            return None
+        tile, player = found
+        if player is not None and player != self.turn:
+            return None
+        if not tile.hasToken(self.turn):
+            return None
+        return tile.number
+
+    # the key of the current player's token on tileNumber, or of their
+    # waiting pile for bitboard.OFF_BOARD
+    def keyOf(self, tileNumber):
+        if tileNumber == bitboard.OFF_BOARD:
+            return self.path.layout.waitingKeys[self.turn]
+        return self.path.data[tileNumber].coordinates[self.turn]
+
+    def isComputerTurn(self):
+        return self.computer is not None and self.turn == self.computer
+
+    # whether anything on the board is moving: a pulsing selection, preview
+    # or roll button, a running animation, or the computer taking its turn.
+    # If not, the main loop can drop to its idle frame rate
+    def isActive(self):
+        if self.stage == "won":
+            return False
+        return (self.selected is not None or self.preview is not None
+                or self.stage == "roll" or self.legal != 0
+                or self.animation is not None or self.isComputerTurn())
+
+    # starts an animation, replacing any that's running. Without a display
+    # there's nothing to watch, so it's run straight through
+    def startAnimation(self, animation):
+        if self.clock is None:
+            for delay in animation:
+                pass
+            return
+        self.animation = animation
+        self.animationDue = self.clock()
+        self.animate()
+
+    # advances the running animation by a step if one is due. Called every
+    # loop, so input and painting carry on in between steps
+    def animate(self):
+        if self.animation is None:
+            return
+        now = self.clock()
+        if now < self.animationDue:
+            return
+        try:
+            self.animationDue = now + next(self.animation)
+        except StopIteration:
+            self.animation = None
+
+    # tumbles the dice, then either waits for a move or, if the roll allows
+    # none (a 0, or every token blocked), passes the turn after a pause to
+    # show the roll. Headless, there's no one to watch the dice tumble
+    def rollAnimation(self):
+        if self.clock is not None:
+            yield from self.dice.animateRoll()
+        if not self.legal:
+            yield ZERO_ROLL_DELAY
+            self.recordPly(self.dice.getSum(), None)
+            self.turn ^= 1
+            self.stage = "roll"
+        else:
+            self.stage = "move"
+
+    # saves a finished turn, if the game is being recorded. The last turn of
+    # the game is written out straight away
+    def recordPly(self, roll, tileNumber, last=False):
+        if self.recorder is None:
+            return
+        now = 0
+        if self.clock is not None:
+            now = self.clock()
+        self.recorder.add(roll, tileNumber, now)
+        if last:
+            self.recorder.flush(now)
+
+    # ends the turn without moving
+    def passTurn(self):
+        self.recordPly(self.dice.getSum(), None)
+        self.turn ^= 1
+        self.stage = "roll"
+        self.selected = None
+        self.preview = None
+        self.clearLegalMoves()
+
+    # the button the computer presses next: the roll button, then the token
+    # the search picks, then that token again to confirm. Returns None and
+    # passes the turn if the computer has no legal move
+    def computerButton(self):
+        if self.stage == "won":
+            return None
+        if self.stage == "roll":
+            return DICE_ROLL_BUTTON
+        if not self.legal:
+            self.passTurn()
+            return None
+        if self.selected is not None:
+            return self.selected
+        engine = self.planner if self.planner is not None else self.searcher
+        tileNumber = engine.bestMove(self.path.state(), self.dice.getSum(), self.turn)
+        if tileNumber is None:
+            self.passTurn()
+            return None
+        return self.keyOf(tileNumber)
+
+    # gives the engine its slice of thinking for this frame while the
+    # computer has a move to pick, starting while the dice still tumble.
+    # True once it has thought enough to press
+    def think(self):
+        if self.stage not in ("rolling", "move") or not self.legal or self.selected is not None:
+            return True
+        engine = self.planner if self.planner is not None else self.searcher
+        engine.think(self.path.state(), self.dice.getSum(), self.turn)
+        return engine.isReady()
+
+    # handles a newly pressed button. These are the rules of the game; they
+    # never touch the display, so a board plays the same headless
+    def pressButton(self, button):
+        path = self.path
+
+        # MOVE STAGE
+        if self.stage == "move":
+            rollValue = self.dice.getSum()
+            tileNumber = self.sourceTile(button)
+            # only the tokens the roll can move are selectable
+            if tileNumber is not None and self.isLegal(tileNumber):
+                if DEBUGGING: print("moving from tile:", tileNumber)
+
+                # if the button that was pressed is already selected,
+                if self.isSelected(button):
+                    # move it
+                    path.moveToken(tileNumber, rollValue, self.turn)
+                    won = path.isWon(self.turn)
+                    self.recordPly(rollValue, tileNumber, won)
+                    self.selected = None
+                    self.preview = None
+                    self.clearLegalMoves()
+                    if won:
+                        self.stage = "won"
+                        self.winner = self.turn
+                        return
+                    # and then, unless it landed on a rosette, pass the turn
+                    if not bitboard.landsOnRosette(tileNumber, rollValue):
+                        # toggles value between 0 and 1
+                        self.turn ^= 1
+                    # also change the stage to "roll" for the next player's turn
+                    self.stage = "roll"
+
+                # if it's a new button that wasn't selected before, select it
+                # and preview where it would go
+                else:
+                    self.selected = button
+                    destinationTileNumber = tileNumber + rollValue
+                    if destinationTileNumber <= 13:
+                        self.setPreview(path.getTile(destinationTileNumber), self.turn)
+                    else:
+                        self.preview = None
+                    if DEBUGGING: print(self.preview)
+
+        # ROLL STAGE
+        elif self.stage == "roll":
+            if button == DICE_ROLL_BUTTON:
+                self.dice.roll()
+                self.findLegalMoves()
+                # presses are ignored until the roll animation is done
+                self.stage = "rolling"
+                self.startAnimation(self.rollAnimation())
@@ -0,0 +1,101 @@
+# Frame pacing
+# ------------
+# FrameScheduler runs the main loop at a fixed frame rate instead of as fast
+# as it can. When nothing on the board is moving (no selection, no preview,
+# no pulsing roll button, no animation) it drops to a low idle rate, but
+# while idling it keeps checking for key input and wakes up as soon as a key
+# is pressed, so the board doesn't feel sluggish.
+#
+# Each frame is split into sections (input, logic, render) with lap(), and
+# the time spent in each is accounted so it can be compared with the frame
+# budget. Sections are timed with timer, which defaults to the clock the
+# frames are paced by.
+
+FRAME_RATE = 30   # frames per second while something is animating
+IDLE_RATE = 4     # frames per second while the board is still
+WAKE_POLL = .01   # seconds between input checks while idling
+
+INPUT = 0
+LOGIC = 1
+RENDER = 2
+SECTION_NAMES = ("input", "logic", "render")
+
+class FrameScheduler:
+    def __init__(self, clock, sleep, frameRate=FRAME_RATE, idleRate=IDLE_RATE, timer=None):
+        self.clock = clock
+        self.sleep = sleep
+        self.timer = timer or clock
+        self.frameRate = frameRate
+        self.idleRate = idleRate
+        self.frameStart = 0
+        self.lapStart = 0
+
+        # accounting. lastTimes is the latest frame, totals are since reset()
+        self.lastTimes = [0.0] * len(SECTION_NAMES)
+        self.totals = [0.0] * len(SECTION_NAMES)
+        self.frames = 0
+        self.idleFrames = 0
+        self.wakes = 0
+        self.overruns = 0 # frames that took longer than their budget
+        self.sleepTotal = 0.0
+
+    def reset(self):
+        for i in range(len(SECTION_NAMES)):
+            self.totals[i] = 0.0
+        self.frames = 0
+        self.idleFrames = 0
+        self.wakes = 0
+        self.overruns = 0
+        self.sleepTotal = 0.0
+
+    def beginFrame(self):
+        self.frameStart = self.clock()
+        self.lapStart = self.timer()
+
+    # ends the current section of the frame
+    def lap(self, section):
+        now = self.timer()
+        elapsed = now - self.lapStart
+        self.lastTimes[section] = elapsed
+        self.totals[section] += elapsed
+        self.lapStart = now
+
+    # waits out the rest of the frame. active says whether anything is
+    # animating; if not, the frame is stretched to the idle rate, but wake()
+    # is checked every WAKE_POLL seconds and ends the wait early when it
+    # returns True
+    def endFrame(self, active, wake=None):
+        self.frames += 1
+        if active:
+            budget = 1 / self.frameRate
+        else:
+            budget = 1 / self.idleRate
+            self.idleFrames += 1
+        end = self.frameStart + budget
+        now = self.clock()
+        if now > end:
+            self.overruns += 1
+            return
+        sleepStart = now
+        while now < end:
+            if active or wake is None:
+                self.sleep(end - now)
+            else:
+                self.sleep(min(WAKE_POLL, end - now))
+                if wake():
+                    self.wakes += 1
+                    break
+            now = self.clock()
+        self.sleepTotal += self.clock() - sleepStart
+
+    def stats(self):
+        if not self.frames:
+            return "no frames"
+        budget = 1000 / self.frameRate
+        out = "%d frames (%d idle, %d woken early, %d over budget); mean ms per frame:" % (
+            self.frames, self.idleFrames, self.wakes, self.overruns)
+        for i in range(len(SECTION_NAMES)):
+            mean = self.totals[i] * 1000 / self.frames
+            out += " %s %.2f (%d%%)" % (SECTION_NAMES[i], mean, 100 * mean / budget)
+        out += ", asleep %.1f" % (self.sleepTotal * 1000 / self.frames)
+        return out
@@ -0,0 +1,321 @@
+# Game server
+# -----------
+# Desktop only. Hosts many games of Ur at once in one process, for players
+# connecting over TCP or a Unix socket. Every match is a headless
+# rules.Board, so it plays by exactly the rules the NeoTrellis does, going
+# through the same "roll", "move" and "won" stages; without a clock the dice
+# don't tumble and a roll with no move passes straight away.
+#
+# The protocol is JSON, one object per line each way. Every request has an
+# "op", and an "id" the reply echoes back, so a client can have several
+# requests in flight on one connection:
+#
+#   {"op": "new", "id": 1}                     a match with both seats yours
+#   {"op": "new", "id": 1, "bot": 1}           the computer plays player 1
+#   {"op": "new", "id": 1, "seat": 0}          you play 0, player 1 can join
+#   {"op": "join", "id": 2, "game": 7}         take a match's open seat
+#   {"op": "roll", "id": 3, "game": 7}
+#   {"op": "move", "id": 4, "game": 7, "tile": 3}
+#   {"op": "view", "id": 5, "game": 7}
+#
+# The reply to each of these is the match as it now is:
+#
+#   {"id": 4, "game": 7, "seat": 0, "turn": 1, "stage": "roll",
+#    "state": 123456, "roll": null, "moves": [], "winner": null,
+#    "plies": [[0, 2, 3]]}
+#
+# seat is null if both seats are yours, or neither. state is the position packed as in
+# bitboard, moves the tile numbers the roll lets the player move (-1 for
+# entering a waiting token), and plies the turns played since the last reply
+# or update about the match, as [player, roll, tile number or null for a
+# pass]; they include the bot's turns, which it plays as soon as it's its
+# turn. A view leaves the plies for the next reply. A request that can't be
+# done gets {"id": ..., "error": "..."}. When the other seat of a match is
+# someone else, they're sent the same object without an "id" as an update.
+# A match is dropped once it's won or either of its players disconnects,
+# or stops reading and lets MAX_BUFFERED bytes of updates pile up.
+#
+#   python server.py [address]
+#
+# address is host:port for TCP, anything else is the path of a Unix socket.
+# benchmarks/bench_server.py puts a server under load.
+
+import asyncio
+import json
+import sys
+
+import ai
+import bitboard
+import dice
+import rules
+
+ADDRESS = "127.0.0.1:7700"
+BOT_THINK_TIME = .002   # seconds the bots search per move, holding up every match
+BOT_CHECK_EVERY = 4     # decision nodes between looks at the clock, to keep to it
+MAX_LINE = 4096         # bytes in a request
+MAX_BUFFERED = 1 << 20  # bytes waiting to go out to a client before it's dropped as stalled
+
+# keeps the turns played in a match for its next reply, where Board saves
+# them to a record. Board adds a ply before passing the turn, so the player
+# is whose turn it still is
+class PlyLog:
+    def __init__(self, board):
+        self.board = board
+        self.plies = []
+
+    def add(self, roll, tileNumber, now):
+        self.plies.append((self.board.turn, roll, tileNumber))
+
+    # plies are kept until a view takes them, there's nothing to write
+    def flush(self, now):
+        pass
+
+    def take(self):
+        plies = self.plies
+        self.plies = []
+        return plies
+
+class Match:
+    def __init__(self, number, board):
+        self.number = number
+        self.board = board
+        self.log = PlyLog(board)
+        board.recorder = self.log
+        # the connection in each seat, or None for the bot or a seat no one
+        # has joined yet
+        self.seats = [None, None]
+        self.bot = None
+
+    def isOpen(self, seat):
+        return self.seats[seat] is None and seat != self.bot
+
+    # the tile numbers the roll lets the player to move move
+    def moves(self):
+        board = self.board
+        moves = []
+        legal = board.legal
+        tileNumber = bitboard.OFF_BOARD
+        while legal:
+            if legal & 1:
+                moves.append(tileNumber)
+            legal >>= 1
+            tileNumber += 1
+        return moves
+
+    # the bot plays while it's its turn, pressing buttons as it does on the
+    # device
+    def playBot(self):
+        board = self.board
+        while board.stage != "won" and board.isComputerTurn():
+            button = board.computerButton()
+            if button is not None:
+                board.pressButton(button)
+
+    # the match as seen from seat, with the plies played since the last
+    # time they were taken
+    def view(self, seat, takePlies=True):
+        board = self.board
+        plies = self.log.take() if takePlies else []
+        return {"game": self.number, "seat": seat, "turn": board.turn, "stage": board.stage,
+                "state": board.path.state(),
+                "roll": board.dice.getSum() if board.stage == "move" else None,
+                "moves": self.moves(), "winner": board.winner, "plies": plies}
+
+class Server:
+    def __init__(self, botThinkTime=BOT_THINK_TIME):
+        self.matches = {}
+        self.nextNumber = 1
+        # one searcher for every bot, since only one plays at a time
+        self.searcher = ai.Searcher(thinkTime=botThinkTime, checkEvery=BOT_CHECK_EVERY)
+        self.started = 0
+        self.finished = 0
+
+    def newMatch(self, connection, request):
+        board = rules.Board()
+        if "seed" in request:
+            board.dice.roller = dice.stream(int(request["seed"]))
+        match = Match(self.nextNumber, board)
+        self.nextNumber += 1
+        self.matches[match.number] = match
+        self.started += 1
+        bot = request.get("bot")
+        seat = request.get("seat")
+        if bot is not None:
+            match.bot = int(bot) & 1
+            board.computer = match.bot
+            board.searcher = self.searcher
+            match.seats[match.bot ^ 1] = connection
+        elif seat is not None:
+            match.seats[int(seat) & 1] = connection
+        else:
+            match.seats[0] = connection
+            match.seats[1] = connection
+        connection.matches.add(match.number)
+        match.playBot()
+        return match
+
+    def joinMatch(self, connection, match):
+        for seat in (0, 1):
+            if match.isOpen(seat):
+                match.seats[seat] = connection
+                connection.matches.add(match.number)
+                return
+        raise ValueError("no open seat")
+
+    def endMatch(self, match):
+        self.matches.pop(match.number, None)
+        for connection in match.seats:
+            if connection is not None:
+                connection.matches.discard(match.number)
+        self.finished += 1
+
+    # plays a request from connection, returning the match it was about
+    def play(self, connection, request):
+        op = request.get("op")
+        if op == "new":
+            return self.newMatch(connection, request)
+        match = self.matches.get(request.get("game"))
+        if match is None:
+            raise ValueError("no such game")
+        if op == "join":
+            self.joinMatch(connection, match)
+            return match
+        if op == "view":
+            return match
+        board = match.board
+        if match.seats[board.turn] is not connection:
+            raise ValueError("not your turn")
+        if op == "roll":
+            if board.stage != "roll":
+                raise ValueError("not the roll stage")
+            board.pressButton(rules.DICE_ROLL_BUTTON)
+        elif op == "move":
+            tileNumber = request.get("tile")
+            if (board.stage != "move" or type(tileNumber) is not int
+                    or tileNumber < bitboard.OFF_BOARD or not board.isLegal(tileNumber)):
+                raise ValueError("not a legal move")
+            # select the token, then press it again to move it
+            button = board.keyOf(tileNumber)
+            board.pressButton(button)
+            board.pressButton(button)
+        else:
+            raise ValueError("unknown op")
+        match.playBot()
+        return match
+
+    # the reply to a line from connection, and an update for the match's
+    # other player if it changed
+    def handle(self, connection, line):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"error": "not JSON"}, None, None
+        if not isinstance(request, dict):
+            return {"error": "not an object"}, None, None
+        try:
+            match = self.play(connection, request)
+        except (ValueError, TypeError) as e:
+            return {"id": request.get("id"), "error": str(e)}, None, None
+        # seat is None for hot seat play, or for a view by someone not
+        # playing in the match
+        seats = match.seats
+        seat = None
+        other = None
+        if seats[0] is not seats[1]:
+            for i in (0, 1):
+                if seats[i] is connection:
+                    seat = i
+                    other = seats[i ^ 1]
+        changed = request.get("op") != "view"
+        reply = match.view(seat, changed)
+        reply["id"] = request.get("id")
+        update = None
+        if other is not None and changed:
+            update = dict(reply)
+            del update["id"]
+            update["seat"] = seat ^ 1
+        if match.board.stage == "won":
+            self.endMatch(match)
+        return reply, other, update
+
+    async def serve(self, reader, writer):
+        connection = Connection(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if len(line) > MAX_LINE:
+                    connection.send({"error": "request too long"})
+                    break
+                reply, other, update = self.handle(connection, line)
+                connection.send(reply)
+                if update is not None:
+                    other.send(update)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self.disconnect(connection)
+            writer.close()
+
+    # drops the matches of a player who's gone, telling their opponents
+    def disconnect(self, connection):
+        for number in list(connection.matches):
+            match = self.matches.get(number)
+            if match is None:
+                continue
+            self.endMatch(match)
+            for other in match.seats:
+                if other is not None and other is not connection:
+                    other.send({"game": number, "error": "opponent left"})
+
+    def stats(self):
+        return "matches: %d playing, %d started, %d finished" % (len(self.matches), self.started, self.finished)
+
+class Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.matches = set()
+
+    # queues message for the client. serve() only waits for a client's own
+    # replies to go out; updates about its matches are sent from other
+    # clients' requests, which mustn't wait on it, so a client that stops
+    # reading is dropped once MAX_BUFFERED bytes are waiting for it. Its
+    # serve() then finds the connection gone and ends its matches
+    def send(self, message):
+        writer = self.writer
+        if writer.is_closing():
+            return
+        writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+        if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+            writer.transport.abort()
+
+# a host:port address as (host, port), or None for a Unix socket path
+def parseAddress(address):
+    host, colon, port = address.rpartition(":")
+    if colon and port.isdigit() and "/" not in address:
+        return host, int(port)
+    return None
+
+async def start(server, address=ADDRESS):
+    tcp = parseAddress(address)
+    if tcp is None:
+        return await asyncio.start_unix_server(server.serve, address, limit=MAX_LINE * 2)
+    return await asyncio.start_server(server.serve, tcp[0], tcp[1], limit=MAX_LINE * 2)
+
+async def serveForever(address):
+    server = Server()
+    listener = await start(server, address)
+    print("serving on %s" % address, flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+def main(address=ADDRESS):
+    try:
+        asyncio.run(serveForever(address))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,312 @@
+# Exact solution of the game by value iteration
+# ---------------------------------------------
+# Desktop only, needs NumPy. Every position is looked at from the side of
+# the player about to roll ("own") against their opponent ("enemy"), which
+# halves the table: the value of a position is the probability that the
+# player about to roll goes on to win with perfect play from both sides.
+#
+#   V(s)    = sum over rolls r of P(r) * Q(s, r)
+#   Q(s, r) = best over legal moves of
+#               1              if the move bears off the last token
+#               V(s')          if it lands on a rosette (roll again)
+#               1 - V(flip s') otherwise (the opponent rolls next)
+#             or 1 - V(flip s) if there's no legal move
+#
+# The rules are the ones in Path.canMoveToken / bitboard, including entering
+# from off the board, captures on the shared row and the extra roll after a
+# rosette from the main loop.
+#
+# Positions are numbered with a perfect index: every consistent position
+# (each player's tokens on the board, waiting and borne off add up to the
+# token count, shared tiles hold at most one token) gets a distinct number
+# in 0 to count-1 with no gaps. Unreachable but consistent positions are
+# included, which is simpler than searching for reachable ones and costs
+# little. The number is built from:
+#
+#   shared row   each of its 8 tiles is empty, own or enemy: 3**8 patterns
+#   own side     own private tiles (6 bits) and waiting count, only the
+#                combinations that fit next to the own tokens on the row
+#   enemy side   the same for the enemy
+#
+#   index = SHARED_OFFSET[row] + ownSide * sideCount(enemy row tokens) + enemySide
+#
+# While solving, the values are float32s in a memory-mapped working file
+# rather than on the heap (see main). The solved values are written to a
+# binary file of 16-bit fixed point win probabilities after a small header,
+# and SolvedTable reads single entries from it through a memory map, so
+# lookups are O(1) and only touch the pages they need.
+
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+import bitboard
+
+SHARED_TILES = 8
+SHARED_PATTERNS = 3 ** SHARED_TILES
+PRIVATE_BITS = 6
+ROLL_PROBABILITIES = np.array((1, 4, 6, 4, 1)) / 16
+SLOTS = bitboard.PATH_LENGTH + 1
+SAFE_MASK = bitboard.SHARED_MASK & bitboard.ROSETTE_MASK
+CAPTURE_MASK = bitboard.SHARED_MASK & ~bitboard.ROSETTE_MASK
+LOW_PRIVATE_MASK = 0xF    # tiles 0-3
+HIGH_PRIVATE_SHIFT = 12   # tiles 12-13
+
+MAGIC = b"URSOLVE1"
+HEADER = struct.Struct("<8sIIQ") # magic, tokens, sweeps, count
+VALUE_SCALE = 65535
+WORK_SUFFIX = ".work"
+
+def popCount(values):
+    values = np.asarray(values, dtype=np.int64)
+    count = np.zeros(values.shape, dtype=np.int64)
+    for bit in range(bitboard.PATH_LENGTH):
+        count += (values >> bit) & 1
+    return count
+
+class StateIndex:
+    def __init__(self, tokens=bitboard.TOKENS_PER_PLAYER):
+        assert 1 <= tokens <= bitboard.TOKENS_PER_PLAYER
+        self.tokens = tokens
+
+        # ternary digits of the shared row for each 8-bit pattern of one
+        # player's tokens on it
+        bytes_ = np.arange(1 << SHARED_TILES)
+        self.ternary = np.zeros(1 << SHARED_TILES, dtype=np.int64)
+        for bit in range(SHARED_TILES):
+            self.ternary += ((bytes_ >> bit) & 1) * 3 ** bit
+
+        # the own and enemy byte of every shared row pattern
+        patterns = np.arange(SHARED_PATTERNS)
+        self.rowOwn = np.zeros(SHARED_PATTERNS, dtype=np.int64)
+        self.rowEnemy = np.zeros(SHARED_PATTERNS, dtype=np.int64)
+        digits = patterns.copy()
+        for bit in range(SHARED_TILES):
+            self.rowOwn |= (digits % 3 == 1) << bit
+            self.rowEnemy |= (digits % 3 == 2) << bit
+            digits //= 3
+        self.rowOwnCount = popCount(self.rowOwn)
+        self.rowEnemyCount = popCount(self.rowEnemy)
+
+        # side combinations (private bits, waiting) that fit next to c tokens
+        # on the shared row, for each c
+        self.sideRank = np.full((SHARED_TILES + 1, (1 << PRIVATE_BITS) * 8), -1, dtype=np.int64)
+        self.sidePrivate = np.zeros((SHARED_TILES + 1, (1 << PRIVATE_BITS) * 8), dtype=np.int64)
+        self.sideWaiting = np.zeros((SHARED_TILES + 1, (1 << PRIVATE_BITS) * 8), dtype=np.int64)
+        self.sideCount = np.zeros(SHARED_TILES + 1, dtype=np.int64)
+        for c in range(SHARED_TILES + 1):
+            rank = 0
+            for private in range(1 << PRIVATE_BITS):
+                for waiting in range(8):
+                    if c + bin(private).count("1") + waiting <= tokens:
+                        self.sideRank[c, private * 8 + waiting] = rank
+                        self.sidePrivate[c, rank] = private
+                        self.sideWaiting[c, rank] = waiting
+                        rank += 1
+            self.sideCount[c] = rank
+
+        sizes = self.sideCount[self.rowOwnCount] * self.sideCount[self.rowEnemyCount]
+        self.sharedOffset = np.zeros(SHARED_PATTERNS + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.sharedOffset[1:])
+        self.count = int(self.sharedOffset[-1])
+
+    # index of positions given as arrays of own/enemy tile masks and waiting
+    # counts. Every argument has to describe a consistent position
+    def rank(self, own, enemy, ownWaiting, enemyWaiting):
+        ownRow = (own >> 4) & 0xFF
+        enemyRow = (enemy >> 4) & 0xFF
+        row = self.ternary[ownRow] + 2 * self.ternary[enemyRow]
+        ownPrivate = (own & LOW_PRIVATE_MASK) | ((own >> HIGH_PRIVATE_SHIFT) << 4)
+        enemyPrivate = (enemy & LOW_PRIVATE_MASK) | ((enemy >> HIGH_PRIVATE_SHIFT) << 4)
+        ownSide = self.sideRank[self.rowOwnCount[row], ownPrivate * 8 + ownWaiting]
+        enemySide = self.sideRank[self.rowEnemyCount[row], enemyPrivate * 8 + enemyWaiting]
+        return self.sharedOffset[row] + ownSide * self.sideCount[self.rowEnemyCount[row]] + enemySide
+
+    # (own, enemy, ownWaiting, enemyWaiting) arrays of positions by index
+    def unrank(self, index):
+        index = np.asarray(index, dtype=np.int64)
+        row = np.searchsorted(self.sharedOffset, index, side="right") - 1
+        rest = index - self.sharedOffset[row]
+        enemySides = self.sideCount[self.rowEnemyCount[row]]
+        ownSide = rest // enemySides
+        enemySide = rest % enemySides
+        ownCount = self.rowOwnCount[row]
+        enemyCount = self.rowEnemyCount[row]
+        ownPrivate = self.sidePrivate[ownCount, ownSide]
+        enemyPrivate = self.sidePrivate[enemyCount, enemySide]
+        own = (self.rowOwn[row] << 4) | (ownPrivate & LOW_PRIVATE_MASK) | ((ownPrivate >> 4) << HIGH_PRIVATE_SHIFT)
+        enemy = (self.rowEnemy[row] << 4) | (enemyPrivate & LOW_PRIVATE_MASK) | ((enemyPrivate >> 4) << HIGH_PRIVATE_SHIFT)
+        return own, enemy, self.sideWaiting[ownCount, ownSide], self.sideWaiting[enemyCount, enemySide]
+
+    # index of a bitboard position with player about to roll
+    def rankState(self, state, player):
+        return int(self.rank(
+            np.int64(bitboard.getMask(state, player)),
+            np.int64(bitboard.getMask(state, player ^ 1)),
+            np.int64(bitboard.getWaiting(state, player)),
+            np.int64(bitboard.getWaiting(state, player ^ 1))))
+
+# best value over the moves available with roll r in a block of positions
+def bestMoveValues(index, values, own, enemy, ownWaiting, enemyWaiting, r):
+    tokens = index.tokens
+    # value if the turn just passes
+    passValue = 1 - values[index.rank(enemy, own, enemyWaiting, ownWaiting)]
+    if r == 0:
+        return passValue
+    best = np.full(len(own), -1.0)
+    ownHome = tokens - ownWaiting - popCount(own)
+    for slot in range(SLOTS):
+        tileNumber = slot - 1
+        destination = tileNumber + r
+        if destination > bitboard.PATH_LENGTH:
+            continue
+        if tileNumber == bitboard.OFF_BOARD:
+            legal = ownWaiting > 0
+            newOwn = own
+            newWaiting = ownWaiting - 1
+        else:
+            legal = (own >> tileNumber) & 1 == 1
+            newOwn = own & ~(1 << tileNumber)
+            newWaiting = ownWaiting
+        newEnemy = enemy
+        newEnemyWaiting = enemyWaiting
+        if destination == bitboard.PATH_LENGTH:
+            won = legal & (ownHome + 1 == tokens)
+            value = np.where(won, 1.0, 0.0)
+            rest = legal & ~won
+            if rest.any():
+                value[rest] = 1 - values[index.rank(
+                    enemy[rest], newOwn[rest], enemyWaiting[rest], newWaiting[rest])]
+        else:
+            destinationBit = 1 << destination
+            legal = legal & (own & destinationBit == 0)
+            if destinationBit & SAFE_MASK:
+                legal &= enemy & destinationBit == 0
+            newOwn = newOwn | destinationBit
+            if destinationBit & CAPTURE_MASK:
+                captured = (enemy & destinationBit) != 0
+                newEnemy = enemy & ~destinationBit
+                newEnemyWaiting = enemyWaiting + captured
+            value = np.zeros(len(own))
+            if legal.any():
+                if destinationBit & bitboard.ROSETTE_MASK:
+                    value[legal] = values[index.rank(
+                        newOwn[legal], newEnemy[legal], newWaiting[legal], newEnemyWaiting[legal])]
+                else:
+                    value[legal] = 1 - values[index.rank(
+                        newEnemy[legal], newOwn[legal], newEnemyWaiting[legal], newWaiting[legal])]
+        best = np.where(legal & (value > best), value, best)
+    return np.where(best < 0, passValue, best)
+
+# runs value iteration over every position in blocks of blockSize, updating
+# values in place, until no value moves by more than tolerance. values can
+# be a memory map to keep the working set off the heap
+def solve(tokens=bitboard.TOKENS_PER_PLAYER, tolerance=1e-6, blockSize=1 << 20,
+          maxSweeps=10000, values=None, log=None):
+    index = StateIndex(tokens)
+    if values is None:
+        values = np.zeros(index.count, dtype=np.float64)
+    sweeps = 0
+    while sweeps < maxSweeps:
+        start = time.perf_counter()
+        change = 0.0
+        for first in range(0, index.count, blockSize):
+            block = np.arange(first, min(first + blockSize, index.count))
+            own, enemy, ownWaiting, enemyWaiting = index.unrank(block)
+            ownHome = tokens - ownWaiting - popCount(own)
+            enemyHome = tokens - enemyWaiting - popCount(enemy)
+            newValues = np.zeros(len(block))
+            for r in range(1, len(ROLL_PROBABILITIES)):
+                newValues += ROLL_PROBABILITIES[r] * bestMoveValues(
+                    index, values, own, enemy, ownWaiting, enemyWaiting, r)
+            newValues += ROLL_PROBABILITIES[0] * bestMoveValues(
+                index, values, own, enemy, ownWaiting, enemyWaiting, 0)
+            # finished games: whoever bore off everything has won
+            newValues = np.where(enemyHome == tokens, 0.0, newValues)
+            newValues = np.where(ownHome == tokens, 1.0, newValues)
+            change = max(change, float(np.abs(newValues - values[first:first + len(block)]).max()))
+            values[first:first + len(block)] = newValues
+        sweeps += 1
+        if log is not None:
+            log("sweep %d: largest change %.3g, %.1f s" % (sweeps, change, time.perf_counter() - start))
+        if change < tolerance:
+            break
+    return index, values, sweeps
+
+def write(path, index, values, sweeps):
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, index.tokens, sweeps, index.count))
+        blockSize = 1 << 20
+        for first in range(0, index.count, blockSize):
+            block = np.asarray(values[first:first + blockSize])
+            f.write(np.round(np.clip(block, 0, 1) * VALUE_SCALE).astype("<u2").tobytes())
+
+# a solved table on disk. The values are memory mapped, so opening it and
+# looking positions up doesn't read the whole file
+class SolvedTable:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, self.tokens, self.sweeps, self.count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(path + " is not a solved Ur table")
+        self.index = StateIndex(self.tokens)
+        assert self.index.count == self.count
+        self.values = np.memmap(path, dtype="<u2", mode="r", offset=HEADER.size, shape=(self.count,))
+
+    # probability that player, about to roll in bitboard position state, wins
+    def winProbability(self, state, player):
+        return int(self.values[self.index.rankState(state, player)]) / VALUE_SCALE
+
+    # the winning chances of player after each legal move with roll n, as a
+    # dict of tile number -> probability
+    def moveValues(self, state, n, player):
+        out = {}
+        for tileNumber in bitboard.legalMoves(state, n, player):
+            child = bitboard.moveToken(state, tileNumber, n, player)
+            if bitboard.isWon(child, player):
+                out[tileNumber] = 1.0
+            elif bitboard.landsOnRosette(tileNumber, n):
+                out[tileNumber] = self.winProbability(child, player)
+            else:
+                out[tileNumber] = 1 - self.winProbability(child, player ^ 1)
+        return out
+
+    def bestMove(self, state, n, player):
+        values = self.moveValues(state, n, player)
+        if not values:
+            return None
+        return max(values, key=values.get)
+
+# the bitboard position a solved table with fewer than 7 tokens starts from
+def startState(tokens):
+    return bitboard.pack(0, 0, tokens, tokens)
+
+# python solver.py [tokens] [output file]
+#
+# The values being worked on are float32s in a memory-mapped file next to
+# the output (WORK_SUFFIX), deleted once the table is written: 552 MB for 7
+# tokens. The whole file is read every sweep, so a solve only goes at a
+# useful speed with that much RAM free for the OS to cache it, plus a few
+# hundred MB for the blocks being worked on. A 7-token solve takes hundreds
+# of sweeps of several minutes each
+def main(tokens=bitboard.TOKENS_PER_PLAYER, path=None):
+    tokens = int(tokens)
+    if path is None:
+        path = "ur-solved-%d.bin" % tokens
+    index = StateIndex(tokens)
+    print("%d tokens: %d positions, table %.1f MB, working values %.1f MB"
+          % (tokens, index.count, index.count * 2 / 1e6, index.count * 4 / 1e6))
+    workPath = path + WORK_SUFFIX
+    values = np.memmap(workPath, dtype=np.float32, mode="w+", shape=(index.count,))
+    index, values, sweeps = solve(tokens, values=values, log=print)
+    write(path, index, values, sweeps)
+    del values
+    os.remove(workPath)
+    table = SolvedTable(path)
+    print("wrote %s; first player wins %.4f from the start" % (path, table.winProbability(startState(tokens), 0)))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,254 @@
+# Self-play tournaments across a process pool
+# -------------------------------------------
+# Desktop only. Plays every pair of entrants against each other, half the
+# games with each entrant moving first, and reports each pairing's win rate
+# with a 95% confidence interval and an Elo rating for every entrant.
+#
+# Entrants are batchsim's vectorized policies ("random", "lead", "trail",
+# "greedy"), which play thousands of games per task in lockstep, and the
+# computer opponents ("search" for ai.Searcher, "mcts" for mcts.Planner),
+# which play one move at a time on bitboard and so get far fewer games per
+# task. When a bot plays a batchsim policy, the policy is asked about one
+# game at a time.
+#
+# The games are split into tasks handed to a multiprocessing pool. Each task
+# gets its own seed, spawned from the tournament's seed with
+# np.random.SeedSequence, so results don't depend on which worker ran what,
+# and results are streamed back and tallied as tasks finish.
+#
+#   python tournament.py [entrants] [games] [workers] [seed]
+#   python tournament.py bench [games] [workers]
+#
+# entrants is comma separated, e.g. greedy,lead,random. games is per pairing.
+
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+import numpy as np
+
+import ai
+import batchsim
+import bitboard
+import dice
+import mcts
+
+GAMES = 100000      # games per pairing unless given
+BENCH_GAMES = 400000
+BATCH_GAMES = 20000 # games per task between batchsim policies
+BOT_GAMES = 10      # games per task involving a bot
+SEARCH_THINK_TIME = .01
+MCTS_PLAYOUTS = 100
+Z = 1.96            # 95% confidence
+ELO_ITERATIONS = 200
+
+BOTS = ("search", "mcts")
+
+def isBot(name):
+    return name in BOTS
+
+# what a batchsim policy reads from the sim, for a single game
+class OneGame:
+    def __init__(self, own, enemy):
+        self.own = np.array([own], dtype=batchsim.DTYPE)
+        self.enemy = np.array([enemy], dtype=batchsim.DTYPE)
+
+# a function choosing the tile number player moves with roll n in state, for
+# entrant name, playing one game at a time
+def makeChooser(name, rng):
+    if name == "search":
+        searcher = ai.Searcher(thinkTime=SEARCH_THINK_TIME)
+        return lambda state, n, player, moves: searcher.chooseMove(state, n, player)
+    if name == "mcts":
+        planner = mcts.Planner(rng=rng)
+        return lambda state, n, player, moves: planner.chooseMove(state, n, player, MCTS_PLAYOUTS)
+    policy = batchsim.POLICIES[name]
+    npRng = np.random.default_rng(rng.getrandbits(32))
+    def choose(state, n, player, moves):
+        legal = 0
+        for tileNumber in moves:
+            legal |= 1 << (tileNumber + 1)
+        game = OneGame(bitboard.getMask(state, player), bitboard.getMask(state, player ^ 1))
+        slot = policy(game, np.array([legal], dtype=batchsim.DTYPE),
+                      np.array([n], dtype=batchsim.DTYPE), npRng)[0]
+        return int(slot) - 1
+    return choose
+
+# plays games one move at a time. Returns player 0's wins
+def playOneByOne(name0, name1, games, seed):
+    rng = random.Random(seed)
+    roller = dice.stream(rng.getrandbits(32))
+    choosers = (makeChooser(name0, rng), makeChooser(name1, rng))
+    wins = 0
+    for game in range(games):
+        state = bitboard.START
+        turn = 0
+        while True:
+            n = roller.roll()
+            moves = bitboard.legalMoves(state, n, turn) if n else []
+            if moves:
+                tileNumber = choosers[turn](state, n, turn, moves)
+                state = bitboard.moveToken(state, tileNumber, n, turn)
+                if bitboard.isWon(state, turn):
+                    wins += turn == 0
+                    break
+                if bitboard.landsOnRosette(tileNumber, n):
+                    continue
+            turn ^= 1
+    return wins
+
+# runs in a worker: (name0, name1, games, seed) -> (name0, name1, games,
+# player 0's wins, seconds taken)
+def playTask(task):
+    name0, name1, games, seed = task
+    start = time.perf_counter()
+    if isBot(name0) or isBot(name1):
+        wins = playOneByOne(name0, name1, games, seed)
+    else:
+        sim = batchsim.BatchSim(games, seed)
+        winners = sim.play((batchsim.POLICIES[name0], batchsim.POLICIES[name1]))
+        wins = int((winners == 0).sum())
+    return name0, name1, games, wins, time.perf_counter() - start
+
+# the tasks for games games between every pair of entrants, half with each
+# moving first
+def makeTasks(entrants, games, seed):
+    plan = []
+    for i in range(len(entrants)):
+        for j in range(i + 1, len(entrants)):
+            a = entrants[i]
+            b = entrants[j]
+            size = BOT_GAMES if isBot(a) or isBot(b) else BATCH_GAMES
+            for first, second, count in ((a, b, games - games // 2), (b, a, games // 2)):
+                while count > 0:
+                    plan.append((first, second, min(size, count)))
+                    count -= size
+    seeds = np.random.SeedSequence(seed).spawn(len(plan))
+    return [(first, second, count, int(s.generate_state(1)[0]))
+            for (first, second, count), s in zip(plan, seeds)]
+
+# (win rate, low, high) by the Wilson score interval
+def winRate(wins, games):
+    if not games:
+        return .5, 0.0, 1.0
+    p = wins / games
+    denominator = 1 + Z * Z / games
+    centre = (p + Z * Z / (2 * games)) / denominator
+    spread = Z * math.sqrt(p * (1 - p) / games + Z * Z / (4 * games * games)) / denominator
+    return p, max(0.0, centre - spread), min(1.0, centre + spread)
+
+# Elo difference that makes a win rate of p expected
+def eloDifference(p):
+    p = min(max(p, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / p - 1)
+
+# Elo rating of each entrant, averaging 0, fitted to every pairing's results
+# as a Bradley-Terry model. Half a win and half a loss are added to each
+# pairing so an unbeaten entrant doesn't run off to infinity
+def fitElo(entrants, wins, games):
+    strength = {name: 1.0 for name in entrants}
+    for iteration in range(ELO_ITERATIONS):
+        updated = {}
+        for a in entrants:
+            won = 0.0
+            expected = 0.0
+            for b in entrants:
+                if a == b or not games.get((a, b)):
+                    continue
+                won += wins[(a, b)] + .5
+                expected += (games[(a, b)] + 1) / (strength[a] + strength[b])
+            updated[a] = won / expected if expected else 1.0
+        strength = updated
+    ratings = {name: 400 * math.log10(strength[name]) for name in entrants}
+    mean = sum(ratings.values()) / len(ratings)
+    return {name: rating - mean for name, rating in ratings.items()}
+
+class Tally:
+    def __init__(self, entrants):
+        self.entrants = entrants
+        self.wins = {}  # (a, b) -> a's wins over b, either moving first
+        self.games = {} # (a, b) -> games between them
+        self.firstWins = 0
+        self.total = 0
+        self.seconds = 0.0 # worker time
+
+    def add(self, name0, name1, games, wins, seconds):
+        for a, b, won in ((name0, name1, wins), (name1, name0, games - wins)):
+            self.wins[(a, b)] = self.wins.get((a, b), 0) + won
+            self.games[(a, b)] = self.games.get((a, b), 0) + games
+        self.firstWins += wins
+        self.total += games
+        self.seconds += seconds
+
+    def report(self):
+        lines = []
+        entrants = self.entrants
+        for i in range(len(entrants)):
+            for j in range(i + 1, len(entrants)):
+                a = entrants[i]
+                b = entrants[j]
+                games = self.games.get((a, b), 0)
+                p, low, high = winRate(self.wins.get((a, b), 0), games)
+                lines.append("%-8s vs %-8s %9d games  %s wins %.4f [%.4f, %.4f]  Elo %+.0f [%+.0f, %+.0f]" % (
+                    a, b, games, a, p, low, high, eloDifference(p), eloDifference(low), eloDifference(high)))
+        ratings = fitElo(entrants, self.wins, self.games)
+        lines.append("ratings: " + ", ".join("%s %+.0f" % (name, ratings[name])
+                     for name in sorted(entrants, key=lambda name: -ratings[name])))
+        p, low, high = winRate(self.firstWins, self.total)
+        lines.append("moving first wins %.4f [%.4f, %.4f] over %d games" % (p, low, high, self.total))
+        return "\n".join(lines)
+
+# plays the tournament on workers processes, calling progress(tally) as
+# results come in. Returns the Tally
+def run(entrants, games, workers=None, seed=None, progress=None):
+    tasks = makeTasks(entrants, games, seed)
+    tally = Tally(entrants)
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(playTask, tasks):
+            tally.add(*result)
+            if progress is not None:
+                progress(tally)
+    return tally
+
+# games per second on 1 worker and on workers workers, the same greedy vs
+# random games each time
+def bench(games=BENCH_GAMES, workers=None):
+    workers = workers or multiprocessing.cpu_count()
+    counts = sorted(set((1, workers)))
+    base = None
+    for count in counts:
+        start = time.perf_counter()
+        tally = run(["greedy", "random"], games, count, seed=1)
+        elapsed = time.perf_counter() - start
+        rate = tally.total / elapsed
+        if base is None:
+            base = rate
+        print("%d worker%s: %d games in %.2f s, %.0f games/s, %.0f games/s per worker, %.0f%% of linear scaling"
+              % (count, "" if count == 1 else "s", tally.total, elapsed, rate, rate / count,
+                 100 * rate / (base * count)))
+
+def main(entrants="greedy,lead,trail,random", games=None, workers=None, seed=None):
+    if entrants == "bench":
+        bench(BENCH_GAMES if games is None else int(games), int(workers) if workers else None)
+        return
+    entrants = entrants.split(",")
+    for name in entrants:
+        if not isBot(name) and name not in batchsim.POLICIES:
+            raise ValueError("unknown entrant %s" % name)
+    start = time.perf_counter()
+    lastPrint = [start]
+    def progress(tally):
+        now = time.perf_counter()
+        if now - lastPrint[0] > 5:
+            lastPrint[0] = now
+            print("%d games, %.0f games/s" % (tally.total, tally.total / (now - start)))
+    tally = run(entrants, GAMES if games is None else int(games), int(workers) if workers else None,
+                None if seed is None else int(seed), progress)
+    elapsed = time.perf_counter() - start
+    print(tally.report())
+    print("%d games in %.1f s, %.0f games/s" % (tally.total, elapsed, tally.total / elapsed))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])